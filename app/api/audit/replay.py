@@ -0,0 +1,32 @@
+import uuid
+
+from api.base.endpoints import BaseEndpoint
+from api.deps import DBSession, DDLogger
+from fastapi import BackgroundTasks, status
+from fastapi.responses import JSONResponse
+from schemas.replay_schema import ReplayAttemptResponse, ReplayRequest, ReplayResponse
+from service.audit import replay
+
+
+ROUTE_PREFIX = "/api/audit/replay"
+
+
+class ReplayEndpoint(BaseEndpoint):
+    """Reenvio de eventos com erro"""
+
+    def __init__(self):
+        super().__init__(tags=["Replay"], prefix=ROUTE_PREFIX)
+
+        @self.router.post("", response_model=ReplayResponse)
+        async def replay_failed_events(
+            request: ReplayRequest, db_session: DBSession, logger: DDLogger, background_tasks: BackgroundTasks
+        ):
+            logger.info(f"Replaying failed events: {request.model_dump(mode='json')}")
+            summary = ReplayResponse.model_validate(await replay.schedule_replay(db_session, request, background_tasks))
+            if summary.dispatched is not None:
+                return summary
+            return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content=summary.model_dump(mode="json"))
+
+        @self.router.get("/{replay_id}", response_model=list[ReplayAttemptResponse])
+        def get_replay_attempts(replay_id: uuid.UUID, db_session: DBSession):
+            return replay.get_replay_attempts(db_session, replay_id)
@@ -1,7 +1,13 @@
+import uuid
+
 from api.base.endpoints import BaseEndpoint
 from api.deps import DBSession, DDLogger
-from schemas.camunda_schema import ProcessKeyRequest
-from service.camunda.base import start_process
+from fastapi import BackgroundTasks, status
+from fastapi.responses import JSONResponse
+from schemas.camunda_schema import ProcessJobResponse, ProcessKeyRequest
+from service.camunda import runs
+from service.camunda.base import plan_process
+from service.camunda.jobs import enqueue_process_job
 
 
 ROUTE_PREFIX = "/api/process-message"
@@ -14,5 +20,20 @@ class ProcessMessageEndpoint(BaseEndpoint):
         super().__init__(tags=["Process Message"], prefix=ROUTE_PREFIX)
 
         @self.router.post("/start")
-        async def start_camunda_process(request: ProcessKeyRequest, logger: DDLogger, db_session: DBSession):
-            await start_process(request.process_key, db_session, logger)
+        async def start_camunda_process(
+            request: ProcessKeyRequest, logger: DDLogger, db_session: DBSession, background_tasks: BackgroundTasks
+        ):
+            if request.dry_run:
+                return await plan_process(request.process_key, db_session, logger, sample_size=request.sample_size)
+
+            process_run = await enqueue_process_job(
+                request.process_key, db_session, logger, background_tasks, fan_out=request.fan_out
+            )
+            return JSONResponse(
+                status_code=status.HTTP_202_ACCEPTED,
+                content=ProcessJobResponse.model_validate(process_run).model_dump(mode="json"),
+            )
+
+        @self.router.get("/jobs/{job_id}")
+        def get_process_job(job_id: uuid.UUID, db_session: DBSession) -> ProcessJobResponse:
+            return ProcessJobResponse.model_validate(runs.get_process_run(db_session, job_id))
@@ -1,3 +1,4 @@
+from api.audit.replay import ReplayEndpoint
 from api.audit.rpa_audit import RPAAuditoriaEndpoint
 from api.base.endpoints import BaseEndpoint
 from api.camunda.process_starter import ProcessMessageEndpoint
@@ -15,6 +16,7 @@ class Routers:
             ProcessMessageEndpoint(),
             MeliusEndpoint(),
             RPAAuditoriaEndpoint(),
+            ReplayEndpoint(),
         ]
 
     def get_routers(self):
@@ -1,7 +1,21 @@
+from typing import Annotated, Optional
+
 from api.base.endpoints import BaseEndpoint
 from api.deps import DBSession, DDLogger
-from schemas.rpa_schema import MeliusProcessRequest, MeliusWebhookRequest
-from service.rpa.rpa_services import handle_webhook_request, start_melius_rpa
+from fastapi import Header
+from schemas.rpa_schema import (
+    MeliusBatchProcessRequest,
+    MeliusBatchResponse,
+    MeliusProcessRequest,
+    MeliusWebhookRequest,
+    OutboxLagResponse,
+)
+from service.rpa import outbox
+from service.rpa.rpa_services import (
+    handle_webhook_request,
+    start_melius_rpa,
+    start_melius_rpa_batch,
+)
 
 
 ROUTE_PREFIX = "/api/melius"
@@ -12,15 +26,25 @@ class MeliusEndpoint(BaseEndpoint):
         super().__init__(tags=["Melius"], prefix=ROUTE_PREFIX)
 
         @self.router.post("/start-rpa")
-        def start_rpa(melius_request: MeliusProcessRequest, db_session: DBSession, logger: DDLogger):
+        async def start_rpa(
+            melius_request: MeliusProcessRequest,
+            db_session: DBSession,
+            logger: DDLogger,
+            idempotency_key: Annotated[Optional[str], Header(alias="Idempotency-Key")] = None,
+        ):
             try:
                 logger.info(f"Received request with process_data: {melius_request.process_data}")
-                melius_response = start_melius_rpa(melius_request.process_data, db_session)
+                melius_response = await start_melius_rpa(melius_request.process_data, db_session, idempotency_key)
                 return melius_response
             except Exception as e:
                 logger.error(f"Error starting Melius RPA: {e}")
                 raise e
 
+        @self.router.post("/start-rpa/batch", response_model=MeliusBatchResponse)
+        async def start_rpa_batch(batch_request: MeliusBatchProcessRequest, db_session: DBSession, logger: DDLogger):
+            logger.info(f"Received batch request with {len(batch_request.items)} items")
+            return await start_melius_rpa_batch(batch_request.items, db_session)
+
         @self.router.post("/webhook")
         def melius_webhook(request: MeliusWebhookRequest, db_session: DBSession, logger: DDLogger):
             try:
@@ -30,3 +54,7 @@ class MeliusEndpoint(BaseEndpoint):
             except Exception as e:
                 logger.error(f"Erro ao processar Webhook Melius: {e}")
                 raise e
+
+        @self.router.get("/outbox/lag", response_model=OutboxLagResponse)
+        def outbox_lag(db_session: DBSession):
+            return outbox.get_outbox_lag(db_session)
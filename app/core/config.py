@@ -24,6 +24,21 @@ class Settings(BaseSettings):
     AWS_ACCESS_KEY_ID: str = Field(default="")
     AWS_SECRET_ACCESS_KEY: str = Field(default="")
     CORE_SAIDA_BUCKET_NAME: str = Field(default="core-saida")
+    S3_STREAM_CHUNK_SIZE: int = Field(default=64 * 1024)
+    PROCESS_CONTENT_ENCODING: str = Field(default="utf-8")
+    PROCESS_CONTENT_BATCH_SIZE: int = Field(default=10000)
+    S3_MAX_POOL_CONNECTIONS: int = Field(default=32)
+    S3_MAX_CONCURRENCY: int = Field(default=16)
+    S3_RANGE_PART_SIZE: int = Field(default=8 * 1024 * 1024)
+    # Conteúdos maiores que uma parte são enviados com multipart upload (mínimo de 5 MiB por parte)
+    S3_MULTIPART_PART_SIZE: int = Field(default=8 * 1024 * 1024)
+    S3_CACHE_ENABLED: bool = Field(default=True)
+    S3_CACHE_DIR: str = Field(default="")
+    S3_CACHE_MAX_BYTES: int = Field(default=512 * 1024 * 1024)
+
+    # Business day calendar settings ("MM-DD" for yearly holidays, "YYYY-MM-DD" for single dates)
+    BUSINESS_CALENDAR_STATE_HOLIDAYS: list[str] = Field(default=[])
+    BUSINESS_CALENDAR_MUNICIPAL_HOLIDAYS: list[str] = Field(default=[])
 
     # Camunda settings
     CAMUNDA_ENGINE_URL: str = Field(default="")
@@ -54,9 +69,94 @@ class Settings(BaseSettings):
     MAX_OVERFLOW: int = Field(default=64)
     POOL_SIZE: Optional[int] = Field(default=None)
 
+    # Queue settings
+    # Sem os subscribers, os jobs de /api/process-message/start são executados em background na própria API
+    SQS_SUBSCRIBERS_ENABLED: bool = Field(default=False)
+    PROCESS_STARTER_QUEUE_NAME: str = Field(default="process_starter.fifo")
+    SQS_PUBLISHER_MAX_WORKERS: int = Field(default=8)
+    PROCESS_FANOUT_CHUNK_SIZE: int = Field(default=500)
+    PROCESS_PROGRESS_FLUSH_ROWS: int = Field(default=50)
+    # Mensagens maiores que o limite são gravadas no S3 e a mensagem leva apenas a referência (claim check)
+    SQS_CLAIM_CHECK_THRESHOLD_BYTES: int = Field(default=200 * 1024)
+    SQS_CLAIM_CHECK_BUCKET_NAME: str = Field(default="")
+    SQS_CLAIM_CHECK_PREFIX: str = Field(default="sqs-claim-check/")
+    SQS_CLAIM_CHECK_COMPRESS: bool = Field(default=True)
+
     # RPA Settings
     MELIUS_RPA_URL: str = Field(default="")
     MELIUS_RPA_TOKEN: str = Field(default="")
+    MELIUS_RPA_CONNECT_TIMEOUT: float = Field(default=5.0)
+    MELIUS_RPA_READ_TIMEOUT: float = Field(default=30.0)
+    # Tempo máximo de espera por uma conexão livre no pool
+    MELIUS_RPA_POOL_TIMEOUT: float = Field(default=10.0)
+    MELIUS_RPA_MAX_CONNECTIONS: int = Field(default=50)
+    MELIUS_RPA_MAX_KEEPALIVE_CONNECTIONS: int = Field(default=20)
+    MELIUS_RPA_KEEPALIVE_EXPIRY: float = Field(default=30.0)
+    # Limites do provedor, compartilhados por todas as requisições do processo
+    MELIUS_RPA_MAX_CONCURRENCY: int = Field(default=20)
+    # Envios por segundo (0 desabilita)
+    MELIUS_RPA_RATE_LIMIT: float = Field(default=0.0)
+    # Envios aguardando vaga; acima disso o envio falha imediatamente
+    MELIUS_RPA_MAX_QUEUE: int = Field(default=1000)
+    # Tempo, em segundos, em que um início de RPA repetido (mesma chave de idempotência) retorna a resposta guardada
+    MELIUS_RPA_IDEMPOTENCY_TTL: int = Field(default=30 * 60)
+    # Tempo, em segundos, em que uma chave fica reservada (IN_PROGRESS) por uma requisição que não terminou
+    # (ex: instância reiniciada); depois disso uma nova tentativa assume a chave
+    MELIUS_RPA_IDEMPOTENCY_LEASE: int = Field(default=5 * 60)
+    # Sem o header Idempotency-Key, usa idTarefaCliente e tipoTarefaRpa como chave
+    MELIUS_RPA_IDEMPOTENCY_DERIVE_KEY: bool = Field(default=True)
+    # Quantidade máxima de tarefas enviadas em paralelo para a Melius em um lote
+    MELIUS_RPA_BATCH_CONCURRENCY: int = Field(default=10)
+    # Com o segredo configurado, o tokenRetorno é assinado (HMAC) e validado sem consulta ao banco
+    MELIUS_CALLBACK_TOKEN_SECRET: str = Field(default="")
+    # Segredo anterior, aceito na validação durante a rotação
+    MELIUS_CALLBACK_TOKEN_PREVIOUS_SECRET: str = Field(default="")
+    MELIUS_CALLBACK_TOKEN_TTL: int = Field(default=7 * 24 * 60 * 60)
+    # Aceita os tokens aleatórios antigos, validados pelo log de START da tarefa
+    MELIUS_CALLBACK_LEGACY_TOKENS_ENABLED: bool = Field(default=True)
+    # Prazo, em segundos, para o webhook de uma tarefa enviada chegar
+    MELIUS_RPA_TASK_TIMEOUT: int = Field(default=4 * 60 * 60)
+    # Envios de uma tarefa sem retorno antes de notificar o Camunda do timeout
+    MELIUS_RPA_TASK_MAX_ATTEMPTS: int = Field(default=2)
+    RPA_SWEEPER_ENABLED: bool = Field(default=True)
+    RPA_SWEEPER_INTERVAL: float = Field(default=60.0)
+    RPA_SWEEPER_BATCH_SIZE: int = Field(default=100)
+    # Tempo, em segundos, em que as tarefas reservadas por uma varredura ficam fora das outras durante o reenvio
+    RPA_SWEEPER_LEASE_SECONDS: float = Field(default=600.0)
+
+    # External tasks do Camunda (0 workers desabilita)
+    CAMUNDA_EXTERNAL_TASK_WORKERS: int = Field(default=0)
+    CAMUNDA_EXTERNAL_TASK_MAX_TASKS: int = Field(default=10)
+    CAMUNDA_EXTERNAL_TASK_CONCURRENCY: int = Field(default=20)
+    # Durações em milissegundos, como na API do Camunda
+    CAMUNDA_EXTERNAL_TASK_LOCK_DURATION: int = Field(default=60_000)
+    CAMUNDA_EXTERNAL_TASK_LONG_POLLING_TIMEOUT: int = Field(default=20_000)
+    CAMUNDA_EXTERNAL_TASK_RETRY_TIMEOUT: int = Field(default=30_000)
+    CAMUNDA_EXTERNAL_TASK_RETRIES: int = Field(default=3)
+    CAMUNDA_EXTERNAL_TASK_ERROR_BACKOFF: float = Field(default=5.0)
+    MELIUS_EXTERNAL_TASK_TOPIC: str = Field(default="melius-rpa")
+
+    # Outbox das mensagens de retorno dos RPAs para o Camunda
+    CAMUNDA_OUTBOX_DISPATCHER_ENABLED: bool = Field(default=True)
+    CAMUNDA_OUTBOX_POLL_INTERVAL: float = Field(default=1.0)
+    CAMUNDA_OUTBOX_BATCH_SIZE: int = Field(default=50)
+    CAMUNDA_OUTBOX_CONCURRENCY: int = Field(default=10)
+    CAMUNDA_OUTBOX_MAX_ATTEMPTS: int = Field(default=10)
+    # Espera, em segundos, antes da segunda tentativa; dobra a cada falha até CAMUNDA_OUTBOX_MAX_BACKOFF
+    CAMUNDA_OUTBOX_RETRY_BACKOFF: float = Field(default=2.0)
+    CAMUNDA_OUTBOX_MAX_BACKOFF: float = Field(default=300.0)
+    # Reserva das mensagens em envio; precisa cobrir a cópia dos arquivos e a chamada ao Camunda
+    CAMUNDA_OUTBOX_LEASE_SECONDS: float = Field(default=600.0)
+    # Reenvio (replay) de eventos com erro
+    REPLAY_MAX_EVENTS: int = Field(default=5000)
+    REPLAY_CONCURRENCY: int = Field(default=10)
+    # Reenvios por segundo (0 desabilita)
+    REPLAY_RATE_LIMIT: float = Field(default=5.0)
+    # Cópia dos arquivos gerados pelos RPAs para o CORE_SAIDA_BUCKET_NAME, antes do envio ao Camunda
+    RPA_FILE_MIRROR_ENABLED: bool = Field(default=False)
+    RPA_FILE_MIRROR_PREFIX: str = Field(default="rpa-arquivos/")
+    RPA_FILE_MIRROR_CONCURRENCY: int = Field(default=8)
+    RPA_FILE_MIRROR_TIMEOUT: float = Field(default=60.0)
 
     @field_validator("POOL_SIZE", mode="before")
     @classmethod
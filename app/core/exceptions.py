@@ -6,5 +6,17 @@ class RPAException(CoreSaidaOrchestratorException):
     pass
 
 
+class IdempotencyConflict(RPAException):
+    pass
+
+
 class ObjectNotFound(CoreSaidaOrchestratorException):
     pass
+
+
+class InvalidProcessContent(CoreSaidaOrchestratorException):
+    pass
+
+
+class SQSPublishError(CoreSaidaOrchestratorException):
+    pass
@@ -0,0 +1,122 @@
+"""Calendário de dias úteis brasileiro (feriados nacionais, estaduais e municipais)"""
+
+import calendar
+import datetime
+from functools import lru_cache
+from typing import Iterable, Optional
+
+from core.config import settings
+
+
+# Feriados nacionais de data fixa (mês, dia)
+NATIONAL_HOLIDAYS = [
+    (1, 1),  # Confraternização Universal
+    (4, 21),  # Tiradentes
+    (5, 1),  # Dia do Trabalho
+    (9, 7),  # Independência
+    (10, 12),  # Nossa Senhora Aparecida
+    (11, 2),  # Finados
+    (11, 15),  # Proclamação da República
+    (11, 20),  # Dia Nacional de Zumbi e da Consciência Negra
+    (12, 25),  # Natal
+]
+
+# Feriados móveis, em dias a partir do domingo de Páscoa. Carnaval e Corpus Christi são pontos facultativos,
+# mas não há expediente bancário, então não são dias úteis para vencimentos
+EASTER_HOLIDAYS = [
+    -48,  # Segunda-feira de Carnaval
+    -47,  # Terça-feira de Carnaval
+    -2,  # Sexta-feira Santa
+    60,  # Corpus Christi
+]
+
+
+def easter_sunday(year: int) -> datetime.date:
+    """Domingo de Páscoa no calendário gregoriano (algoritmo de Meeus/Jones/Butcher)"""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    leap = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * leap) // 451
+    month, day = divmod(h + leap - 7 * m + 114, 31)
+    return datetime.date(year, month, day + 1)
+
+
+def parse_holiday(value: str) -> tuple[Optional[int], int, int]:
+    """Converte um feriado configurado ("MM-DD" anual ou "YYYY-MM-DD" pontual) em (ano, mês, dia)"""
+    parts = [int(part) for part in value.split("-")]
+    if len(parts) == 2:
+        return None, parts[0], parts[1]
+    if len(parts) == 3:
+        return parts[0], parts[1], parts[2]
+    raise ValueError(f"Invalid holiday: {value}")
+
+
+class BusinessCalendar:
+    """Calendário de dias úteis com consultas O(1) por mês.
+
+    Os dias úteis de cada mês são calculados uma única vez e memorizados, de forma que
+    "n-ésimo dia útil do mês" é apenas um acesso por índice.
+    """
+
+    def __init__(self, extra_holidays: Iterable[str] = ()):
+        self.extra_holidays = [parse_holiday(holiday) for holiday in extra_holidays]
+        self.holidays = lru_cache(maxsize=32)(self._holidays)
+        self.month_business_days = lru_cache(maxsize=128)(self._month_business_days)
+
+    def _holidays(self, year: int) -> frozenset[datetime.date]:
+        """Feriados do ano"""
+        easter = easter_sunday(year)
+        holidays = {datetime.date(year, month, day) for month, day in NATIONAL_HOLIDAYS}
+        holidays.update(easter + datetime.timedelta(days=offset) for offset in EASTER_HOLIDAYS)
+        holidays.update(
+            datetime.date(year, month, day)
+            for holiday_year, month, day in self.extra_holidays
+            if holiday_year in (None, year)
+        )
+        return frozenset(holidays)
+
+    def _month_business_days(self, year: int, month: int) -> tuple[datetime.date, ...]:
+        """Dias úteis do mês, em ordem"""
+        holidays = self.holidays(year)
+        days = (datetime.date(year, month, day) for day in range(1, calendar.monthrange(year, month)[1] + 1))
+        return tuple(day for day in days if day.weekday() < 5 and day not in holidays)
+
+    def is_business_day(self, date: datetime.date) -> bool:
+        return date.weekday() < 5 and date not in self.holidays(date.year)
+
+    def nth_business_day(self, year: int, month: int, n: int) -> datetime.date:
+        """N-ésimo dia útil do mês (1 = primeiro); valores maiores que o total retornam o último dia útil"""
+        if n < 1:
+            raise ValueError(f"Invalid business day: {n}")
+        business_days = self.month_business_days(year, month)
+        return business_days[min(n, len(business_days)) - 1]
+
+    def previous_business_day(self, date: datetime.date) -> datetime.date:
+        """A própria data, se for dia útil, ou o dia útil anterior"""
+        while not self.is_business_day(date):
+            date -= datetime.timedelta(days=1)
+        return date
+
+    def next_business_day(self, date: datetime.date) -> datetime.date:
+        """A própria data, se for dia útil, ou o próximo dia útil"""
+        while not self.is_business_day(date):
+            date += datetime.timedelta(days=1)
+        return date
+
+
+@lru_cache(maxsize=1)
+def get_business_calendar() -> BusinessCalendar:
+    """
+    Get the business day calendar with the configured state and municipal holidays.
+
+    Returns:
+        BusinessCalendar: Business day calendar
+    """
+    return BusinessCalendar(
+        [*settings.BUSINESS_CALENDAR_STATE_HOLIDAYS, *settings.BUSINESS_CALENDAR_MUNICIPAL_HOLIDAYS]
+    )
@@ -1,8 +1,28 @@
+import csv
+import gzip
+import hashlib
+import io
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import asdict, dataclass
 from functools import lru_cache
-from typing import Optional
+from itertools import islice
+from typing import Any, BinaryIO, Iterable, Iterator, Optional, Sequence, Tuple, Union
 
 import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
 from core.config import settings
+from core.exceptions import InvalidProcessContent
+
+
+logger = logging.getLogger(__name__)
 
 
 @lru_cache(maxsize=1)
@@ -16,6 +36,13 @@ def get_s3_client():
 
     params = {
         "region_name": settings.AWS_REGION,
+        "config": Config(
+            retries={"max_attempts": 5, "mode": "adaptive"},
+            connect_timeout=10,
+            read_timeout=60,
+            # Comporta os downloads concorrentes (objetos e partes) sem descartar conexões do pool
+            max_pool_connections=settings.S3_MAX_POOL_CONNECTIONS,
+        ),
     }
 
     if settings.AWS_ENDPOINT_URL:
@@ -42,3 +69,830 @@ def get_object(bucket_name: str, object_key: str) -> Optional[str]:
     except Exception as e:
         print(f"Error getting object from S3: {e}")
         return None
+
+
+class _ChunkedReader(io.RawIOBase):
+    """Adapta um stream binário (ex: o `Body` do S3) para leitura em blocos de tamanho fixo"""
+
+    def __init__(self, stream: BinaryIO):
+        self._stream = stream
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        data = self._stream.read(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+
+def open_object_stream(
+    bucket_name: str,
+    object_key: str,
+    version_id: Optional[str] = None,
+    use_cache: Optional[bool] = None,
+    start: Optional[int] = None,
+    etag: Optional[str] = None,
+) -> Tuple[BinaryIO, Optional[str]]:
+    """
+    Open an object (optionally a specific version) from an S3 bucket for streaming reads.
+
+    When `etag` is informed the read is conditional (IfMatch), failing with a 412 (see `is_precondition_failed`)
+    if the object was replaced since the ETag was taken, even in unversioned buckets.
+
+    Args:
+        bucket_name: Name of the S3 bucket
+        object_key: Key of the object to read
+        version_id: Version of the object to read, the latest version if not informed
+        use_cache: Whether to serve the object from the local disk cache, S3_CACHE_ENABLED if not informed
+        start: Byte offset where the read starts (a ranged GET when not cached), the beginning if not informed
+        etag: ETag the object must still have, any if not informed
+
+    Returns:
+        Tuple[BinaryIO, Optional[str]]: Body of the object and its version id (None if the bucket is not versioned)
+    """
+    if settings.S3_CACHE_ENABLED if use_cache is None else use_cache:
+        stream, version_id = get_object_cache().open(bucket_name, object_key, version_id, etag=etag)
+        if start:
+            if stream.seekable():
+                stream.seek(start)
+            else:
+                # Objeto maior que o cache, lido direto do S3
+                stream.close()
+                return open_object_stream(bucket_name, object_key, version_id, use_cache=False, start=start, etag=etag)
+        return stream, version_id
+
+    if start is None and detect_content_format(object_key) == CONTENT_FORMAT_PARQUET:
+        # O Parquet é lido a partir do footer, então o objeto inteiro é baixado, em partes paralelas
+        return read_object_parallel(bucket_name, object_key, version_id, etag=etag)
+
+    params = {"Bucket": bucket_name, "Key": object_key}
+    if version_id:
+        params["VersionId"] = version_id
+    if etag:
+        params["IfMatch"] = etag
+    if start:
+        params["Range"] = f"bytes={start}-"
+
+    response = get_s3_client().get_object(**params)
+    return response["Body"], response.get("VersionId")
+
+
+def get_object_version(
+    bucket_name: str, object_key: str, version_id: Optional[str] = None
+) -> Tuple[Optional[str], str]:
+    """
+    Get the current version id and ETag of an object, used to pin later reads to the same content.
+
+    Args:
+        bucket_name: Name of the S3 bucket
+        object_key: Key of the object
+        version_id: Version of the object, the latest version if not informed
+
+    Returns:
+        Tuple[Optional[str], str]: Version id (None if the bucket is not versioned) and ETag of the object
+    """
+    params = {"Bucket": bucket_name, "Key": object_key}
+    if version_id:
+        params["VersionId"] = version_id
+    head = get_s3_client().head_object(**params)
+    return head.get("VersionId"), head["ETag"]
+
+
+def is_precondition_failed(error: Exception) -> bool:
+    """Whether the error is a 412 from a conditional (IfMatch) read of an object that was replaced"""
+    if not isinstance(error, ClientError):
+        return False
+    return error.response.get("Error", {}).get("Code") in ("412", "PreconditionFailed")
+
+
+def list_objects(bucket_name: str, prefix: str = "", suffix: str = "") -> list[dict]:
+    """
+    List the objects of an S3 bucket under a prefix.
+
+    Args:
+        bucket_name: Name of the S3 bucket
+        prefix: Prefix of the object keys
+        suffix: Suffix the object keys must end with (e.g. ".csv")
+
+    Returns:
+        list[dict]: Objects (Key, Size, ETag, ...) ordered by key
+    """
+    objects = []
+    paginator = get_s3_client().get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix):
+        objects.extend(item for item in page.get("Contents", []) if item["Key"].endswith(suffix))
+    return sorted(objects, key=lambda item: item["Key"])
+
+
+def read_object_parallel(
+    bucket_name: str,
+    object_key: str,
+    version_id: Optional[str] = None,
+    part_size: Optional[int] = None,
+    max_workers: Optional[int] = None,
+    etag: Optional[str] = None,
+) -> Tuple[BinaryIO, Optional[str]]:
+    """
+    Download an object splitting it in byte ranges fetched concurrently.
+
+    All the parts are read from the same version (or ETag, in unversioned buckets), so an upload in the
+    middle of the download can't mix two contents. Parts are written in order to a spooled temporary file,
+    keeping at most `max_workers` of them in flight.
+
+    Args:
+        bucket_name: Name of the S3 bucket
+        object_key: Key of the object to read
+        version_id: Version of the object to read, the latest version if not informed
+        part_size: Size in bytes of each range, S3_RANGE_PART_SIZE if not informed
+        max_workers: Maximum number of concurrent range requests, S3_MAX_CONCURRENCY if not informed
+        etag: ETag the object must still have, any if not informed
+
+    Returns:
+        Tuple[BinaryIO, Optional[str]]: Local copy of the object and its version id
+    """
+    part_size = part_size or settings.S3_RANGE_PART_SIZE
+    client = get_s3_client()
+
+    params = {"Bucket": bucket_name, "Key": object_key}
+    if version_id:
+        params["VersionId"] = version_id
+    head = client.head_object(**params)
+    size, version_id = head["ContentLength"], head.get("VersionId")
+    if version_id:
+        params["VersionId"] = version_id
+    if etag or not version_id:
+        params["IfMatch"] = etag or head["ETag"]
+
+    def read_range(start: int) -> bytes:
+        end = min(start + part_size, size) - 1
+        return client.get_object(Range=f"bytes={start}-{end}", **params)["Body"].read()
+
+    destination = tempfile.SpooledTemporaryFile(max_size=part_size)
+    if size <= part_size:
+        shutil.copyfileobj(client.get_object(**params)["Body"], destination, settings.S3_STREAM_CHUNK_SIZE)
+    else:
+        max_workers = max_workers or settings.S3_MAX_CONCURRENCY
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # As partes são gravadas em ordem; no máximo `max_workers` partes ficam em memória à frente da escrita
+            in_flight: deque[Future] = deque()
+            for start in range(0, size, part_size):
+                if len(in_flight) >= max_workers:
+                    destination.write(in_flight.popleft().result())
+                in_flight.append(executor.submit(read_range, start))
+            while in_flight:
+                destination.write(in_flight.popleft().result())
+
+    destination.seek(0)
+    return destination, version_id
+
+
+def fetch_objects(
+    bucket_name: str, prefix: str, suffix: str = "", max_workers: Optional[int] = None
+) -> list[Tuple[str, BinaryIO, Optional[str]]]:
+    """
+    Fetch concurrently all the objects under a prefix (e.g. one input file per squad or analyst).
+
+    Objects are served from the local disk cache when S3_CACHE_ENABLED, otherwise large objects are
+    downloaded in parallel byte ranges.
+
+    Args:
+        bucket_name: Name of the S3 bucket
+        prefix: Prefix of the object keys
+        suffix: Suffix the object keys must end with (e.g. ".csv")
+        max_workers: Maximum number of objects fetched at the same time, S3_MAX_CONCURRENCY if not informed
+
+    Returns:
+        list[Tuple[str, BinaryIO, Optional[str]]]: Key, content and version id of each object, ordered by key
+    """
+    object_keys = [item["Key"] for item in list_objects(bucket_name, prefix, suffix)]
+    if not object_keys:
+        return []
+
+    def fetch(object_key: str) -> Tuple[str, BinaryIO, Optional[str]]:
+        if settings.S3_CACHE_ENABLED:
+            stream, version_id = get_object_cache().open(bucket_name, object_key)
+        else:
+            stream, version_id = read_object_parallel(bucket_name, object_key)
+        return object_key, stream, version_id
+
+    max_workers = min(max_workers or settings.S3_MAX_CONCURRENCY, len(object_keys))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(fetch, object_keys))
+
+
+def upload_stream(
+    bucket_name: str,
+    object_key: str,
+    chunks: Iterable[bytes],
+    content_type: Optional[str] = None,
+    part_size: Optional[int] = None,
+) -> dict:
+    """
+    Upload a stream of chunks to an S3 bucket without holding the whole content in memory.
+
+    Contents up to one part are sent with a single PutObject; larger contents use a multipart upload,
+    aborted if any part fails.
+
+    Args:
+        bucket_name: Name of the S3 bucket
+        object_key: Key of the object to write
+        chunks: Chunks of the content (e.g. the body of an HTTP response)
+        content_type: Content type of the object
+        part_size: Size in bytes of each part, S3_MULTIPART_PART_SIZE if not informed (S3 requires at least 5 MiB)
+
+    Returns:
+        dict: Bucket, key, size and ETag of the object
+    """
+    part_size = part_size or settings.S3_MULTIPART_PART_SIZE
+    client = get_s3_client()
+    params = {"Bucket": bucket_name, "Key": object_key}
+    extra = {"ContentType": content_type} if content_type else {}
+
+    buffer = bytearray()
+    size = 0
+    upload_id = None
+    parts: list[dict] = []
+
+    def upload_part(data: bytes) -> None:
+        response = client.upload_part(UploadId=upload_id, PartNumber=len(parts) + 1, Body=data, **params)
+        parts.append({"PartNumber": len(parts) + 1, "ETag": response["ETag"]})
+
+    try:
+        for chunk in chunks:
+            buffer.extend(chunk)
+            size += len(chunk)
+            while len(buffer) >= part_size:
+                if upload_id is None:
+                    upload_id = client.create_multipart_upload(**params, **extra)["UploadId"]
+                upload_part(bytes(buffer[:part_size]))
+                del buffer[:part_size]
+
+        if upload_id is None:
+            etag = client.put_object(Body=bytes(buffer), **params, **extra)["ETag"]
+        else:
+            if buffer:
+                upload_part(bytes(buffer))
+            etag = client.complete_multipart_upload(UploadId=upload_id, MultipartUpload={"Parts": parts}, **params)[
+                "ETag"
+            ]
+    except Exception:
+        if upload_id is not None:
+            client.abort_multipart_upload(UploadId=upload_id, **params)
+        raise
+
+    return {"bucket": bucket_name, "key": object_key, "size": size, "etag": etag}
+
+
+def iter_csv_rows(stream: BinaryIO, chunk_size: Optional[int] = None, encoding: Optional[str] = None) -> Iterator[dict]:
+    """
+    Decode CSV rows incrementally from a binary stream, without loading it whole into memory.
+
+    Args:
+        stream: Binary stream of the CSV content (e.g. the body of an S3 object)
+        chunk_size: Number of bytes read from the stream at a time
+        encoding: Encoding of the CSV content
+
+    Returns:
+        Iterator[dict]: Rows of the CSV keyed by the header columns
+    """
+    chunk_size = chunk_size or settings.S3_STREAM_CHUNK_SIZE
+    buffered_stream = io.BufferedReader(_ChunkedReader(stream), buffer_size=chunk_size)
+    text_stream = io.TextIOWrapper(buffered_stream, encoding=encoding or settings.PROCESS_CONTENT_ENCODING, newline="")
+    try:
+        yield from csv.DictReader(text_stream)
+    finally:
+        text_stream.close()
+        stream.close()
+
+
+# Values of a column: a list of strings (CSV) or an Arrow string array (Parquet)
+ColumnValues = Union[list[str], Any]
+
+
+@dataclass
+class ColumnBatch:
+    """Batch of content rows loaded column by column"""
+
+    header: list[str]
+    columns: dict[str, ColumnValues]
+    size: int
+
+
+def take_values(values: ColumnValues, indexes: Sequence[int]) -> list[str]:
+    """
+    Get the values of a column at the given rows.
+
+    Args:
+        values: Values of the column, a list or an Arrow array
+        indexes: Positions of the rows
+
+    Returns:
+        list[str]: Values of the rows
+    """
+    if isinstance(values, list):
+        return [values[index] for index in indexes]
+
+    import pyarrow as pa
+
+    return values.take(pa.array(indexes, pa.int64())).to_pylist()
+
+
+def _project_header(header: list[str], columns: Optional[list[str]]) -> list[str]:
+    if columns is None:
+        return header
+
+    missing_columns = [column for column in columns if column not in header]
+    if missing_columns:
+        raise InvalidProcessContent(f"Missing content columns: {', '.join(missing_columns)}")
+    return list(columns)
+
+
+def iter_csv_column_batches(
+    stream: BinaryIO,
+    batch_size: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+    encoding: Optional[str] = None,
+    columns: Optional[list[str]] = None,
+    header: Optional[list[str]] = None,
+) -> Iterator[ColumnBatch]:
+    """
+    Decode CSV rows incrementally from a binary stream, grouped in column oriented batches.
+
+    Args:
+        stream: Binary stream of the CSV content (e.g. the body of an S3 object)
+        batch_size: Maximum number of rows per batch
+        chunk_size: Number of bytes read from the stream at a time
+        encoding: Encoding of the CSV content
+        columns: Columns kept in the batches, all the header columns if not informed
+        header: Header of the content, when the stream starts at a row instead of the header (see `split_content`)
+
+    Returns:
+        Iterator[ColumnBatch]: Batches with one list of values per column
+    """
+    batch_size = batch_size or settings.PROCESS_CONTENT_BATCH_SIZE
+    chunk_size = chunk_size or settings.S3_STREAM_CHUNK_SIZE
+    buffered_stream = io.BufferedReader(_ChunkedReader(stream), buffer_size=chunk_size)
+    text_stream = io.TextIOWrapper(buffered_stream, encoding=encoding or settings.PROCESS_CONTENT_ENCODING, newline="")
+    try:
+        reader = csv.reader(text_stream)
+        if header is None:
+            header = next(reader, None)
+        if header is None:
+            return
+
+        selected_header = _project_header(header, columns)
+        indexes = [header.index(column) for column in selected_header]
+        while True:
+            rows = [row for row in islice(reader, batch_size) if row]
+            if not rows:
+                return
+
+            # Completa linhas com menos colunas que o cabeçalho, como o csv.DictReader
+            width = len(header)
+            rows = [row if len(row) >= width else row + [""] * (width - len(row)) for row in rows]
+            values = list(zip(*rows, strict=False))
+            yield ColumnBatch(
+                header=selected_header,
+                columns={column: list(values[index]) for column, index in zip(selected_header, indexes, strict=True)},
+                size=len(rows),
+            )
+    finally:
+        text_stream.close()
+        stream.close()
+
+
+def iter_parquet_column_batches(
+    stream: BinaryIO, batch_size: Optional[int] = None, columns: Optional[list[str]] = None
+) -> Iterator[ColumnBatch]:
+    """
+    Read a Parquet file in column oriented batches, reading only the requested columns.
+
+    Values are converted to text (nulls as empty strings), so rows look the same as rows read from a CSV, but kept
+    as Arrow arrays so the eligibility rules are evaluated with pyarrow.compute.
+
+    Args:
+        stream: Binary stream of the Parquet content, copied to a temporary file if not seekable
+        batch_size: Maximum number of rows per batch
+        columns: Columns read from the file, all the file columns if not informed
+
+    Returns:
+        Iterator[ColumnBatch]: Batches with one Arrow string array per column
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    batch_size = batch_size or settings.PROCESS_CONTENT_BATCH_SIZE
+    source = stream
+    try:
+        if not (hasattr(stream, "seekable") and stream.seekable()):
+            # O footer do Parquet fica no fim do arquivo, então o body do S3 precisa ser copiado para um arquivo local
+            source = tempfile.SpooledTemporaryFile(max_size=settings.S3_STREAM_CHUNK_SIZE * 16)
+            shutil.copyfileobj(stream, source, settings.S3_STREAM_CHUNK_SIZE)
+            source.seek(0)
+
+        parquet_file = pq.ParquetFile(source)
+        selected_header = _project_header(parquet_file.schema_arrow.names, columns)
+        for record_batch in parquet_file.iter_batches(batch_size=batch_size, columns=selected_header):
+            yield ColumnBatch(
+                header=selected_header,
+                columns={
+                    column: pc.fill_null(pc.cast(record_batch.column(column), pa.string()), "")
+                    for column in selected_header
+                },
+                size=record_batch.num_rows,
+            )
+    finally:
+        if source is not stream:
+            source.close()
+        stream.close()
+
+
+CONTENT_FORMAT_CSV = "csv"
+CONTENT_FORMAT_CSV_GZIP = "csv.gz"
+CONTENT_FORMAT_PARQUET = "parquet"
+
+GZIP_MAGIC = b"\x1f\x8b"
+PARQUET_MAGIC = b"PAR1"
+
+
+def detect_content_format(object_key: str, header: bytes = b"") -> str:
+    """
+    Detect the format of a process content object from its key suffix or, if inconclusive, its first bytes.
+
+    Args:
+        object_key: Key of the object
+        header: First bytes of the object content
+
+    Returns:
+        str: One of CONTENT_FORMAT_CSV, CONTENT_FORMAT_CSV_GZIP or CONTENT_FORMAT_PARQUET
+    """
+    object_key = object_key.lower()
+    if object_key.endswith(".parquet"):
+        return CONTENT_FORMAT_PARQUET
+    if object_key.endswith(".gz"):
+        return CONTENT_FORMAT_CSV_GZIP
+    if header.startswith(PARQUET_MAGIC):
+        return CONTENT_FORMAT_PARQUET
+    if header.startswith(GZIP_MAGIC):
+        return CONTENT_FORMAT_CSV_GZIP
+    return CONTENT_FORMAT_CSV
+
+
+def iter_content_column_batches(
+    stream: BinaryIO,
+    object_key: str = "",
+    columns: Optional[list[str]] = None,
+    batch_size: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+    encoding: Optional[str] = None,
+    header: Optional[list[str]] = None,
+) -> Iterator[ColumnBatch]:
+    """
+    Read process content (CSV, gzip compressed CSV or Parquet) in column oriented batches.
+
+    Args:
+        stream: Binary stream of the content
+        object_key: Key of the object, used to detect the content format
+        columns: Columns kept in the batches, all the columns if not informed
+        batch_size: Maximum number of rows per batch
+        chunk_size: Number of bytes read from the stream at a time
+        encoding: Encoding of the CSV content
+        header: Header of a CSV content read from the middle (see `split_content`)
+
+    Returns:
+        Iterator[ColumnBatch]: Batches with one list of values per column
+    """
+    source = stream
+    try:
+        if hasattr(stream, "seekable") and stream.seekable():
+            position = stream.tell()
+            magic = stream.read(len(PARQUET_MAGIC))
+            stream.seek(position)
+        else:
+            stream = io.BufferedReader(_ChunkedReader(stream), buffer_size=chunk_size or settings.S3_STREAM_CHUNK_SIZE)
+            magic = stream.peek(len(PARQUET_MAGIC))
+
+        content_format = detect_content_format(object_key, magic)
+        if content_format == CONTENT_FORMAT_PARQUET:
+            yield from iter_parquet_column_batches(stream, batch_size, columns)
+            return
+
+        if content_format == CONTENT_FORMAT_CSV_GZIP:
+            # O GzipFile não fecha o stream recebido, que é fechado no finally
+            stream = gzip.GzipFile(fileobj=stream, mode="rb")
+        yield from iter_csv_column_batches(stream, batch_size, chunk_size, encoding, columns, header)
+    finally:
+        source.close()
+
+
+@dataclass
+class ContentRange:
+    """Range of content rows, with the byte offset of its first row when the content can be read from the middle"""
+
+    row_start: int
+    row_end: int
+    offset: Optional[int] = None
+    header: Optional[list[str]] = None
+
+
+def split_content(
+    stream: BinaryIO,
+    object_key: str = "",
+    rows_per_range: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+    encoding: Optional[str] = None,
+) -> list[ContentRange]:
+    """
+    Split process content in ranges of rows that can be read independently.
+
+    Plain CSV ranges carry the byte offset of their first row and the content header, so each range is read
+    starting at its offset (see `open_object_stream`). Compressed CSV and Parquet can't be read from the middle
+    of the content, so their ranges only carry the row positions.
+
+    Args:
+        stream: Binary stream of the content
+        object_key: Key of the object, used to detect the content format
+        rows_per_range: Maximum number of rows per range
+        chunk_size: Number of bytes read from the stream at a time
+        encoding: Encoding of the CSV content
+
+    Returns:
+        list[ContentRange]: Consecutive ranges covering all the content rows
+    """
+    rows_per_range = rows_per_range or settings.PROCESS_FANOUT_CHUNK_SIZE
+    chunk_size = chunk_size or settings.S3_STREAM_CHUNK_SIZE
+    buffered_stream = io.BufferedReader(_ChunkedReader(stream), buffer_size=chunk_size)
+    try:
+        if detect_content_format(object_key, buffered_stream.peek(len(PARQUET_MAGIC))) != CONTENT_FORMAT_CSV:
+            total_rows = sum(batch.size for batch in iter_content_column_batches(buffered_stream, object_key))
+            return [
+                ContentRange(row_start, min(row_start + rows_per_range, total_rows))
+                for row_start in range(0, total_rows, rows_per_range)
+            ]
+
+        # O csv.reader consome as linhas sob demanda, então a posição lida é sempre o fim do último registro
+        encoding = encoding or settings.PROCESS_CONTENT_ENCODING
+        position = 0
+
+        def lines() -> Iterator[str]:
+            nonlocal position
+            for line in buffered_stream:
+                position += len(line)
+                yield line.decode(encoding)
+
+        reader = csv.reader(lines())
+        header = next(reader, None)
+        ranges: list[ContentRange] = []
+        row = 0
+        while header is not None:
+            offset = position
+            record = next(reader, None)
+            if record is None:
+                break
+            if not record:
+                # Linhas vazias são descartadas na leitura (ver iter_csv_column_batches)
+                continue
+            if row % rows_per_range == 0:
+                ranges.append(ContentRange(row_start=row, row_end=row, offset=offset, header=header))
+            row += 1
+            ranges[-1].row_end = row
+        return ranges
+    finally:
+        buffered_stream.close()
+        stream.close()
+
+
+def slice_column_batches(batches: Iterable[ColumnBatch], row_start: int, row_end: int) -> Iterator[ColumnBatch]:
+    """
+    Keep only the rows in [row_start, row_end) of a sequence of column batches, stopping the read at row_end.
+
+    Args:
+        batches: Column batches of the content
+        row_start: Position of the first row kept
+        row_end: Position after the last row kept
+
+    Returns:
+        Iterator[ColumnBatch]: Batches with the rows of the range
+    """
+    position = 0
+    for batch in batches:
+        batch_start, position = position, position + batch.size
+        if position <= row_start:
+            continue
+        if batch_start >= row_end:
+            return
+
+        start, end = max(row_start - batch_start, 0), min(row_end, position) - batch_start
+        if (start, end) == (0, batch.size):
+            yield batch
+        else:
+            columns = {column: values[start:end] for column, values in batch.columns.items()}
+            yield ColumnBatch(header=batch.header, columns=columns, size=end - start)
+        if position >= row_end:
+            return
+
+
+def iter_content_rows(
+    stream: BinaryIO, object_key: str = "", columns: Optional[list[str]] = None, **kwargs
+) -> Iterator[dict]:
+    """
+    Read process content (CSV, gzip compressed CSV or Parquet) row by row.
+
+    Args:
+        stream: Binary stream of the content
+        object_key: Key of the object, used to detect the content format
+        columns: Columns kept in the rows, all the columns if not informed
+
+    Returns:
+        Iterator[dict]: Rows keyed by the column names
+    """
+    for batch in iter_content_column_batches(stream, object_key, columns, **kwargs):
+        values = [take_values(batch.columns[column], range(batch.size)) for column in batch.header]
+        for row in zip(*values, strict=True):
+            yield dict(zip(batch.header, row, strict=True))
+
+
+@dataclass
+class CachedObject:
+    bucket_name: str
+    object_key: str
+    etag: str
+    version_id: Optional[str]
+    size: int
+    path: str
+
+
+class S3ObjectCache:
+    """
+    Local disk cache of S3 objects, keyed by bucket, key and ETag.
+
+    Cached objects are revalidated with conditional GETs (IfNoneMatch), so an unchanged object is never
+    downloaded again. Requests for a specific version are served straight from the cache, since versions
+    are immutable. The least recently used objects are evicted when the cache exceeds `max_bytes`.
+    """
+
+    METADATA_SUFFIX = ".meta.json"
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self.bytes_downloaded = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[Tuple[str, str, str], CachedObject] = OrderedDict()
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_entries()
+
+    @property
+    def size(self) -> int:
+        return sum(entry.size for entry in self._entries.values())
+
+    def stats(self) -> dict:
+        """Counters of the cache usage"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "bytes_saved": self.bytes_saved,
+                "bytes_downloaded": self.bytes_downloaded,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "size": self.size,
+            }
+
+    def open(
+        self, bucket_name: str, object_key: str, version_id: Optional[str] = None, etag: Optional[str] = None
+    ) -> Tuple[BinaryIO, Optional[str]]:
+        """
+        Open an object from the cache, downloading it only if it is missing or was modified.
+
+        Args:
+            bucket_name: Name of the S3 bucket
+            object_key: Key of the object to read
+            version_id: Version of the object to read, the latest version if not informed
+            etag: ETag the object must have; a cached copy with this ETag is served without revalidation
+
+        Returns:
+            Tuple[BinaryIO, Optional[str]]: Local copy of the object and its version id
+        """
+        cached = self._find(bucket_name, object_key, version_id)
+        if cached and (version_id or (etag and cached.etag == etag)):
+            return self._hit(cached)
+
+        params = {"Bucket": bucket_name, "Key": object_key}
+        if version_id:
+            params["VersionId"] = version_id
+        if etag:
+            params["IfMatch"] = etag
+        elif cached:
+            params["IfNoneMatch"] = cached.etag
+
+        try:
+            response = get_s3_client().get_object(**params)
+        except ClientError as e:
+            if cached and e.response.get("Error", {}).get("Code") in ("304", "NotModified"):
+                # Um novo upload com o mesmo conteúdo mantém o ETag, mas gera uma nova versão
+                headers = e.response.get("ResponseMetadata", {}).get("HTTPHeaders", {})
+                cached.version_id = headers.get("x-amz-version-id", cached.version_id)
+                return self._hit(cached)
+            raise
+
+        return self._store(bucket_name, object_key, response)
+
+    def _find(self, bucket_name: str, object_key: str, version_id: Optional[str]) -> Optional[CachedObject]:
+        with self._lock:
+            for entry in reversed(self._entries.values()):
+                if entry.bucket_name != bucket_name or entry.object_key != object_key:
+                    continue
+                if version_id is None or entry.version_id == version_id:
+                    if os.path.exists(entry.path):
+                        return entry
+                    del self._entries[(entry.bucket_name, entry.object_key, entry.etag)]
+                    return None
+        return None
+
+    def _hit(self, cached: CachedObject) -> Tuple[BinaryIO, Optional[str]]:
+        with self._lock:
+            self.hits += 1
+            self.bytes_saved += cached.size
+            self._entries.move_to_end((cached.bucket_name, cached.object_key, cached.etag))
+
+        logger.debug(f"S3 cache hit: {cached.bucket_name}/{cached.object_key} ({cached.etag})")
+        return open(cached.path, "rb"), cached.version_id
+
+    def _store(self, bucket_name: str, object_key: str, response: dict) -> Tuple[BinaryIO, Optional[str]]:
+        with self._lock:
+            self.misses += 1
+
+        etag = response.get("ETag", "")
+        version_id = response.get("VersionId")
+        if response.get("ContentLength", 0) > self.max_bytes:
+            logger.info(f"S3 object {bucket_name}/{object_key} is larger than the cache, reading it uncached")
+            return response["Body"], version_id
+
+        path = os.path.join(self.cache_dir, self._file_name(bucket_name, object_key, etag))
+        with tempfile.NamedTemporaryFile(dir=self.cache_dir, delete=False) as temp_file:
+            shutil.copyfileobj(response["Body"], temp_file, settings.S3_STREAM_CHUNK_SIZE)
+            size = temp_file.tell()
+        os.replace(temp_file.name, path)
+
+        cached = CachedObject(bucket_name, object_key, etag, version_id, size, path)
+        with open(path + self.METADATA_SUFFIX, "w") as metadata_file:
+            json.dump(asdict(cached), metadata_file)
+
+        with self._lock:
+            self.bytes_downloaded += size
+            self._entries[(bucket_name, object_key, etag)] = cached
+            self._evict()
+
+        return open(path, "rb"), version_id
+
+    def _evict(self) -> None:
+        """Remove the least recently used objects until the cache fits in `max_bytes`"""
+        while len(self._entries) > 1 and self.size > self.max_bytes:
+            _, entry = self._entries.popitem(last=False)
+            self.evictions += 1
+            for path in (entry.path, entry.path + self.METADATA_SUFFIX):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def _load_entries(self) -> None:
+        """Load the objects cached by previous processes, in least recently used order"""
+        entries = []
+        for file_name in os.listdir(self.cache_dir):
+            if not file_name.endswith(self.METADATA_SUFFIX):
+                continue
+            try:
+                with open(os.path.join(self.cache_dir, file_name)) as metadata_file:
+                    entry = CachedObject(**json.load(metadata_file))
+                entries.append((os.path.getmtime(entry.path), entry))
+            except (OSError, ValueError, TypeError):
+                continue
+
+        for _, entry in sorted(entries, key=lambda item: item[0]):
+            self._entries[(entry.bucket_name, entry.object_key, entry.etag)] = entry
+        self._evict()
+
+    @staticmethod
+    def _file_name(bucket_name: str, object_key: str, etag: str) -> str:
+        return hashlib.sha256(f"{bucket_name}/{object_key}/{etag}".encode()).hexdigest()
+
+
+@lru_cache(maxsize=1)
+def get_object_cache() -> S3ObjectCache:
+    """
+    Get the local disk cache of S3 objects.
+
+    Returns:
+        S3ObjectCache: S3 object cache
+    """
+    cache_dir = settings.S3_CACHE_DIR or os.path.join(tempfile.gettempdir(), "core-saida-s3-cache")
+    return S3ObjectCache(cache_dir, settings.S3_CACHE_MAX_BYTES)
@@ -0,0 +1,119 @@
+import gzip
+import json
+import uuid
+from functools import lru_cache
+from typing import Optional, Tuple
+
+import boto3
+from botocore.config import Config
+from core.config import settings
+from helpers import s3_utils
+
+
+@lru_cache(maxsize=1)
+def get_sqs_client():
+    """
+    Get an SQS client.
+
+    Returns:
+        boto3.client: SQS client
+    """
+
+    params = {
+        "region_name": settings.AWS_REGION,
+        "config": Config(
+            retries={"max_attempts": 5, "mode": "adaptive"},
+            connect_timeout=10,
+            read_timeout=30,
+            max_pool_connections=max(10, settings.SQS_PUBLISHER_MAX_WORKERS),
+        ),
+    }
+
+    if settings.AWS_ENDPOINT_URL:
+        params["endpoint_url"] = settings.AWS_ENDPOINT_URL
+
+    return boto3.client("sqs", **params)
+
+
+@lru_cache(maxsize=32)
+def get_queue_url(queue_name: str) -> str:
+    """
+    Get the URL of an SQS queue.
+
+    Args:
+        queue_name: Name of the SQS queue
+
+    Returns:
+        str: URL of the queue
+    """
+    return get_sqs_client().get_queue_url(QueueName=queue_name)["QueueUrl"]
+
+
+CLAIM_CHECK_KEY = "claim_check"
+
+
+def encode_message_body(body: dict, compress: Optional[bool] = None) -> str:
+    """
+    Serialize a message body, offloading it to S3 when it exceeds SQS_CLAIM_CHECK_THRESHOLD_BYTES.
+
+    Args:
+        body: Message body
+        compress: Whether to gzip the offloaded body, SQS_CLAIM_CHECK_COMPRESS if not informed
+
+    Returns:
+        str: The JSON body, or a JSON pointer ({"claim_check": {...}}) to the body stored in S3
+    """
+    message_body = json.dumps(body)
+    encoded_body = message_body.encode()
+    if len(encoded_body) <= settings.SQS_CLAIM_CHECK_THRESHOLD_BYTES:
+        return message_body
+
+    compress = settings.SQS_CLAIM_CHECK_COMPRESS if compress is None else compress
+    claim_check = {
+        "bucket": settings.SQS_CLAIM_CHECK_BUCKET_NAME or settings.CORE_SAIDA_BUCKET_NAME,
+        "key": f"{settings.SQS_CLAIM_CHECK_PREFIX}{uuid.uuid4()}.json{'.gz' if compress else ''}",
+        "compression": "gzip" if compress else None,
+    }
+    s3_utils.get_s3_client().put_object(
+        Bucket=claim_check["bucket"],
+        Key=claim_check["key"],
+        Body=gzip.compress(encoded_body) if compress else encoded_body,
+        ContentType="application/json",
+    )
+    return json.dumps({CLAIM_CHECK_KEY: claim_check})
+
+
+def resolve_message_body(message_body: str) -> Tuple[str, Optional[dict]]:
+    """
+    Resolve a message body that may be a claim check pointer.
+
+    Args:
+        message_body: Raw body of the SQS message
+
+    Returns:
+        Tuple[str, Optional[dict]]: The JSON body and the claim check pointer (None if the body was inline)
+    """
+    try:
+        body = json.loads(message_body)
+    except ValueError:
+        return message_body, None
+
+    if not isinstance(body, dict) or set(body) != {CLAIM_CHECK_KEY}:
+        return message_body, None
+
+    claim_check = body[CLAIM_CHECK_KEY]
+    response = s3_utils.get_s3_client().get_object(Bucket=claim_check["bucket"], Key=claim_check["key"])
+    content = response["Body"].read()
+    if claim_check.get("compression") == "gzip":
+        content = gzip.decompress(content)
+    return content.decode(), claim_check
+
+
+def delete_claim_check(claim_check: dict) -> None:
+    """
+    Delete the S3 object of a claim check after its message was processed.
+
+    Args:
+        claim_check: Claim check pointer returned by resolve_message_body
+    """
+    s3_utils.get_s3_client().delete_object(Bucket=claim_check["bucket"], Key=claim_check["key"])
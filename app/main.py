@@ -1,9 +1,17 @@
 import asyncio
+import os
+import socket
 from contextlib import asynccontextmanager
+from typing import Union
 
 from api import routes
 from core.config import settings
-from core.exceptions import CoreSaidaOrchestratorException, ObjectNotFound, RPAException
+from core.exceptions import (
+    CoreSaidaOrchestratorException,
+    IdempotencyConflict,
+    ObjectNotFound,
+    RPAException,
+)
 from core.logging_config import configure_logging, get_logger
 from db.session import add_postgresql_extension
 from fastapi import FastAPI, Request, status
@@ -11,6 +19,11 @@ from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from queues.subscribers.process_starter_subscriber import ProcessStarterSubscriber
+from service.camunda.external_tasks import ExternalTaskWorker
+from service.rpa.melius_client import close_melius_client
+from service.rpa.outbox import OutboxDispatcher
+from service.rpa.rpa_services import handle_melius_external_task
+from service.rpa.sweeper import RPATaskSweeper
 
 
 # Configure logging
@@ -18,6 +31,31 @@ configure_logging()
 logger = get_logger(__name__)
 
 
+def start_background_services(app: FastAPI) -> list[Union[OutboxDispatcher, RPATaskSweeper]]:
+    """Inicia os serviços de background do orquestrador: a outbox do Camunda e o sweeper de RPAs"""
+    services: list[Union[OutboxDispatcher, RPATaskSweeper]] = []
+    if settings.CAMUNDA_OUTBOX_DISPATCHER_ENABLED:
+        services.append(OutboxDispatcher())
+    if settings.RPA_SWEEPER_ENABLED:
+        services.append(RPATaskSweeper())
+
+    # We need to keep a reference to the tasks to prevent them from being garbage collected
+    app.state.background_tasks = [asyncio.create_task(service.start()) for service in services]
+    return services
+
+
+def start_external_task_workers(app: FastAPI) -> list[ExternalTaskWorker]:
+    """Inicia os workers das external tasks do Camunda (CAMUNDA_EXTERNAL_TASK_WORKERS)"""
+    handlers = {settings.MELIUS_EXTERNAL_TASK_TOPIC: handle_melius_external_task}
+    workers = []
+    app.state.external_task_worker_tasks = []
+    for index in range(settings.CAMUNDA_EXTERNAL_TASK_WORKERS):
+        worker = ExternalTaskWorker(handlers, worker_id=f"{socket.gethostname()}-{os.getpid()}-{index}")
+        app.state.external_task_worker_tasks.append(asyncio.create_task(worker.start()))
+        workers.append(worker)
+    return workers
+
+
 @asynccontextmanager
 async def lifespan_subscribers(app: FastAPI):
     """Startup and shutdown events for the FastAPI application."""
@@ -30,7 +68,7 @@ async def lifespan_subscribers(app: FastAPI):
     attempts = 0
     while True:
         try:
-            pstart_subscriber = ProcessStarterSubscriber(queue_name="process_starter.fifo")
+            pstart_subscriber = ProcessStarterSubscriber(queue_name=settings.PROCESS_STARTER_QUEUE_NAME)
 
             # We need to keep a reference to the task to prevent it from being garbage collected
             pstart_subscriber_task = asyncio.create_task(pstart_subscriber.start())  # noqa F841: Assigned not used
@@ -45,13 +83,23 @@ async def lifespan_subscribers(app: FastAPI):
                 logger.error("Failed to create SQS subscriber task after 10 attempts")
                 break
 
+    background_services = start_background_services(app)
+    external_task_workers = start_external_task_workers(app)
+
     yield
 
     logger.info("Shutting down...")
+    for worker in external_task_workers:
+        await worker.stop()
+
     for subscriber in subscribers:
         await subscriber.stop()
         logger.info("SQS subscriber stopped")
 
+    for service in background_services:
+        await service.stop()
+    await close_melius_client()
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -59,10 +107,14 @@ async def lifespan(app: FastAPI):
 
     logger.info("Starting up...")
     add_postgresql_extension()
+    background_services = start_background_services(app)
 
     yield
 
     logger.info("Shutting down...")
+    for service in background_services:
+        await service.stop()
+    await close_melius_client()
 
 
 def create_service() -> FastAPI:
@@ -71,7 +123,7 @@ def create_service() -> FastAPI:
         description="Core Saida Orchestrator",
         version=settings.VERSION,
         openapi_url=f"/{settings.VERSION}/openapi.json",
-        lifespan=lifespan,
+        lifespan=lifespan_subscribers if settings.SQS_SUBSCRIBERS_ENABLED else lifespan,
     )
     routes.register_routes(app)
 
@@ -106,6 +158,12 @@ def create_service() -> FastAPI:
         logger.error(f"RPA error: {error_msg}")
         return JSONResponse(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, content={"detail": error_msg})
 
+    @app.exception_handler(IdempotencyConflict)
+    async def idempotency_conflict_exception_handler(request: Request, exc: IdempotencyConflict):
+        error_msg = str(exc)
+        logger.warning(f"Idempotency conflict: {error_msg}")
+        return JSONResponse(status_code=status.HTTP_409_CONFLICT, content={"detail": error_msg})
+
     return app
 
 
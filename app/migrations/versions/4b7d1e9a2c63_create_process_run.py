@@ -0,0 +1,44 @@
+"""create process_run
+
+Revision ID: 4b7d1e9a2c63
+Revises: 29870d20b68f
+Create Date: 2025-06-02 14:21:37.104512
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = "4b7d1e9a2c63"
+down_revision = "29870d20b68f"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE SEQUENCE process_run_id_seq START WITH 1 INCREMENT BY 1")
+    op.create_table(
+        "process_run",
+        sa.Column("id", sa.Integer, primary_key=True, server_default=sa.text("nextval('process_run_id_seq')")),
+        sa.Column(
+            "ref_id", postgresql.UUID(as_uuid=True), nullable=False, server_default=sa.text("gen_random_uuid()")
+        ),
+        sa.Column("process_key", sa.String(length=255), nullable=False),
+        sa.Column("status", sa.String(length=255), nullable=False),
+        sa.Column("total_rows", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("total_chunks", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("completed_chunks", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("run_data", sa.JSON, nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False),
+    )
+    op.create_index("ix_process_run_ref_id", "process_run", ["ref_id"], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_process_run_ref_id", table_name="process_run")
+    op.drop_table("process_run")
+    op.execute("DROP SEQUENCE process_run_id_seq")
@@ -0,0 +1,31 @@
+"""add process_run progress counters
+
+Revision ID: 8e3f5a0c7d21
+Revises: 4b7d1e9a2c63
+Create Date: 2025-06-04 10:02:11.593826
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "8e3f5a0c7d21"
+down_revision = "4b7d1e9a2c63"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("process_run", sa.Column("started_count", sa.Integer, nullable=False, server_default="0"))
+    op.add_column("process_run", sa.Column("skipped_count", sa.Integer, nullable=False, server_default="0"))
+    op.add_column("process_run", sa.Column("error_count", sa.Integer, nullable=False, server_default="0"))
+    op.add_column("process_run", sa.Column("errors", sa.JSON, nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("process_run", "errors")
+    op.drop_column("process_run", "error_count")
+    op.drop_column("process_run", "skipped_count")
+    op.drop_column("process_run", "started_count")
@@ -0,0 +1,26 @@
+"""add rpa_idempotency_key in_progress_until
+
+Revision ID: a6d2f8c4e1b7
+Revises: f3b8d6a1c9e4
+Create Date: 2025-07-02 14:26:08.903157
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "a6d2f8c4e1b7"
+down_revision = "f3b8d6a1c9e4"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Chaves IN_PROGRESS já gravadas ficam sem lease e seguem reservadas até expirar
+    op.add_column("rpa_idempotency_key", sa.Column("in_progress_until", sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("rpa_idempotency_key", "in_progress_until")
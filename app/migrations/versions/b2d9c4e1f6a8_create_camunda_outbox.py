@@ -0,0 +1,47 @@
+"""create camunda_outbox
+
+Revision ID: b2d9c4e1f6a8
+Revises: 8e3f5a0c7d21
+Create Date: 2025-06-16 09:12:40.218734
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "b2d9c4e1f6a8"
+down_revision = "8e3f5a0c7d21"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE SEQUENCE camunda_outbox_id_seq START WITH 1 INCREMENT BY 1")
+    op.create_table(
+        "camunda_outbox",
+        sa.Column("id", sa.Integer, primary_key=True, server_default=sa.text("nextval('camunda_outbox_id_seq')")),
+        sa.Column("dedup_key", sa.String(length=255), nullable=False),
+        sa.Column("process_instance_id", sa.String(length=255), nullable=False),
+        sa.Column("message_name", sa.String(length=255), nullable=False),
+        sa.Column("payload", sa.JSON, nullable=True),
+        sa.Column("event_data", sa.JSON, nullable=True),
+        sa.Column("status", sa.String(length=255), nullable=False),
+        sa.Column("attempts", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("last_error", sa.Text, nullable=True),
+        sa.Column("next_attempt_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("delivered_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index("ix_camunda_outbox_dedup_key", "camunda_outbox", ["dedup_key"], unique=True)
+    op.create_index("ix_camunda_outbox_process_instance_id", "camunda_outbox", ["process_instance_id"])
+    op.create_index("ix_camunda_outbox_status_next_attempt_at", "camunda_outbox", ["status", "next_attempt_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_camunda_outbox_status_next_attempt_at", table_name="camunda_outbox")
+    op.drop_index("ix_camunda_outbox_process_instance_id", table_name="camunda_outbox")
+    op.drop_index("ix_camunda_outbox_dedup_key", table_name="camunda_outbox")
+    op.drop_table("camunda_outbox")
+    op.execute("DROP SEQUENCE camunda_outbox_id_seq")
@@ -0,0 +1,44 @@
+"""create rpa_pending_task
+
+Revision ID: c5e8a1d3b7f2
+Revises: b2d9c4e1f6a8
+Create Date: 2025-06-18 15:47:03.662190
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "c5e8a1d3b7f2"
+down_revision = "b2d9c4e1f6a8"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE SEQUENCE rpa_pending_task_id_seq START WITH 1 INCREMENT BY 1")
+    op.create_table(
+        "rpa_pending_task",
+        sa.Column("id", sa.Integer, primary_key=True, server_default=sa.text("nextval('rpa_pending_task_id_seq')")),
+        sa.Column("process_id", sa.String(length=255), nullable=False),
+        sa.Column("token_retorno", sa.Text, nullable=False),
+        sa.Column("tipo_tarefa_rpa", sa.String(length=255), nullable=False),
+        sa.Column("event_source", sa.String(length=255), nullable=False),
+        sa.Column("process_data", sa.JSON, nullable=True),
+        sa.Column("attempts", sa.Integer, nullable=False, server_default="1"),
+        sa.Column("deadline_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+    )
+    op.create_index("ix_rpa_pending_task_process_id", "rpa_pending_task", ["process_id"])
+    op.create_index("ix_rpa_pending_task_token_retorno", "rpa_pending_task", ["token_retorno"], unique=True)
+    op.create_index("ix_rpa_pending_task_deadline_at", "rpa_pending_task", ["deadline_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_rpa_pending_task_deadline_at", table_name="rpa_pending_task")
+    op.drop_index("ix_rpa_pending_task_token_retorno", table_name="rpa_pending_task")
+    op.drop_index("ix_rpa_pending_task_process_id", table_name="rpa_pending_task")
+    op.drop_table("rpa_pending_task")
+    op.execute("DROP SEQUENCE rpa_pending_task_id_seq")
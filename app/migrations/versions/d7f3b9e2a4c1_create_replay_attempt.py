@@ -0,0 +1,44 @@
+"""create replay_attempt
+
+Revision ID: d7f3b9e2a4c1
+Revises: c5e8a1d3b7f2
+Create Date: 2025-06-23 10:12:41.318205
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = "d7f3b9e2a4c1"
+down_revision = "c5e8a1d3b7f2"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE SEQUENCE replay_attempt_id_seq START WITH 1 INCREMENT BY 1")
+    op.create_table(
+        "replay_attempt",
+        sa.Column("id", sa.Integer, primary_key=True, server_default=sa.text("nextval('replay_attempt_id_seq')")),
+        sa.Column("replay_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("event_log", sa.String(length=255), nullable=False),
+        sa.Column("event_id", sa.Integer, nullable=False),
+        sa.Column("process_id", sa.String(length=255), nullable=False),
+        sa.Column("dedup_key", sa.Text, nullable=False),
+        sa.Column("status", sa.String(length=255), nullable=False),
+        sa.Column("error", sa.Text, nullable=True),
+        sa.Column("result", sa.JSON, nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+    )
+    op.create_index("ix_replay_attempt_replay_id", "replay_attempt", ["replay_id"])
+    op.create_index("ix_replay_attempt_event_log_event_id", "replay_attempt", ["event_log", "event_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_replay_attempt_event_log_event_id", table_name="replay_attempt")
+    op.drop_index("ix_replay_attempt_replay_id", table_name="replay_attempt")
+    op.drop_table("replay_attempt")
+    op.execute("DROP SEQUENCE replay_attempt_id_seq")
@@ -0,0 +1,42 @@
+"""create rpa_idempotency_key
+
+Revision ID: e9a4c2f7b1d3
+Revises: d7f3b9e2a4c1
+Create Date: 2025-06-25 11:03:17.582941
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "e9a4c2f7b1d3"
+down_revision = "d7f3b9e2a4c1"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE SEQUENCE rpa_idempotency_key_id_seq START WITH 1 INCREMENT BY 1")
+    op.create_table(
+        "rpa_idempotency_key",
+        sa.Column(
+            "id", sa.Integer, primary_key=True, server_default=sa.text("nextval('rpa_idempotency_key_id_seq')")
+        ),
+        sa.Column("key", sa.Text, nullable=False),
+        sa.Column("request_hash", sa.String(length=64), nullable=False),
+        sa.Column("status", sa.String(length=255), nullable=False),
+        sa.Column("response", sa.JSON, nullable=True),
+        sa.Column("expires_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+    )
+    op.create_index("ix_rpa_idempotency_key_key", "rpa_idempotency_key", ["key"], unique=True)
+    op.create_index("ix_rpa_idempotency_key_expires_at", "rpa_idempotency_key", ["expires_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_rpa_idempotency_key_expires_at", table_name="rpa_idempotency_key")
+    op.drop_index("ix_rpa_idempotency_key_key", table_name="rpa_idempotency_key")
+    op.drop_table("rpa_idempotency_key")
+    op.execute("DROP SEQUENCE rpa_idempotency_key_id_seq")
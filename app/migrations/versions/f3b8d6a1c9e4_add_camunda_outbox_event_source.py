@@ -0,0 +1,30 @@
+"""add camunda_outbox event_source
+
+Revision ID: f3b8d6a1c9e4
+Revises: e9a4c2f7b1d3
+Create Date: 2025-06-30 09:41:52.317406
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "f3b8d6a1c9e4"
+down_revision = "e9a4c2f7b1d3"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # As mensagens gravadas até aqui vieram todas de webhooks da Melius
+    op.add_column(
+        "camunda_outbox",
+        sa.Column("event_source", sa.String(length=255), nullable=False, server_default="MELIUS"),
+    )
+    op.alter_column("camunda_outbox", "event_source", server_default=None)
+
+
+def downgrade() -> None:
+    op.drop_column("camunda_outbox", "event_source")
@@ -0,0 +1,38 @@
+import uuid
+from datetime import datetime
+from enum import Enum
+from typing import Optional
+
+from models.base import BaseModel
+from sqlmodel import JSON, Column, DateTime, Field, Index
+
+
+class ReplayEventLog(str, Enum):
+    PROCESS = "process_event_log"
+    RPA = "rpa_event_log"
+
+
+class ReplayAttemptStatus(str, Enum):
+    DISPATCHED = "dispatched"
+    ERROR = "error"
+    # Evento com a mesma chave de outro reenviado no mesmo replay
+    DUPLICATE = "duplicate"
+
+
+class ReplayAttempt(BaseModel, table=True):
+    """Tentativa de reenvio de um evento com erro, ligada ao evento original"""
+
+    __tablename__: str = "replay_attempt"
+    __table_args__ = (Index("ix_replay_attempt_event_log_event_id", "event_log", "event_id"),)
+
+    replay_id: uuid.UUID = Field(..., index=True, description="The replay that made the attempt")
+    event_log: str = Field(..., description="The table of the original event")
+    event_id: int = Field(..., description="The id of the original event")
+    process_id: str = Field(..., description="The process id of the original event")
+    dedup_key: str = Field(..., description="Events with the same key are replayed only once")
+    status: str = Field(..., description="The result of the attempt")
+    error: Optional[str] = Field(default=None, description="The error of a failed attempt")
+    result: dict = Field(default_factory=dict, sa_column=Column(JSON), description="The data of the new dispatch")
+    created_at: datetime = Field(
+        sa_column=Column(DateTime(timezone=True), nullable=False), default_factory=datetime.utcnow
+    )
@@ -1,7 +1,7 @@
 from datetime import datetime
 from enum import Enum
 
-from models.base import BaseModel
+from models.base import BaseModel, UUIDModel
 from sqlmodel import JSON, Column, DateTime, Field
 
 
@@ -19,3 +19,31 @@ class ProcessEventLog(BaseModel, table=True):
     event_type: str = Field(..., description="The type of the event")
     event_data: dict = Field(sa_column=Column(JSON), description="The data of the event")
     created_at: datetime = Field(sa_column=Column(DateTime(timezone=True), nullable=False))
+
+
+class ProcessRunStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+class ProcessRun(UUIDModel, table=True):
+    __tablename__: str = "process_run"
+
+    process_key: str = Field(..., description="The key of the process")
+    status: str = Field(default=ProcessRunStatus.QUEUED, description="The status of the run")
+    total_rows: int = Field(default=0, description="Number of customers in the process content")
+    total_chunks: int = Field(default=0, description="Number of work items the run was split into")
+    completed_chunks: int = Field(default=0, description="Number of work items already processed")
+    started_count: int = Field(default=0, description="Number of customers whose process was started")
+    skipped_count: int = Field(default=0, description="Number of customers skipped as not eligible")
+    error_count: int = Field(default=0, description="Number of customers that failed to start")
+    errors: list = Field(default_factory=list, sa_column=Column(JSON), description="Last error messages of the run")
+    run_data: dict = Field(default_factory=dict, sa_column=Column(JSON), description="The parameters of the run")
+    created_at: datetime = Field(
+        sa_column=Column(DateTime(timezone=True), nullable=False), default_factory=datetime.utcnow
+    )
+    updated_at: datetime = Field(
+        sa_column=Column(DateTime(timezone=True), nullable=False), default_factory=datetime.utcnow
+    )
@@ -1,8 +1,9 @@
 from datetime import datetime
 from enum import Enum
+from typing import Optional
 
 from models.base import BaseModel
-from sqlmodel import JSON, Column, DateTime, Field
+from sqlmodel import JSON, Column, DateTime, Field, Index
 
 
 class RPAEventTypes(str, Enum):
@@ -51,3 +52,75 @@ class RPAEventLog(BaseModel, table=True):
         model_dump.append(self.created_at.strftime("%Y-%m-%d %H:%M:%S"))
 
         return model_dump
+
+
+class CamundaOutboxStatus(str, Enum):
+    PENDING = "pending"
+    DELIVERED = "delivered"
+    FAILED = "failed"
+
+
+class CamundaOutbox(BaseModel, table=True):
+    """Mensagem a ser correlacionada no Camunda, gravada na mesma transação do webhook que a originou"""
+
+    __tablename__: str = "camunda_outbox"
+    __table_args__ = (Index("ix_camunda_outbox_status_next_attempt_at", "status", "next_attempt_at"),)
+
+    dedup_key: str = Field(..., unique=True, index=True, description="Webhook identity (task and token)")
+    process_instance_id: str = Field(..., index=True, description="The camunda process instance")
+    event_source: RPASource = Field(..., description="The RPA provider of the task")
+    message_name: str = Field(..., description="The name of the camunda message")
+    payload: dict = Field(sa_column=Column(JSON), description="The body of the camunda message request")
+    event_data: dict = Field(sa_column=Column(JSON), description="The data logged once the message is delivered")
+    status: str = Field(default=CamundaOutboxStatus.PENDING, description="The delivery status")
+    attempts: int = Field(default=0, description="Number of delivery attempts")
+    last_error: Optional[str] = Field(default=None, description="The error of the last failed attempt")
+    next_attempt_at: datetime = Field(
+        sa_column=Column(DateTime(timezone=True), nullable=False), default_factory=datetime.utcnow
+    )
+    created_at: datetime = Field(
+        sa_column=Column(DateTime(timezone=True), nullable=False), default_factory=datetime.utcnow
+    )
+    delivered_at: Optional[datetime] = Field(default=None, sa_column=Column(DateTime(timezone=True), nullable=True))
+
+
+class RPAPendingTask(BaseModel, table=True):
+    """Tarefa de RPA enviada e ainda sem retorno (webhook), com o prazo para recebê-lo"""
+
+    __tablename__: str = "rpa_pending_task"
+
+    process_id: str = Field(..., index=True, description="The camunda process instance (idTarefaCliente)")
+    token_retorno: str = Field(..., unique=True, index=True, description="The callback token of the dispatch")
+    tipo_tarefa_rpa: str = Field(..., description="The type of the RPA task")
+    event_source: RPASource = Field(..., description="The RPA provider")
+    process_data: dict = Field(sa_column=Column(JSON), description="The data needed to dispatch the task again")
+    attempts: int = Field(default=1, description="Number of dispatches of the task")
+    deadline_at: datetime = Field(sa_column=Column(DateTime(timezone=True), nullable=False, index=True))
+    created_at: datetime = Field(
+        sa_column=Column(DateTime(timezone=True), nullable=False), default_factory=datetime.utcnow
+    )
+
+
+class RPAIdempotencyStatus(str, Enum):
+    IN_PROGRESS = "in_progress"
+    COMPLETED = "completed"
+
+
+class RPAIdempotencyKey(BaseModel, table=True):
+    """Chave de idempotência de um início de RPA, com a resposta guardada até expirar"""
+
+    __tablename__: str = "rpa_idempotency_key"
+
+    key: str = Field(..., unique=True, index=True, description="Idempotency-Key header or task id and type")
+    request_hash: str = Field(..., description="Hash of the request body the key was first used with")
+    status: str = Field(default=RPAIdempotencyStatus.IN_PROGRESS, description="The status of the request")
+    response: Optional[dict] = Field(default=None, sa_column=Column(JSON), description="The stored response")
+    expires_at: datetime = Field(sa_column=Column(DateTime(timezone=True), nullable=False, index=True))
+    in_progress_until: Optional[datetime] = Field(
+        default=None,
+        sa_column=Column(DateTime(timezone=True), nullable=True),
+        description="End of the lease of an IN_PROGRESS key, after which another request can take it over",
+    )
+    created_at: datetime = Field(
+        sa_column=Column(DateTime(timezone=True), nullable=False), default_factory=datetime.utcnow
+    )
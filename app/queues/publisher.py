@@ -0,0 +1,160 @@
+"""Publicação de mensagens no SQS em lotes (SendMessageBatch)"""
+
+import hashlib
+import json
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Optional, Union
+
+from core.config import settings
+from core.exceptions import SQSPublishError
+from core.logging import setup_logger
+from helpers import sqs_utils
+
+
+logger = setup_logger(__name__)
+
+MAX_BATCH_ENTRIES = 10
+MAX_BATCH_BYTES = 256 * 1024
+
+# Recebe o corpo da mensagem e retorna o MessageGroupId / MessageDeduplicationId
+IdStrategy = Callable[[dict], str]
+
+
+def random_id(body: dict) -> str:
+    """Um id novo por mensagem: grupos independentes e nenhuma deduplicação"""
+    return str(uuid.uuid4())
+
+
+def content_id(body: dict) -> str:
+    """Hash do conteúdo: mensagens idênticas são deduplicadas pelo SQS"""
+    return hashlib.sha256(json.dumps(body, sort_keys=True).encode()).hexdigest()
+
+
+def fixed_id(value: str) -> IdStrategy:
+    """O mesmo id para todas as mensagens, ex: um único grupo com ordem garantida"""
+    return lambda body: value
+
+
+def key_id(*keys: str) -> IdStrategy:
+    """Id formado por campos do corpo, ex: key_id("run_id") agrupa as mensagens por execução"""
+    return lambda body: "-".join(str(body[key]) for key in keys)
+
+
+@dataclass
+class PublishResult:
+    """Resultado de uma publicação: ids das mensagens enviadas e erros das que falharam"""
+
+    message_ids: list[str] = field(default_factory=list)
+    errors: list[str] = field(default_factory=list)
+
+    @property
+    def sent(self) -> int:
+        return len(self.message_ids)
+
+    @property
+    def failed(self) -> int:
+        return len(self.errors)
+
+
+class SQSPublisher:
+    """Publica mensagens JSON em uma fila SQS usando SendMessageBatch.
+
+    As mensagens são agrupadas em lotes de até 10 entradas (e 256 KB), enviados em paralelo.
+    Entradas que falham por erro do SQS são reenviadas individualmente, com backoff; erros do
+    remetente (SenderFault) não são reenviados. Em filas FIFO, o grupo e a deduplicação de cada
+    mensagem são definidos pelas estratégias `group_id` e `deduplication_id`.
+    """
+
+    def __init__(
+        self,
+        queue_name: str,
+        group_id: Optional[Union[str, IdStrategy]] = None,
+        deduplication_id: IdStrategy = random_id,
+        max_retries: int = 3,
+        retry_backoff: float = 0.2,
+        max_workers: Optional[int] = None,
+    ):
+        self.queue_name = queue_name
+        self.fifo = queue_name.endswith(".fifo")
+        self.group_id = fixed_id(group_id) if isinstance(group_id, str) else group_id or random_id
+        self.deduplication_id = deduplication_id
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.max_workers = max_workers or settings.SQS_PUBLISHER_MAX_WORKERS
+
+    def send(self, body: dict) -> str:
+        """Publica uma única mensagem, retornando seu id"""
+        result = self.publish([body])
+        if result.errors:
+            raise SQSPublishError(f"Error sending message to {self.queue_name}: {result.errors[0]}")
+        return result.message_ids[0]
+
+    def publish(self, bodies: Iterable[dict]) -> PublishResult:
+        """Publica as mensagens em lotes, retornando os ids enviados e os erros das entradas que falharam"""
+        batches = list(self._build_batches(bodies))
+        result = PublishResult()
+        if not batches:
+            return result
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(batches))) as executor:
+            for batch_result in executor.map(self._send_batch, batches):
+                result.message_ids.extend(batch_result.message_ids)
+                result.errors.extend(batch_result.errors)
+
+        if result.errors:
+            logger.error(f"{result.failed} messages failed to be sent to {self.queue_name}: {result.errors[:5]}")
+        return result
+
+    def _build_entry(self, index: int, body: dict) -> dict:
+        entry = {"Id": str(index), "MessageBody": sqs_utils.encode_message_body(body)}
+        if self.fifo:
+            entry["MessageGroupId"] = self.group_id(body)
+            entry["MessageDeduplicationId"] = self.deduplication_id(body)
+        return entry
+
+    def _build_batches(self, bodies: Iterable[dict]) -> Iterable[list[dict]]:
+        batch: list[dict] = []
+        batch_bytes = 0
+        for index, body in enumerate(bodies):
+            entry = self._build_entry(index, body)
+            entry_bytes = len(entry["MessageBody"].encode())
+            if batch and (len(batch) == MAX_BATCH_ENTRIES or batch_bytes + entry_bytes > MAX_BATCH_BYTES):
+                yield batch
+                batch, batch_bytes = [], 0
+            batch.append(entry)
+            batch_bytes += entry_bytes
+        if batch:
+            yield batch
+
+    def _send_batch(self, entries: list[dict]) -> PublishResult:
+        result = PublishResult()
+        queue_url = sqs_utils.get_queue_url(self.queue_name)
+        pending = entries
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                time.sleep(self.retry_backoff * 2 ** (attempt - 1))
+
+            try:
+                response = sqs_utils.get_sqs_client().send_message_batch(QueueUrl=queue_url, Entries=pending)
+            except Exception as e:
+                if attempt == self.max_retries:
+                    result.errors.extend(f"{entry['Id']}: {e}" for entry in pending)
+                continue
+
+            result.message_ids.extend(item["MessageId"] for item in response.get("Successful", []))
+            entries_by_id = {entry["Id"]: entry for entry in pending}
+            pending = []
+            for failure in response.get("Failed", []):
+                error = f"{failure['Id']}: {failure.get('Code')} {failure.get('Message', '')}".strip()
+                if failure.get("SenderFault") or attempt == self.max_retries:
+                    result.errors.append(error)
+                else:
+                    pending.append(entries_by_id[failure["Id"]])
+
+            if not pending:
+                break
+
+        return result
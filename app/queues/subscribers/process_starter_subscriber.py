@@ -1,8 +1,12 @@
 import json
+import uuid
 from typing import Any, Dict
 
 from queues.subscribers.sqs import SQSSubscriber
+from schemas.camunda_schema import ProcessChunkMessage
 from service.camunda.base import start_process
+from service.camunda.fan_out import fan_out_process, start_process_chunk
+from service.camunda.jobs import run_process_job
 from sqlalchemy.orm import Session
 
 
@@ -11,13 +15,34 @@ class ProcessStarterSubscriber(SQSSubscriber):
 
     async def process_message(self, message: Dict[str, Any], db_session: Session) -> None:
         """Process a message from the queue.
+
+        Supported bodies:
+            {"process_key": ..., "customers": [...], "parameters": {...}}: runs the process, optionally only for
+                the given customer ids and overriding process variables. Large bodies arrive through an S3 claim check,
+                already resolved by SQSSubscriber.handle_message
+            {"process_key": ..., "fan_out": true, "chunk_size": ...}: splits the run into chunk work items
+            {"process_key": ..., "run_id": ...}: runs a job enqueued by the process-message API
+            {"process_key": ..., "run_id": ..., "row_start": ..., "row_end": ...}: runs a chunk work item
         Args:
             message: The message to process.
         """
         try:
-            process_key = json.loads(message["Body"])["process_key"]
+            body = json.loads(message["Body"])
 
-            await start_process(process_key, db_session, self.logger)
+            if "row_start" in body:
+                await start_process_chunk(ProcessChunkMessage.model_validate(body), db_session, self.logger)
+            elif "run_id" in body:
+                await run_process_job(uuid.UUID(body["run_id"]), db_session, self.logger)
+            elif body.get("fan_out"):
+                await fan_out_process(body["process_key"], db_session, self.logger, chunk_size=body.get("chunk_size"))
+            else:
+                await start_process(
+                    body["process_key"],
+                    db_session,
+                    self.logger,
+                    customer_ids=body.get("customers"),
+                    parameters=body.get("parameters"),
+                )
         except Exception as e:
             self.logger.error(f"Error in ProcessStarterSubscriber: {str(e)}")
             raise
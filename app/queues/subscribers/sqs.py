@@ -6,6 +6,7 @@ from botocore.config import Config
 from core.config import settings
 from core.logging import setup_logger
 from db.session import get_session
+from helpers import sqs_utils
 from sqlalchemy.orm import Session
 
 
@@ -68,6 +69,26 @@ class SQSSubscriber:
             self.logger.error(f"Error deleting message: {str(e)}")
             raise
 
+    async def handle_message(self, message: Dict[str, Any]) -> None:
+        """Resolve, process and delete a message (and its claim check) from the queue."""
+        self.logger.info(f"Processing message: {message.get('MessageId')}")
+        body, claim_check = sqs_utils.resolve_message_body(message["Body"])
+        if claim_check:
+            self.logger.info(f"Resolved claim check s3://{claim_check['bucket']}/{claim_check['key']}")
+            message = {**message, "Body": body}
+
+        for db_session in get_session():
+            await self.process_message(message, db_session)
+            db_session.commit()
+            await self.delete_message(message["ReceiptHandle"])
+
+        if claim_check:
+            try:
+                sqs_utils.delete_claim_check(claim_check)
+            except Exception as e:
+                # A mensagem já foi removida da fila, então a falha na limpeza não deve reprocessá-la
+                self.logger.error(f"Error deleting claim check {claim_check['key']}: {str(e)}")
+
     async def receive_messages(self) -> Optional[list]:
         """Receive messages from the queue."""
         try:
@@ -106,11 +127,7 @@ class SQSSubscriber:
 
                 for message in messages:
                     try:
-                        self.logger.info(f"Processing message: {message.get('MessageId')}")
-                        for db_session in get_session():
-                            await self.process_message(message, db_session)
-                            db_session.commit()
-                            await self.delete_message(message["ReceiptHandle"])
+                        await self.handle_message(message)
                     except Exception as e:
                         self.logger.error(f"Error handling message: {str(e)}")
                         # Continue processing other messages
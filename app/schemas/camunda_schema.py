@@ -1,10 +1,97 @@
-from pydantic import BaseModel
+import datetime
+import uuid
+from typing import Optional
+
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class ProcessKeyRequest(BaseModel):
     process_key: str
+    dry_run: bool = False
+    sample_size: int = Field(default=5, ge=0, le=100)
+    fan_out: bool = False
+
+
+class ProcessChunkMessage(BaseModel):
+    """Item de trabalho de uma execução particionada (fan-out)"""
+
+    process_key: str
+    run_id: uuid.UUID
+    content_version: Optional[str] = None
+    content_etag: Optional[str] = None
+    row_start: int
+    row_end: int
+    # Posição em bytes da primeira linha e cabeçalho do conteúdo, quando o intervalo pode ser lido a partir do meio
+    content_offset: Optional[int] = None
+    content_header: Optional[list[str]] = None
 
 
 class Event(BaseModel):
     event_type: str
     event_data: dict
+
+
+class PayloadSizeDistribution(BaseModel):
+    """Distribuição do tamanho (em bytes) dos payloads enviados ao Camunda"""
+
+    count: int = 0
+    total_bytes: int = 0
+    min_bytes: int = 0
+    max_bytes: int = 0
+    mean_bytes: float = 0
+    p50_bytes: int = 0
+    p95_bytes: int = 0
+    p99_bytes: int = 0
+
+    @classmethod
+    def from_sizes(cls, sizes: list[int]) -> "PayloadSizeDistribution":
+        if not sizes:
+            return cls()
+
+        sizes = sorted(sizes)
+
+        def percentile(p: float) -> int:
+            return sizes[min(len(sizes) - 1, int(p * len(sizes)))]
+
+        return cls(
+            count=len(sizes),
+            total_bytes=sum(sizes),
+            min_bytes=sizes[0],
+            max_bytes=sizes[-1],
+            mean_bytes=sum(sizes) / len(sizes),
+            p50_bytes=percentile(0.50),
+            p95_bytes=percentile(0.95),
+            p99_bytes=percentile(0.99),
+        )
+
+
+class ProcessPlan(BaseModel):
+    """Resultado da simulação (dry-run) de um processo"""
+
+    process_key: str
+    total: int
+    eligible: int
+    skipped: int
+    errors: int
+    sample_payloads: list[dict]
+    payload_sizes: PayloadSizeDistribution
+    timings: dict[str, float] = Field(description="Tempo (em segundos) gasto em cada etapa")
+
+
+class ProcessJobResponse(BaseModel):
+    """Status de uma execução (job) de processo"""
+
+    job_id: uuid.UUID = Field(validation_alias="ref_id")
+    process_key: str
+    status: str
+    total_rows: int
+    total_chunks: int
+    completed_chunks: int
+    started_count: int
+    skipped_count: int
+    error_count: int
+    errors: list[str]
+    created_at: datetime.datetime
+    updated_at: datetime.datetime
+
+    model_config = ConfigDict(from_attributes=True)
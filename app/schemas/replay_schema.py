@@ -0,0 +1,53 @@
+import datetime
+import uuid
+from enum import Enum
+from typing import Optional
+
+from pydantic import BaseModel, ConfigDict, Field
+
+
+class ReplaySource(str, Enum):
+    """Eventos com erro que podem ser reenviados"""
+
+    # START_ERROR do process_event_log: o processo é iniciado de novo com o payload registrado no erro
+    PROCESS = "process"
+    # START_ERROR (reenvio ao provedor) e FINISH_WITH_ERROR (reenvio ao Camunda) do rpa_event_log
+    RPA = "rpa"
+
+
+class ReplayRequest(BaseModel):
+    source: ReplaySource
+    created_from: datetime.datetime
+    created_to: Optional[datetime.datetime] = None
+    process_key: Optional[str] = Field(
+        default=None, description="Chave do processo (process) ou tipo da tarefa RPA (rpa)"
+    )
+    error_pattern: Optional[str] = Field(
+        default=None, description="Expressão regular (sem diferenciar maiúsculas) buscada no erro do evento"
+    )
+    limit: Optional[int] = Field(default=None, ge=1)
+    dry_run: bool = False
+    force: bool = Field(default=False, description="Reenvia também os eventos já reenviados com sucesso")
+
+
+class ReplayResponse(BaseModel):
+    replay_id: uuid.UUID
+    dry_run: bool
+    selected: int
+    duplicates: int
+    # Vazios enquanto o replay executa em background; acompanhe as tentativas em GET /api/audit/replay/{replay_id}
+    dispatched: Optional[int] = None
+    errors: Optional[int] = None
+
+
+class ReplayAttemptResponse(BaseModel):
+    event_log: str
+    event_id: int
+    process_id: str
+    dedup_key: str
+    status: str
+    error: Optional[str] = None
+    result: dict
+    created_at: datetime.datetime
+
+    model_config = ConfigDict(from_attributes=True)
@@ -1,7 +1,7 @@
 from enum import IntEnum
 from typing import Any
 
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
 from pydantic.alias_generators import to_camel
 
 
@@ -9,6 +9,29 @@ class MeliusProcessRequest(BaseModel):
     process_data: dict
 
 
+class MeliusBatchProcessRequest(BaseModel):
+    items: list[dict] = Field(..., min_length=1)
+
+
+class MeliusBatchItemResult(BaseModel):
+    id_tarefa_cliente: str
+    success: bool
+    response: dict | None = None
+    error: str | None = None
+
+
+class MeliusBatchResponse(BaseModel):
+    started: int
+    failed: int
+    results: list[MeliusBatchItemResult]
+
+
+class OutboxLagResponse(BaseModel):
+    pending: int
+    failed: int
+    oldest_pending_seconds: float
+
+
 class StatusTarefaRpa(IntEnum):
     """
     Status da tarefa RPA
@@ -0,0 +1,380 @@
+"""Reenvio (replay) em massa de eventos com erro.
+
+Seleciona os eventos com erro do process_event_log (START_ERROR) ou do rpa_event_log
+(START_ERROR e FINISH_WITH_ERROR) por período, chave de processo e padrão de erro, agrupa os
+eventos repetidos pela sua chave e reenvia apenas o mais recente de cada grupo:
+
+- START_ERROR de processos: o processo é iniciado de novo no Camunda com o payload registrado no erro,
+  em paralelo e com rate limit
+- START_ERROR de RPAs: a tarefa é enviada de novo ao provedor, em paralelo e com rate limit
+- FINISH_WITH_ERROR de RPAs: a mensagem é gravada de novo na outbox do Camunda
+
+Cada evento recebe uma tentativa (ReplayAttempt) ligada a ele, gravada assim que o evento é reenviado;
+eventos já reenviados com sucesso não são selecionados de novo, a menos que o replay seja forçado.
+"""
+
+import asyncio
+import datetime
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional, Union
+
+from api.deps import DBSession
+from core.config import settings
+from core.logging import setup_logger
+from db.session import get_session_maker
+from fastapi import BackgroundTasks
+from models.audit import ReplayAttempt, ReplayAttemptStatus, ReplayEventLog
+from models.camunda import ProcessEventLog, ProcessEventTypes
+from models.rpa import RPAEventLog, RPAEventTypes
+from schemas.replay_schema import ReplayRequest, ReplaySource
+from service.camunda.base import get_process_starter, request_process_start
+from service.rpa import outbox, providers
+from sqlalchemy import exists, func, select
+
+
+logger = setup_logger(__name__)
+
+EventLog = Union[ProcessEventLog, RPAEventLog]
+
+
+@dataclass
+class ReplayItem:
+    """Eventos com a mesma chave; apenas o primeiro (o mais recente) é reenviado"""
+
+    dedup_key: str
+    events: list[EventLog]
+    status: str = ReplayAttemptStatus.DISPATCHED
+    error: Optional[str] = None
+    result: dict = field(default_factory=dict)
+
+    @property
+    def event(self) -> EventLog:
+        return self.events[0]
+
+    def fail(self, error: str) -> None:
+        self.status = ReplayAttemptStatus.ERROR
+        self.error = error
+
+
+def select_failed_events(db_session: DBSession, request: ReplayRequest) -> list[EventLog]:
+    """Eventos com erro que atendem aos filtros, do mais recente para o mais antigo"""
+    if request.source == ReplaySource.PROCESS:
+        model, event_log = ProcessEventLog, ReplayEventLog.PROCESS
+        conditions = [ProcessEventLog.event_type == ProcessEventTypes.START_ERROR]
+        if request.process_key:
+            conditions.append(ProcessEventLog.process_id == request.process_key)
+    else:
+        model, event_log = RPAEventLog, ReplayEventLog.RPA
+        conditions = [RPAEventLog.event_type.in_([RPAEventTypes.START_ERROR, RPAEventTypes.FINISH_WITH_ERROR])]  # type: ignore
+        if request.process_key:
+            # O START_ERROR guarda a tarefa em process_data_request; o FINISH_WITH_ERROR, os dados do START
+            task_type = func.coalesce(
+                RPAEventLog.event_data.op("->>")("tipoTarefaRpa"),  # type: ignore
+                RPAEventLog.event_data.op("->")("process_data_request").op("->>")("tipoTarefaRpa"),  # type: ignore
+            )
+            conditions.append(task_type == request.process_key)
+
+    conditions.append(model.created_at >= request.created_from)  # type: ignore
+    if request.created_to:
+        conditions.append(model.created_at < request.created_to)  # type: ignore
+    if request.error_pattern:
+        # Todos os eventos com erro guardam a mensagem do erro em "error"
+        conditions.append(model.event_data.op("->>")("error").op("~*")(request.error_pattern))  # type: ignore
+    if not request.force:
+        conditions.append(
+            ~exists().where(
+                ReplayAttempt.event_log == event_log,
+                ReplayAttempt.event_id == model.id,
+                ReplayAttempt.status.in_([ReplayAttemptStatus.DISPATCHED, ReplayAttemptStatus.DUPLICATE]),  # type: ignore
+            )
+        )
+
+    limit = min(request.limit or settings.REPLAY_MAX_EVENTS, settings.REPLAY_MAX_EVENTS)
+    stmt = select(model).where(*conditions).order_by(model.created_at.desc(), model.id.desc()).limit(limit)  # type: ignore
+    return list(db_session.execute(stmt).scalars().all())
+
+
+def _group(keyed_events: list[tuple[str, EventLog]]) -> list[ReplayItem]:
+    items: dict[str, ReplayItem] = {}
+    for dedup_key, event in keyed_events:
+        if dedup_key in items:
+            items[dedup_key].events.append(event)
+        else:
+            items[dedup_key] = ReplayItem(dedup_key=dedup_key, events=[event])
+    return list(items.values())
+
+
+def group_process_events(db_session: DBSession, events: list[ProcessEventLog]) -> list[ReplayItem]:
+    """Agrupa os erros de início de processo por processo e cliente"""
+    by_process: dict[str, list[ProcessEventLog]] = defaultdict(list)
+    for event in events:
+        by_process[event.process_id].append(event)
+
+    items = []
+    for process_key, process_events in by_process.items():
+        try:
+            process = get_process_starter(process_key, db_session, logger)
+            keyed = [
+                (f"{process_key}:{process.get_audit_customer_id(event.event_data)}", event) for event in process_events
+            ]
+        except Exception as e:
+            # Sem o processo (ou o cliente) não há como reenviar: cada evento vira uma tentativa com erro
+            for event in process_events:
+                item = ReplayItem(dedup_key=f"{process_key}:{event.id}", events=[event])
+                item.fail(f"Can't identify the customers of process {process_key}: {e}")
+                items.append(item)
+            continue
+        items.extend(_group(keyed))
+    return items
+
+
+def _rpa_dedup_key(event: RPAEventLog) -> str:
+    if event.event_type == RPAEventTypes.START_ERROR:
+        task_type = (event.event_data.get("process_data_request") or {}).get("tipoTarefaRpa", "")
+        return f"{event.event_source.value}:{event.process_id}:{task_type}:start"
+    message_name = (event.event_data.get("camunda_request") or {}).get("messageName", "")
+    return f"{event.event_source.value}:{event.process_id}:{message_name}:finish"
+
+
+def group_rpa_events(events: list[RPAEventLog]) -> list[ReplayItem]:
+    """Agrupa os erros de RPA por tarefa e etapa (envio ao provedor ou retorno ao Camunda)"""
+    return _group([(_rpa_dedup_key(event), event) for event in events])
+
+
+class _SessionWorker:
+    """Executa o trabalho com a sessão fora do event loop, um de cada vez, já que a sessão não é thread-safe"""
+
+    def __init__(self, db_session: DBSession):
+        self.db_session = db_session
+        self._lock = asyncio.Lock()
+
+    async def run(self, func: Callable[..., None], *args: Any) -> None:
+        async with self._lock:
+            await asyncio.to_thread(func, self.db_session, *args)
+
+
+async def restart_process(item: ReplayItem) -> None:
+    """Inicia de novo no Camunda o processo do cliente, com o payload registrado no START_ERROR"""
+    event = item.event
+    payload = event.event_data.get("payload")
+    if not payload:
+        item.fail("Event without the start payload (payload)")
+        return
+
+    try:
+        process_instance_id = await asyncio.to_thread(request_process_start, event.process_id, payload)
+    except Exception as e:
+        item.fail(str(e))
+        return
+
+    item.result = {"process_instance_id": process_instance_id}
+
+
+def _record_process_start(db_session: DBSession, replay_id: uuid.UUID, item: ReplayItem) -> None:
+    """Grava o START do processo reiniciado no mesmo commit das tentativas do item"""
+    if item.status != ReplayAttemptStatus.ERROR:
+        db_session.add(
+            ProcessEventLog(
+                process_id=item.result["process_instance_id"],
+                event_type=ProcessEventTypes.START,
+                event_data=item.event.event_data["payload"],
+                created_at=datetime.datetime.now(),
+            )
+        )
+    _record_attempts(db_session, replay_id, ReplayEventLog.PROCESS, item)
+
+
+async def replay_process_starts(db_session: DBSession, items: list[ReplayItem], replay_id: uuid.UUID) -> None:
+    """Reinicia os processos em paralelo e com rate limit, gravando a tentativa de cada um assim que termina"""
+    semaphore = asyncio.Semaphore(settings.REPLAY_CONCURRENCY)
+    rate_limiter = providers.RateLimiter(settings.REPLAY_RATE_LIMIT)
+    session = _SessionWorker(db_session)
+
+    async def replay(item: ReplayItem) -> None:
+        async with semaphore:
+            if item.status != ReplayAttemptStatus.ERROR:
+                await rate_limiter.acquire()
+                await restart_process(item)
+            await session.run(_record_process_start, replay_id, item)
+
+    await asyncio.gather(*(replay(item) for item in items))
+
+
+def requeue_finish(db_session: DBSession, item: ReplayItem, replay_id: uuid.UUID) -> None:
+    """Grava de novo na outbox a mensagem do retorno que o Camunda não recebeu"""
+    event = item.event
+    camunda_request = event.event_data.get("camunda_request")
+    if not camunda_request:
+        item.fail("Event without the Camunda message (camunda_request)")
+        return
+
+    dedup_key = f"replay:{replay_id}:{event.id}"
+    event_data = {
+        key: value
+        for key, value in event.event_data.items()
+        if key not in ("error", "response_content", "camunda_request")
+    }
+    outbox.enqueue_message(
+        db_session,
+        dedup_key=dedup_key,
+        process_instance_id=event.process_id,
+        event_source=event.event_source,
+        message_name=camunda_request.get("messageName", ""),
+        payload=camunda_request,
+        event_data=event_data,
+    )
+    item.result = {"outbox_dedup_key": dedup_key}
+
+
+def _record_rpa_replay(
+    db_session: DBSession, replay_id: uuid.UUID, item: ReplayItem, dispatch: Optional[providers.RPADispatch]
+) -> None:
+    """Grava o novo envio ao provedor (ou a mensagem na outbox) no mesmo commit das tentativas do item"""
+    if item.event.event_type != RPAEventTypes.START_ERROR:
+        requeue_finish(db_session, item, replay_id)
+    elif dispatch is not None:
+        providers.save_dispatch(db_session, dispatch)
+        db_session.flush()
+        item.result = {"event_type": dispatch.event_log.event_type, "event_id": dispatch.event_log.id}
+        if dispatch.error:
+            item.fail(dispatch.error)
+    _record_attempts(db_session, replay_id, ReplayEventLog.RPA, item)
+
+
+async def replay_rpa_events(db_session: DBSession, items: list[ReplayItem], replay_id: uuid.UUID) -> None:
+    """Reenvia as tarefas aos provedores, em paralelo e com rate limit, e os retornos à outbox do Camunda"""
+    semaphore = asyncio.Semaphore(settings.REPLAY_CONCURRENCY)
+    rate_limiter = providers.RateLimiter(settings.REPLAY_RATE_LIMIT)
+    session = _SessionWorker(db_session)
+
+    async def redispatch(item: ReplayItem) -> Optional[providers.RPADispatch]:
+        event = item.event
+        process_data = event.event_data.get("process_data_request")
+        if not process_data:
+            item.fail("Event without the task data (process_data_request)")
+            return None
+
+        try:
+            provider = providers.get_provider(event.event_source)
+        except Exception as e:
+            item.fail(str(e))
+            return None
+
+        process_data = {key: value for key, value in process_data.items() if key not in provider.DISPATCH_FIELDS}
+        async with semaphore:
+            await rate_limiter.acquire()
+            return await provider.dispatch(process_data)
+
+    async def replay(item: ReplayItem) -> None:
+        dispatch = await redispatch(item) if item.event.event_type == RPAEventTypes.START_ERROR else None
+        await session.run(_record_rpa_replay, replay_id, item, dispatch)
+
+    await asyncio.gather(*(replay(item) for item in items))
+
+
+def _record_attempts(db_session: DBSession, replay_id: uuid.UUID, event_log: str, item: ReplayItem) -> None:
+    """Grava (com commit) a tentativa de cada evento do item, logo após o seu reenvio"""
+    now = datetime.datetime.utcnow()
+    for position, event in enumerate(item.events):
+        duplicate = position > 0 and item.status == ReplayAttemptStatus.DISPATCHED
+        db_session.add(
+            ReplayAttempt(
+                replay_id=replay_id,
+                event_log=event_log,
+                event_id=event.id,  # type: ignore
+                process_id=event.process_id,
+                dedup_key=item.dedup_key,
+                status=ReplayAttemptStatus.DUPLICATE if duplicate else item.status,
+                error=item.error,
+                result={"replayed_event_id": item.event.id} if duplicate else item.result,
+                created_at=now,
+            )
+        )
+    db_session.commit()
+
+
+@dataclass
+class PreparedReplay:
+    """Eventos selecionados e agrupados de um replay, ainda não reenviados"""
+
+    replay_id: uuid.UUID
+    request: ReplayRequest
+    selected: int
+    items: list[ReplayItem]
+
+    def summary(self, finished: bool = True) -> dict:
+        """Resumo do replay; sem os contadores de reenvio enquanto ele executa em background"""
+        errors = sum(1 for item in self.items if item.status == ReplayAttemptStatus.ERROR)
+        return {
+            "replay_id": self.replay_id,
+            "dry_run": self.request.dry_run,
+            "selected": self.selected,
+            "duplicates": self.selected - len(self.items),
+            "dispatched": (0 if self.request.dry_run else len(self.items) - errors) if finished else None,
+            "errors": errors if finished else None,
+        }
+
+
+def prepare_replay(db_session: DBSession, request: ReplayRequest) -> PreparedReplay:
+    """Seleciona e deduplica os eventos com erro"""
+    replay_id = uuid.uuid4()
+    events = select_failed_events(db_session, request)
+    # Os commits de cada tentativa (ou a sessão do request, no replay em background) não afetam os eventos
+    for event in events:
+        db_session.expunge(event)
+
+    if request.source == ReplaySource.PROCESS:
+        items = group_process_events(db_session, events)  # type: ignore
+    else:
+        items = group_rpa_events(events)  # type: ignore
+
+    logger.info(f"Replay {replay_id}: {len(events)} {request.source.value} events in {len(items)} replays")
+    return PreparedReplay(replay_id=replay_id, request=request, selected=len(events), items=items)
+
+
+async def run_replay(db_session: DBSession, replay: PreparedReplay) -> None:
+    """Reenvia os eventos do replay, registrando uma tentativa por evento"""
+    if replay.request.source == ReplaySource.PROCESS:
+        await replay_process_starts(db_session, replay.items, replay.replay_id)
+    else:
+        await replay_rpa_events(db_session, replay.items, replay.replay_id)
+    logger.info(f"Replay {replay.replay_id} finished: {replay.summary()}")
+
+
+def run_replay_in_background(replay: PreparedReplay) -> None:
+    """Executa o replay com uma sessão própria, fora do request (executado no threadpool pelo FastAPI)"""
+    SessionLocal = get_session_maker()
+    with SessionLocal() as db_session:
+        try:
+            asyncio.run(run_replay(db_session, replay))
+        except Exception as e:
+            # As tentativas já gravadas ficam disponíveis em GET /api/audit/replay/{replay_id}
+            logger.error(f"Error running replay {replay.replay_id}: {e}")
+
+
+async def replay_failed_events(db_session: DBSession, request: ReplayRequest) -> dict:
+    """Seleciona, deduplica e reenvia os eventos com erro, aguardando o fim do reenvio"""
+    replay = await asyncio.to_thread(prepare_replay, db_session, request)
+    if not request.dry_run and replay.items:
+        await run_replay(db_session, replay)
+    return replay.summary()
+
+
+async def schedule_replay(db_session: DBSession, request: ReplayRequest, background_tasks: BackgroundTasks) -> dict:
+    """Seleciona e deduplica os eventos no request e agenda o reenvio em background, sem aguardá-lo.
+    O dry run e os replays sem eventos retornam o resumo completo na hora.
+    """
+    replay = await asyncio.to_thread(prepare_replay, db_session, request)
+    if request.dry_run or not replay.items:
+        return replay.summary()
+
+    background_tasks.add_task(run_replay_in_background, replay)
+    logger.info(f"Replay {replay.replay_id} scheduled")
+    return replay.summary(finished=False)
+
+
+def get_replay_attempts(db_session: DBSession, replay_id: uuid.UUID) -> list[ReplayAttempt]:
+    stmt = select(ReplayAttempt).where(ReplayAttempt.replay_id == replay_id).order_by(ReplayAttempt.id)  # type: ignore
+    return list(db_session.execute(stmt).scalars().all())
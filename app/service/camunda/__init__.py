@@ -1,4 +1,4 @@
-from service.camunda.fechamento_folha import fechamento_folha_3
+from service.camunda.fechamento_folha import fechamento_folha, fechamento_folha_3
 
 
-__all__ = ["fechamento_folha_3"]
+__all__ = ["fechamento_folha", "fechamento_folha_3"]
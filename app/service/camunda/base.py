@@ -1,70 +1,303 @@
 import datetime
+import json
 import logging
+import time
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Any, Iterable, Iterator, Optional, Union
 
 import requests
 from api.deps import DBSession
 from core.config import settings
 from core.exceptions import ObjectNotFound
+from helpers import s3_utils
 from models.camunda import ProcessEventLog, ProcessEventTypes
+from schemas.camunda_schema import PayloadSizeDistribution, ProcessPlan
 from service import camunda
+from service.camunda import runs
+from service.camunda.eligibility import EligibilityRules, materialize_dicts
+from service.camunda.records import CustomerRecord, RowSchema
+
+
+# Cliente do processo: registro tipado quando o processo declara um ROW_SCHEMA, `dict` caso contrário
+CustomerData = Union[CustomerRecord, dict]
+
+
+@dataclass(frozen=True)
+class ProcessRunContext:
+    """Valores constantes durante uma execução do processo.
+
+    Calculado uma única vez por execução e repassado para a montagem das variáveis de cada cliente,
+    garantindo que todos os clientes de uma mesma execução recebam as mesmas datas.
+    """
+
+    started_at: datetime.datetime
+    values: dict[str, Any] = field(default_factory=dict)
+    variables_template: dict[str, dict[str, Any]] = field(default_factory=dict)
+
+    def build_variables(self, customer_variables: dict[str, dict[str, Any]]) -> dict[str, dict[str, Any]]:
+        """Combina as variáveis constantes da execução com as variáveis do cliente"""
+        return {**self.variables_template, **customer_variables}
+
+
+@dataclass
+class ProcessProgress:
+    """Contadores de progresso de uma execução ainda não persistidos"""
+
+    started: int = 0
+    skipped: int = 0
+    errors: int = 0
+    error_messages: list[str] = field(default_factory=list)
+
+    @property
+    def processed(self) -> int:
+        return self.started + self.skipped + self.errors
+
+
+def camunda_variable(value: Any) -> dict[str, Any]:
+    """Converte um valor em uma variável tipada do Camunda"""
+    if isinstance(value, bool):
+        return {"value": value, "type": "boolean"}
+    if isinstance(value, int):
+        return {"value": value, "type": "integer"}
+    if isinstance(value, float):
+        return {"value": value, "type": "double"}
+    if isinstance(value, (dict, list)):
+        return {"value": json.dumps(value), "type": "json"}
+    return {"value": value, "type": "string"}
+
+
+def request_process_start(process_key: str, payload: dict) -> str:
+    """Inicia o processo no Camunda do ambiente (PROD ou DEV), retornando o id da instância"""
+    url = f"{settings.CAMUNDA_ENGINE_URL}/process-definition/key/{process_key}/start"
+    if settings.ENV == "production":
+        headers = {
+            "Content-Type": "application/json",
+            "X-API-Key": settings.CAMUNDA_API_TOKEN,
+        }
+        response = requests.post(url, headers=headers, json=payload)
+    else:
+        headers = {
+            "Content-Type": "application/json",
+        }
+        response = requests.post(
+            url,
+            headers=headers,
+            json=payload,
+            auth=(settings.CAMUNDA_USERNAME, settings.CAMUNDA_PASSWORD),
+        )
+
+    response.raise_for_status()
+
+    return response.json()["id"]
 
 
 class CamundaProcessStarter:
     """Base class para processos Camunda"""
 
+    # Regras declarativas aplicadas coluna a coluna sobre o conteúdo, antes de materializar as linhas
+    ELIGIBILITY_RULES: Optional[EligibilityRules] = None
+    # Colunas do conteúdo usadas pelo processo; quando informado, apenas estas são lidas (projeção no Parquet)
+    CONTENT_COLUMNS: Optional[list[str]] = None
+    # Esquema das linhas; quando informado, os clientes são materializados como registros tipados
+    ROW_SCHEMA: Optional[RowSchema] = None
+
     def __init__(self, process_key: str, db_session: DBSession, logger: logging.Logger):
         self.process_key = process_key
         self.db_session = db_session
         self.logger = logger
+        # Versão do conteúdo carregado (ex: VersionId do S3), usada para que todos os chunks de uma execução
+        # leiam exatamente o mesmo arquivo
+        self.content_version: Optional[str] = None
+        # ETag do conteúdo, que também fixa a leitura em buckets sem versionamento
+        self.content_etag: Optional[str] = None
+        # Execução (job) à qual o progresso deste processo é reportado
+        self.run_id: Optional[uuid.UUID] = None
+        self.progress = ProcessProgress()
+        # Subconjunto de clientes e variáveis da execução, quando informados na mensagem de início
+        self.customer_ids: Optional[frozenset[str]] = None
+        self.parameter_variables: dict[str, dict[str, Any]] = {}
+
+    def set_run_parameters(self, customer_ids: Optional[Iterable[str]] = None, parameters: Optional[dict] = None):
+        """Restringe a execução a um subconjunto de clientes e sobrescreve variáveis do processo"""
+        self.customer_ids = frozenset(customer_ids) if customer_ids is not None else None
+        self.parameter_variables = {name: camunda_variable(value) for name, value in (parameters or {}).items()}
 
-    def is_eligible(self, customer_data: dict):
+    def is_eligible(self, customer_data: CustomerData):
         """Verifica se o cliente atual é elegível para iniciar este processo"""
         return True
 
+    def fetch_process_data(self) -> Any:
+        """Carrega os dados brutos do processo (ex: objeto do S3)"""
+        raise NotImplementedError("This method should be implemented to fetch the process data")
+
+    def parse_process_content(self, process_data: Any) -> Iterable[CustomerData]:
+        """Converte os dados brutos do processo em uma lista de clientes"""
+        raise NotImplementedError("This method should be implemented to parse the process data")
+
+    def get_content_source(self) -> Optional[str]:
+        """Identifica a origem do conteúdo (ex: s3://bucket/key), usada para compartilhar a leitura entre processos"""
+        return None
+
+    def iter_content_batches(
+        self, process_data: Any, columns: Optional[list[str]] = None
+    ) -> Iterable[s3_utils.ColumnBatch]:
+        """Lê os dados brutos do processo em lotes colunares, com as colunas informadas ou as do processo"""
+        raise NotImplementedError("This method should be implemented to read the process data in batches")
+
+    def get_content_columns(self) -> Optional[list[str]]:
+        """Retorna as colunas lidas do conteúdo, incluindo as do esquema e as das regras de elegibilidade"""
+        if self.CONTENT_COLUMNS is None and self.ROW_SCHEMA is None:
+            return None
+
+        columns = list(self.CONTENT_COLUMNS or [])
+        if self.ROW_SCHEMA is not None:
+            columns += [column for column in self.ROW_SCHEMA.columns if column not in columns]
+        if self.ELIGIBILITY_RULES is not None:
+            columns += sorted(self.ELIGIBILITY_RULES.columns - set(columns))
+        return columns
+
+    def select_eligible_rows(self, batches: Iterable[s3_utils.ColumnBatch]) -> Iterator[CustomerData]:
+        """Materializa apenas as linhas que atendem às regras de elegibilidade do processo"""
+        rules = self.ELIGIBILITY_RULES or EligibilityRules()
+        return rules.filter(batches, self.materialize_rows)
+
+    def materialize_rows(self, batch: s3_utils.ColumnBatch, indexes: list[int]) -> Iterable[CustomerData]:
+        """Monta os clientes das linhas `indexes` do lote, tipados quando o processo declara um ROW_SCHEMA"""
+        if self.ROW_SCHEMA is None:
+            return materialize_dicts(batch, indexes)
+        return self.ROW_SCHEMA.materialize(batch, indexes)
+
+    def get_customer_id(self, customer_data: CustomerData) -> str:
+        """Identificador do cliente usado nos logs e na auditoria"""
+        if isinstance(customer_data, CustomerRecord):
+            return customer_data.customer_id
+        return customer_data["cnpj"]
+
+    def get_audit_customer_id(self, audit_data: dict) -> str:
+        """Identificador do cliente a partir dos dados registrados na auditoria (ex: no reprocessamento de erros)"""
+        if self.ROW_SCHEMA is not None:
+            return str(audit_data[self.ROW_SCHEMA.customer_id_column])
+        return self.get_customer_id(audit_data)
+
+    def get_audit_data(self, customer_data: CustomerData) -> dict:
+        """Dados do cliente registrados na auditoria"""
+        if isinstance(customer_data, CustomerRecord):
+            return customer_data.as_dict()
+        return customer_data
+
     def get_process_content(self):
         """Retorna o conteúdo do processo"""
-        raise NotImplementedError("This method should be implemented to return the process content")
+        return self.parse_process_content(self.fetch_process_data())
+
+    def split_process_content(self, rows_per_range: int) -> list[s3_utils.ContentRange]:
+        """Divide o conteúdo em intervalos de linhas para o fan-out.
+        Sobrescreva este método (e `get_process_content_range`) se o conteúdo puder ser lido a partir do meio.
+        """
+        total_rows = sum(1 for _ in self.get_process_content())
+        return [
+            s3_utils.ContentRange(row_start, min(row_start + rows_per_range, total_rows))
+            for row_start in range(0, total_rows, rows_per_range)
+        ]
+
+    def get_process_content_range(self, content_range: s3_utils.ContentRange) -> Iterable[CustomerData]:
+        """Retorna as linhas de um intervalo gerado por `split_process_content`"""
+        return islice(self.get_process_content(), content_range.row_start, content_range.row_end)
+
+    def get_run_context(self) -> ProcessRunContext:
+        """Retorna os valores constantes da execução.
+        Sobrescreva este método para pré-calcular datas e variáveis que não dependem do cliente.
+        """
+        return ProcessRunContext(started_at=datetime.datetime.now())
+
+    def build_payload(self, customer_data: CustomerData, run_context: ProcessRunContext) -> dict:
+        """Monta o payload de início do processo no Camunda"""
+        variables = self.get_process_variables(customer_data, run_context)
+        if self.parameter_variables:
+            variables = {**variables, **self.parameter_variables}
+        return {
+            "variables": variables,
+            "businessKey": self.get_business_key(customer_data),
+        }
 
-    def start_process(self):
-        current_env = settings.ENV
+    def start_process(self, process_content: Optional[Iterable[CustomerData]] = None):
+        run_context = self.get_run_context()
+        if process_content is None:
+            process_content = self.get_process_content()
 
-        process_content = self.get_process_content()
         for customer_data in process_content:
-            self.logger.info(f"Starting process {self.process_key} for customer {customer_data['cnpj']}")
-            try:
-                if not self.is_eligible(customer_data):
-                    skip_message = (
-                        f"Customer {customer_data['cnpj']} is not eligible to start process {self.process_key}"
-                    )
-                    self.logger.info(skip_message)
-                    self.audit_event(customer_data["cnpj"], ProcessEventTypes.SKIPPED, {"message": skip_message})
-                    continue
+            self.start_customer_process(customer_data, run_context)
 
-                if current_env == "production":
-                    self.start_production_process(customer_data)
-                else:
-                    self.start_dev_process(customer_data)
+        self.flush_progress()
 
-                self.db_session.commit()
-            except requests.HTTPError as e:
-                self.logger.error(
-                    f"Error starting process {self.process_key} for customer {customer_data['cnpj']}: {e} | {e.response.text} | Headers: {e.response.request.headers}"  # noqa: E501
-                )
-            except Exception as e:
-                self.logger.error(
-                    f"Error starting process {self.process_key} for customer {customer_data['cnpj']}: {e}"
-                )
-                self.db_session.rollback()
-                self.db_session.add(
-                    ProcessEventLog(
-                        process_id=self.process_key,
-                        event_type=ProcessEventTypes.START_ERROR,
-                        event_data=customer_data,
-                        created_at=datetime.datetime.now(),
-                    )
+    def start_customer_process(self, customer_data: CustomerData, run_context: ProcessRunContext):
+        """Inicia o processo para um cliente, registrando o resultado no progresso e na auditoria"""
+        customer_id = self.get_customer_id(customer_data)
+        if self.customer_ids is not None and customer_id not in self.customer_ids:
+            return
+
+        self.logger.info(f"Starting process {self.process_key} for customer {customer_id}")
+        payload = None
+        try:
+            if not self.is_eligible(customer_data):
+                skip_message = f"Customer {customer_id} is not eligible to start process {self.process_key}"
+                self.logger.info(skip_message)
+                self.audit_event(customer_id, ProcessEventTypes.SKIPPED, {"message": skip_message})
+                self.progress.skipped += 1
+            else:
+                payload = self.build_payload(customer_data, run_context)
+                process_id = request_process_start(self.process_key, payload)
+                self.audit_event(process_id, ProcessEventTypes.START, payload)
+                self.logger.info(
+                    f"Process {self.process_key} started in Camunda {settings.ENV} for customer {customer_id}"
                 )
+                self.db_session.commit()
+                self.progress.started += 1
+        except requests.HTTPError as e:
+            self.logger.error(
+                f"Error starting process {self.process_key} for customer {customer_id}: {e} | {e.response.text} | Headers: {e.response.request.headers}"  # noqa: E501
+            )
+            self.audit_start_error(customer_data, e, payload)
+            self.register_error(customer_data, e)
+        except Exception as e:
+            self.logger.error(f"Error starting process {self.process_key} for customer {customer_id}: {e}")
+            self.audit_start_error(customer_data, e, payload)
+            self.register_error(customer_data, e)
+
+        if self.progress.processed >= settings.PROCESS_PROGRESS_FLUSH_ROWS:
+            self.flush_progress()
+
+    def audit_start_error(self, customer_data: CustomerData, error: Exception, payload: Optional[dict]):
+        """Registra o erro de início com os dados do cliente, a mensagem do erro e o payload, usado no replay"""
+        self.db_session.rollback()
+        event_data = {**self.get_audit_data(customer_data), "error": str(error)}
+        if payload is not None:
+            event_data["payload"] = payload
+        self.db_session.add(
+            ProcessEventLog(
+                process_id=self.process_key,
+                event_type=ProcessEventTypes.START_ERROR,
+                event_data=event_data,
+                created_at=datetime.datetime.now(),
+            )
+        )
+
+    def register_error(self, customer_data: CustomerData, error: Exception):
+        """Contabiliza um erro no progresso da execução"""
+        self.progress.errors += 1
+        self.progress.error_messages.append(f"{self.get_customer_id(customer_data)}: {error}")
 
-    def get_business_key(self, customer_data: dict):
+    def flush_progress(self):
+        """Persiste o progresso acumulado na execução (job), caso exista"""
+        if self.run_id is not None and self.progress.processed:
+            runs.record_progress(self.db_session, self.run_id, self.progress)
+            self.db_session.commit()
+
+        self.progress = ProcessProgress()
+
+    def get_business_key(self, customer_data: CustomerData):
         """Usa o process_key como business key por padrão.
         Sobreescreva este método caso queira criar um business key único para seu processo.
         """
@@ -82,78 +315,134 @@ class CamundaProcessStarter:
         )
         self.db_session.commit()
 
-    def start_production_process(self, customer_data: dict):
-        """Inicia o processo em PROD"""
-        url = f"{settings.CAMUNDA_ENGINE_URL}/process-definition/key/{self.process_key}/start"
-        headers = {
-            "Content-Type": "application/json",
-            "X-API-Key": settings.CAMUNDA_API_TOKEN,
-        }
-        variables = self.get_process_variables(customer_data)
+    def get_process_variables(self, data: CustomerData, run_context: ProcessRunContext):
+        """Retorna as variaveis do processo"""
+        self.logger.info(f"Empty process variables for {self.process_key}")
+        return {}
 
-        payload = {
-            "variables": variables,
-            "businessKey": self.get_business_key(customer_data),
-        }
+    def plan_process(self, sample_size: int = 5) -> ProcessPlan:
+        """Simula a execução do processo sem enviar nada ao Camunda.
 
-        response = requests.post(
-            url,
-            headers=headers,
-            json=payload,
-        )
+        Carrega o conteúdo, avalia a elegibilidade e monta todos os payloads, medindo o tempo de cada etapa.
+        """
+        timings: dict[str, float] = defaultdict(float)
+        started_at = time.perf_counter()
+        total = skipped = errors = 0
+        payload_sizes: list[int] = []
+        sample_payloads: list[dict] = []
 
-        response.raise_for_status()
+        run_context = self.get_run_context()
 
-        process_id = response.json()["id"]
+        stage_started_at = time.perf_counter()
+        process_data = self.fetch_process_data()
+        timings["s3_fetch"] = time.perf_counter() - stage_started_at
 
-        self.audit_event(process_id, ProcessEventTypes.START, payload)
+        for rows_read, selected_rows in self.iter_plan_rows(process_data, timings):
+            total += rows_read
+            skipped += rows_read - len(selected_rows)
 
-        self.logger.info(
-            f"Process {self.process_key} started in Camunda PRODUCTION for customer {customer_data['cnpj']}"
-        )
+            for customer_data in selected_rows:
+                stage_started_at = time.perf_counter()
+                eligible = self.is_eligible(customer_data)
+                timings["eligibility"] += time.perf_counter() - stage_started_at
+                if not eligible:
+                    skipped += 1
+                    continue
 
-    def start_dev_process(self, customer_data: dict):
-        """Inicia o processo em DEV"""
-        url = f"{settings.CAMUNDA_ENGINE_URL}/process-definition/key/{self.process_key}/start"
-        headers = {
-            "Content-Type": "application/json",
-        }
-        variables = self.get_process_variables(customer_data)
+                stage_started_at = time.perf_counter()
+                try:
+                    payload = self.build_payload(customer_data, run_context)
+                except Exception as e:
+                    self.logger.error(f"Error building payload of process {self.process_key}: {e}")
+                    errors += 1
+                    continue
+                finally:
+                    timings["variable_build"] += time.perf_counter() - stage_started_at
 
-        payload = {
-            "variables": variables,
-            "businessKey": self.get_business_key(customer_data),
-        }
+                payload_sizes.append(len(json.dumps(payload)))
+                if len(sample_payloads) < sample_size:
+                    sample_payloads.append(payload)
 
-        response = requests.post(
-            url,
-            headers=headers,
-            json=payload,
-            auth=(settings.CAMUNDA_USERNAME, settings.CAMUNDA_PASSWORD),
+        timings["total"] = time.perf_counter() - started_at
+
+        return ProcessPlan(
+            process_key=self.process_key,
+            total=total,
+            eligible=total - skipped,
+            skipped=skipped,
+            errors=errors,
+            sample_payloads=sample_payloads,
+            payload_sizes=PayloadSizeDistribution.from_sizes(payload_sizes),
+            timings=timings,
         )
 
-        response.raise_for_status()
+    def iter_plan_rows(self, process_data: Any, timings: dict[str, float]) -> Iterator[tuple[int, list[CustomerData]]]:
+        """Lê o conteúdo para o plano, retornando as linhas lidas e os clientes que passaram nas ELIGIBILITY_RULES.
 
-        process_id = response.json()["id"]
+        Com regras declaradas os lotes colunares são lidos aqui mesmo, para contar as linhas descartadas pelas
+        regras e medir a seleção separadamente ("eligibility") da leitura e materialização ("parse").
+        """
+        rules = self.ELIGIBILITY_RULES
+        if rules is None:
+            process_content: Iterator[CustomerData] = iter(self.parse_process_content(process_data))
+            while True:
+                stage_started_at = time.perf_counter()
+                customer_data = next(process_content, None)
+                timings["parse"] += time.perf_counter() - stage_started_at
+                if customer_data is None:
+                    return
+                yield 1, [customer_data]
 
-        self.audit_event(process_id, ProcessEventTypes.START, payload)
+        batches = iter(self.iter_content_batches(process_data))
+        while True:
+            stage_started_at = time.perf_counter()
+            batch = next(batches, None)
+            timings["parse"] += time.perf_counter() - stage_started_at
+            if batch is None:
+                return
 
-        self.logger.info(f"Process {self.process_key} started in Camunda DEV for customer {customer_data['cnpj']}")
+            stage_started_at = time.perf_counter()
+            rules.validate(batch.header)
+            indexes = rules.select(batch)
+            timings["eligibility"] += time.perf_counter() - stage_started_at
+
+            stage_started_at = time.perf_counter()
+            selected_rows = list(self.materialize_rows(batch, indexes))
+            timings["parse"] += time.perf_counter() - stage_started_at
+            yield batch.size, selected_rows
 
-    def get_process_variables(self, data: dict):
-        """Retorna as variaveis do processo"""
-        self.logger.info(f"Empty process variables for {self.process_key}")
-        return {}
 
+def get_process_starter(process_key: str, db_session: DBSession, logger: logging.Logger) -> CamundaProcessStarter:
+    """Retorna a instância do processo registrado com a chave informada"""
+    if not hasattr(camunda, process_key):
+        raise ObjectNotFound(f"Process {process_key} not found")
 
-async def start_process(process_key: str, db_session: DBSession, logger: logging.Logger):
-    """Inicia um processo por sua chave"""
+    return getattr(camunda, process_key)(db_session=db_session, logger=logger)
+
+
+async def start_process(
+    process_key: str,
+    db_session: DBSession,
+    logger: logging.Logger,
+    customer_ids: Optional[list[str]] = None,
+    parameters: Optional[dict] = None,
+):
+    """Inicia um processo por sua chave, opcionalmente para um subconjunto de clientes e com variáveis extras"""
     logger.info(f"Starting process with key: {process_key}")
     try:
-        if not hasattr(camunda, process_key):
-            raise ObjectNotFound(f"Process {process_key} not found")
-
-        process: CamundaProcessStarter = getattr(camunda, process_key)(db_session=db_session, logger=logger)
+        process = get_process_starter(process_key, db_session, logger)
+        process.set_run_parameters(customer_ids, parameters)
         process.start_process()
     except Exception as e:
         logger.error(f"Error starting process {process_key}: {e}")
+
+
+async def plan_process(process_key: str, db_session: DBSession, logger: logging.Logger, sample_size: int = 5):
+    """Simula o início de um processo por sua chave, sem enviar nada ao Camunda"""
+    logger.info(f"Planning process with key: {process_key}")
+
+    process = get_process_starter(process_key, db_session, logger)
+    plan = process.plan_process(sample_size=sample_size)
+
+    logger.info(f"Process {process_key} plan: {plan.total} customers, {plan.eligible} eligible, {plan.errors} errors")
+    return plan
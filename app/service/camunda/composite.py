@@ -0,0 +1,82 @@
+"""Execução de vários processos a partir de uma única leitura do conteúdo"""
+
+import logging
+import uuid
+from typing import Iterable, Optional
+
+from api.deps import DBSession
+from core.exceptions import CoreSaidaOrchestratorException
+from service.camunda.base import CamundaProcessStarter
+
+
+class CompositeProcessStarter:
+    """Inicia vários processos que compartilham o mesmo arquivo de entrada.
+
+    O conteúdo é baixado e lido uma única vez; cada lote é roteado para todos os processos, que aplicam
+    suas próprias regras de elegibilidade e mantêm sua própria auditoria e progresso.
+    """
+
+    PROCESSES: list[type[CamundaProcessStarter]] = []
+
+    def __init__(
+        self,
+        db_session: DBSession,
+        logger: logging.Logger,
+        processes: Optional[list[CamundaProcessStarter]] = None,
+    ):
+        self.db_session = db_session
+        self.logger = logger
+        self.processes = processes or [process(db_session=db_session, logger=logger) for process in self.PROCESSES]
+        self.process_key = ",".join(process.process_key for process in self.processes)
+        self.content_version: Optional[str] = None
+        self.run_id: Optional[uuid.UUID] = None
+
+        if not self.processes:
+            raise CoreSaidaOrchestratorException("Composite process without processes")
+        content_sources = {process.get_content_source() for process in self.processes}
+        if len(content_sources) > 1 or None in content_sources:
+            raise CoreSaidaOrchestratorException(f"Processes {self.process_key} don't share the same content source")
+
+    def set_run_parameters(self, customer_ids: Optional[Iterable[str]] = None, parameters: Optional[dict] = None):
+        for process in self.processes:
+            process.set_run_parameters(customer_ids, parameters)
+
+    def get_content_columns(self) -> Optional[list[str]]:
+        """União das colunas lidas pelos processos; None (todas) se algum processo não as declara"""
+        columns: list[str] = []
+        for process in self.processes:
+            process_columns = process.get_content_columns()
+            if process_columns is None:
+                return None
+            columns += [column for column in process_columns if column not in columns]
+        return columns
+
+    def start_process(self):
+        reader = self.processes[0]
+        reader.content_version = self.content_version
+        process_data = reader.fetch_process_data()
+        self.content_version = reader.content_version
+
+        run_contexts = []
+        for process in self.processes:
+            process.content_version = self.content_version
+            process.run_id = self.run_id
+            run_contexts.append((process, process.get_run_context()))
+
+        for batch in reader.iter_content_batches(process_data, self.get_content_columns()):
+            for process, run_context in run_contexts:
+                for customer_data in process.select_eligible_rows([batch]):
+                    process.start_customer_process(customer_data, run_context)
+
+        for process in self.processes:
+            process.flush_progress()
+
+        self.logger.info(f"Processes {self.process_key} started from a single read of {reader.get_content_source()}")
+
+    def get_process_content(self):
+        raise CoreSaidaOrchestratorException(f"Composite process {self.process_key} can't be fanned out")
+
+    def plan_process(self, sample_size: int = 5):
+        raise CoreSaidaOrchestratorException(
+            f"Composite process {self.process_key} can't be planned, plan each process separately"
+        )
@@ -0,0 +1,182 @@
+"""Regras de elegibilidade declarativas, avaliadas coluna a coluna.
+
+Os processos declaram a elegibilidade como predicados sobre colunas do arquivo de entrada.
+Cada predicado é avaliado sobre a coluna inteira de um lote, e apenas as linhas que atendem
+a todos os predicados são materializadas como `dict`. Colunas lidas de Parquet chegam como
+arrays do Arrow e são avaliadas com o pyarrow.compute, sem converter os valores para Python.
+"""
+
+import datetime
+from typing import Any, Callable, Iterable, Iterator, Optional, Union
+
+import pyarrow as pa
+import pyarrow.compute as pc
+from helpers import s3_utils
+
+
+# Resultado de um predicado: uma lista de bool (colunas em lista) ou um array booleano do Arrow
+Mask = Union[list[bool], pa.BooleanArray]
+
+
+class ColumnPredicate:
+    """Predicado avaliado sobre os valores de uma coluna"""
+
+    def __init__(self, column: str):
+        self.column = column
+
+    def evaluate(self, values: s3_utils.ColumnValues) -> Mask:
+        raise NotImplementedError("This method should be implemented to evaluate the column values")
+
+
+def _value_set(values: Iterable[str]) -> pa.Array:
+    return pa.array(sorted(values), pa.string())
+
+
+class InSet(ColumnPredicate):
+    """Valor da coluna pertence ao conjunto informado"""
+
+    def __init__(self, column: str, values: Iterable[str]):
+        super().__init__(column)
+        self.values = frozenset(values)
+        self.value_set = _value_set(self.values)
+
+    def evaluate(self, values: s3_utils.ColumnValues) -> Mask:
+        if not isinstance(values, list):
+            return pc.is_in(values, value_set=self.value_set)
+        included = self.values
+        return [value in included for value in values]
+
+
+class NotInSet(InSet):
+    """Valor da coluna não pertence ao conjunto informado"""
+
+    def evaluate(self, values: s3_utils.ColumnValues) -> Mask:
+        if not isinstance(values, list):
+            return pc.invert(pc.is_in(values, value_set=self.value_set))
+        excluded = self.values
+        return [value not in excluded for value in values]
+
+
+class ValueMap(ColumnPredicate):
+    """Mapeia cada valor da coluna para a elegibilidade, usando `default` para valores não mapeados"""
+
+    def __init__(self, column: str, mapping: dict[str, bool], default: bool = False):
+        super().__init__(column)
+        self.mapping = mapping
+        self.default = default
+        # Apenas os valores com resultado diferente do default precisam ser procurados
+        self.value_set = _value_set(value for value, eligible in mapping.items() if eligible != default)
+
+    def evaluate(self, values: s3_utils.ColumnValues) -> Mask:
+        if not isinstance(values, list):
+            differs = pc.is_in(values, value_set=self.value_set)
+            return pc.invert(differs) if self.default else differs
+        mapping_get, default = self.mapping.get, self.default
+        return [mapping_get(value, default) for value in values]
+
+
+class DateRule(ColumnPredicate):
+    """Aplica uma regra sobre a data contida na coluna.
+
+    Cada valor distinto é convertido e avaliado uma única vez por lote, já que as datas se repetem
+    muito entre os clientes. Valores vazios ou inválidos usam `default`.
+    """
+
+    def __init__(
+        self,
+        column: str,
+        rule: Callable[[datetime.date], bool],
+        date_format: str = "%d/%m/%Y",
+        default: bool = False,
+    ):
+        super().__init__(column)
+        self.rule = rule
+        self.date_format = date_format
+        self.default = default
+
+    def _evaluate_value(self, value: str) -> bool:
+        try:
+            return self.rule(datetime.datetime.strptime(value, self.date_format).date())
+        except ValueError:
+            return self.default
+
+    def evaluate(self, values: s3_utils.ColumnValues) -> Mask:
+        if not isinstance(values, list):
+            accepted = [value for value in values.unique().to_pylist() if self._evaluate_value(value)]
+            return pc.is_in(values, value_set=_value_set(accepted))
+        results = {value: self._evaluate_value(value) for value in set(values)}
+        return [results[value] for value in values]
+
+    @classmethod
+    def between(
+        cls,
+        column: str,
+        start: Optional[datetime.date] = None,
+        end: Optional[datetime.date] = None,
+        **kwargs: Any,
+    ) -> "DateRule":
+        """Data dentro do intervalo [start, end]; limites não informados ficam em aberto"""
+        return cls(
+            column,
+            lambda date: (start is None or date >= start) and (end is None or date <= end),
+            **kwargs,
+        )
+
+
+class EligibilityRules:
+    """Conjunto de predicados que uma linha precisa atender para ser elegível"""
+
+    def __init__(self, *predicates: ColumnPredicate):
+        self.predicates = predicates
+
+    @property
+    def columns(self) -> set[str]:
+        return {predicate.column for predicate in self.predicates}
+
+    def validate(self, header: list[str]) -> None:
+        missing_columns = self.columns - set(header)
+        if missing_columns:
+            raise ValueError(f"Missing eligibility columns: {', '.join(sorted(missing_columns))}")
+
+    def select(self, batch: s3_utils.ColumnBatch) -> list[int]:
+        """Retorna os índices das linhas do lote que atendem a todos os predicados"""
+        selected: Optional[list[int]] = None
+        for predicate in self.predicates:
+            values = batch.columns[predicate.column]
+            if selected is not None:
+                # Avalia apenas as linhas que sobreviveram aos predicados anteriores
+                values = (
+                    [values[index] for index in selected]
+                    if isinstance(values, list)
+                    else values.take(pa.array(selected, pa.int64()))
+                )
+
+            mask = predicate.evaluate(values)
+            if isinstance(mask, list):
+                kept = [position for position, keep in enumerate(mask) if keep]
+            else:
+                kept = pc.indices_nonzero(mask).to_pylist()
+            selected = kept if selected is None else [selected[position] for position in kept]
+
+            if not selected:
+                return []
+
+        return list(range(batch.size)) if selected is None else selected
+
+    def filter(
+        self,
+        batches: Iterable[s3_utils.ColumnBatch],
+        materialize: Optional[Callable[[s3_utils.ColumnBatch, list[int]], Iterable[Any]]] = None,
+    ) -> Iterator[Any]:
+        """Materializa apenas as linhas elegíveis de cada lote, como `dict` por padrão"""
+        materialize = materialize or materialize_dicts
+        for batch in batches:
+            self.validate(batch.header)
+            yield from materialize(batch, self.select(batch))
+
+
+def materialize_dicts(batch: s3_utils.ColumnBatch, indexes: list[int]) -> Iterator[dict]:
+    """Monta um `dict` por linha selecionada do lote"""
+    columns = [s3_utils.take_values(batch.columns[column], indexes) for column in batch.header]
+    for row in zip(*columns, strict=True):
+        yield dict(zip(batch.header, row, strict=True))
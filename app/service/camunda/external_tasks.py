@@ -0,0 +1,215 @@
+"""Workers de external tasks do Camunda.
+
+Cada ExternalTaskWorker faz long polling no `fetchAndLock` dos tópicos assinados, executa os
+handlers das tarefas em paralelo (limitado por CAMUNDA_EXTERNAL_TASK_CONCURRENCY), renova o
+lock das tarefas em execução e as completa, ou registra a falha, assim que terminam.
+O throughput escala com a quantidade de workers (CAMUNDA_EXTERNAL_TASK_WORKERS).
+"""
+
+import asyncio
+import json
+import os
+import socket
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Optional
+
+import httpx
+from core.config import settings
+from core.logging import setup_logger
+
+
+logger = setup_logger(__name__)
+
+
+@dataclass
+class ExternalTask:
+    """External task bloqueada para o worker, como retornada pelo fetchAndLock"""
+
+    id: str
+    topic_name: str
+    process_instance_id: str
+    business_key: Optional[str] = None
+    retries: Optional[int] = None
+    variables: dict = field(default_factory=dict)
+
+    @classmethod
+    def from_response(cls, data: dict) -> "ExternalTask":
+        return cls(
+            id=data["id"],
+            topic_name=data["topicName"],
+            process_instance_id=data["processInstanceId"],
+            business_key=data.get("businessKey"),
+            retries=data.get("retries"),
+            variables=data.get("variables") or {},
+        )
+
+    def get_variable(self, name: str, default: Any = None) -> Any:
+        """Valor da variável, com variáveis do tipo Json já convertidas"""
+        variable = self.variables.get(name)
+        if variable is None:
+            return default
+        if variable.get("type") == "Json" and isinstance(variable.get("value"), str):
+            return json.loads(variable["value"])
+        return variable.get("value")
+
+
+TaskHandler = Callable[[ExternalTask], Awaitable[Optional[dict]]]
+
+
+class ExternalTaskClient:
+    """Cliente assíncrono da API de external tasks do Camunda, com conexões reaproveitadas"""
+
+    def __init__(self, worker_id: str):
+        self.worker_id = worker_id
+        headers = {"Content-Type": "application/json"}
+        auth = None
+        if settings.ENV == "production":
+            headers["X-API-Key"] = settings.CAMUNDA_API_TOKEN
+        else:
+            auth = httpx.BasicAuth(settings.CAMUNDA_USERNAME, settings.CAMUNDA_PASSWORD)
+
+        # O timeout de leitura cobre a espera do long polling
+        long_polling_timeout = settings.CAMUNDA_EXTERNAL_TASK_LONG_POLLING_TIMEOUT / 1000
+        self.client = httpx.AsyncClient(
+            base_url=settings.CAMUNDA_ENGINE_URL,
+            headers=headers,
+            auth=auth,
+            timeout=httpx.Timeout(long_polling_timeout + 30.0, connect=5.0),
+            limits=httpx.Limits(max_connections=settings.CAMUNDA_EXTERNAL_TASK_CONCURRENCY + 1),
+        )
+
+    async def fetch_and_lock(self, topics: list[str], max_tasks: int) -> list[ExternalTask]:
+        response = await self.client.post(
+            "/external-task/fetchAndLock",
+            json={
+                "workerId": self.worker_id,
+                "maxTasks": max_tasks,
+                "usePriority": True,
+                "asyncResponseTimeout": settings.CAMUNDA_EXTERNAL_TASK_LONG_POLLING_TIMEOUT,
+                "topics": [
+                    {"topicName": topic, "lockDuration": settings.CAMUNDA_EXTERNAL_TASK_LOCK_DURATION}
+                    for topic in topics
+                ],
+            },
+        )
+        response.raise_for_status()
+        return [ExternalTask.from_response(data) for data in response.json()]
+
+    async def extend_lock(self, task: ExternalTask) -> None:
+        response = await self.client.post(
+            f"/external-task/{task.id}/extendLock",
+            json={"workerId": self.worker_id, "newDuration": settings.CAMUNDA_EXTERNAL_TASK_LOCK_DURATION},
+        )
+        response.raise_for_status()
+
+    async def complete(self, task: ExternalTask, variables: Optional[dict] = None) -> None:
+        response = await self.client.post(
+            f"/external-task/{task.id}/complete",
+            json={"workerId": self.worker_id, "variables": variables or {}},
+        )
+        response.raise_for_status()
+
+    async def handle_failure(self, task: ExternalTask, error: Exception) -> None:
+        retries = settings.CAMUNDA_EXTERNAL_TASK_RETRIES if task.retries is None else task.retries
+        response = await self.client.post(
+            f"/external-task/{task.id}/failure",
+            json={
+                "workerId": self.worker_id,
+                "errorMessage": str(error)[:666],
+                "errorDetails": repr(error),
+                "retries": max(retries - 1, 0),
+                "retryTimeout": settings.CAMUNDA_EXTERNAL_TASK_RETRY_TIMEOUT,
+            },
+        )
+        response.raise_for_status()
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+
+class ExternalTaskWorker:
+    """Executa as external tasks dos tópicos assinados, cada tópico com seu handler.
+
+    O handler recebe a tarefa e retorna as variáveis (já no formato do Camunda) usadas para
+    completá-la. Se o handler levantar uma exceção, a falha é registrada no Camunda, que
+    decrementa as retentativas da tarefa.
+    """
+
+    def __init__(self, handlers: dict[str, TaskHandler], worker_id: Optional[str] = None):
+        self.handlers = handlers
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.max_tasks = settings.CAMUNDA_EXTERNAL_TASK_MAX_TASKS
+        self.concurrency = settings.CAMUNDA_EXTERNAL_TASK_CONCURRENCY
+        self.client = ExternalTaskClient(self.worker_id)
+        self.running = False
+        self._executions: set[asyncio.Task] = set()
+        self._polling: Optional[asyncio.Task] = None
+
+    async def poll(self) -> int:
+        """Busca e inicia a execução de novas tarefas, respeitando as vagas livres do worker"""
+        free_slots = self.concurrency - len(self._executions)
+        if free_slots <= 0:
+            await asyncio.wait(self._executions, return_when=asyncio.FIRST_COMPLETED)
+            return 0
+
+        tasks = await self.client.fetch_and_lock(list(self.handlers), min(self.max_tasks, free_slots))
+        for task in tasks:
+            execution = asyncio.create_task(self.execute(task))
+            self._executions.add(execution)
+            execution.add_done_callback(self._executions.discard)
+
+        return len(tasks)
+
+    async def drain(self) -> None:
+        """Aguarda o término das tarefas em execução"""
+        if self._executions:
+            await asyncio.gather(*self._executions, return_exceptions=True)
+
+    async def execute(self, task: ExternalTask) -> None:
+        lock_extender = asyncio.create_task(self._extend_lock(task))
+        try:
+            variables = await self.handlers[task.topic_name](task)
+        except Exception as e:
+            logger.error(f"Error handling external task {task.id} ({task.topic_name}): {e}")
+            await self._report(self.client.handle_failure(task, e), task)
+        else:
+            await self._report(self.client.complete(task, variables), task)
+        finally:
+            lock_extender.cancel()
+
+    async def _report(self, request: Awaitable[None], task: ExternalTask) -> None:
+        try:
+            await request
+        except Exception as e:
+            # O lock expira e a tarefa volta a ser entregue pelo Camunda
+            logger.error(f"Error reporting external task {task.id} to Camunda: {e}")
+
+    async def _extend_lock(self, task: ExternalTask) -> None:
+        """Renova o lock da tarefa na metade da sua duração, enquanto o handler executa"""
+        while True:
+            await asyncio.sleep(settings.CAMUNDA_EXTERNAL_TASK_LOCK_DURATION / 2000)
+            try:
+                await self.client.extend_lock(task)
+            except Exception as e:
+                logger.error(f"Error extending lock of external task {task.id}: {e}")
+
+    async def start(self) -> None:
+        self.running = True
+        self._polling = asyncio.current_task()
+        logger.info(f"Starting external task worker {self.worker_id} for topics {list(self.handlers)}")
+
+        while self.running:
+            try:
+                await self.poll()
+            except Exception as e:
+                logger.error(f"Error fetching external tasks: {e}")
+                await asyncio.sleep(settings.CAMUNDA_EXTERNAL_TASK_ERROR_BACKOFF)
+
+    async def stop(self) -> None:
+        logger.info(f"Stopping external task worker {self.worker_id}...")
+        self.running = False
+        # Interrompe o long polling em andamento, mas deixa as tarefas já bloqueadas terminarem
+        if self._polling is not None and self._polling is not asyncio.current_task():
+            self._polling.cancel()
+        await self.drain()
+        await self.client.close()
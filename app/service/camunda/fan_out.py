@@ -0,0 +1,124 @@
+"""Fan-out de execuções de processos em itens de trabalho no SQS"""
+
+import datetime
+import logging
+import uuid
+from typing import Iterable, Iterator, Optional
+
+from api.deps import DBSession
+from core.config import settings
+from core.exceptions import SQSPublishError
+from helpers import s3_utils
+from models.camunda import ProcessRun, ProcessRunStatus
+from queues.publisher import SQSPublisher, key_id
+from schemas.camunda_schema import ProcessChunkMessage
+from service.camunda import runs
+from service.camunda.base import CustomerData, ProcessProgress, get_process_starter
+
+
+async def fan_out_process(
+    process_key: str,
+    db_session: DBSession,
+    logger: logging.Logger,
+    chunk_size: Optional[int] = None,
+    run_id: Optional[uuid.UUID] = None,
+) -> ProcessRun:
+    """Lê a lista de clientes uma única vez e a divide em itens de trabalho no SQS.
+
+    Cada item referencia a versão e o ETag do conteúdo, um intervalo de linhas e, quando possível, a posição
+    do intervalo no arquivo, permitindo que várias instâncias do subscriber processem a mesma execução
+    em paralelo, cada uma lendo apenas as suas linhas.
+    Quando `run_id` é informado, a execução (job) já existente é utilizada.
+    """
+    chunk_size = chunk_size or settings.PROCESS_FANOUT_CHUNK_SIZE
+    logger.info(f"Fanning out process {process_key} in chunks of {chunk_size}")
+
+    process = get_process_starter(process_key, db_session, logger)
+    row_ranges = process.split_process_content(chunk_size)
+    total_rows = row_ranges[-1].row_end if row_ranges else 0
+
+    process_run = (
+        runs.get_process_run(db_session, run_id, for_update=True) if run_id else ProcessRun(process_key=process_key)
+    )
+    process_run.status = ProcessRunStatus.RUNNING if row_ranges else ProcessRunStatus.COMPLETED
+    process_run.total_rows = total_rows
+    process_run.total_chunks = len(row_ranges)
+    process_run.run_data = {
+        **(process_run.run_data or {}),
+        "content_version": process.content_version,
+        "content_etag": process.content_etag,
+        "chunk_size": chunk_size,
+    }
+    process_run.updated_at = datetime.datetime.utcnow()
+    db_session.add(process_run)
+    db_session.commit()
+
+    # Cada chunk tem seu próprio grupo FIFO, para que sejam processados em paralelo
+    publisher = SQSPublisher(settings.PROCESS_STARTER_QUEUE_NAME, group_id=key_id("run_id", "row_start"))
+    result = publisher.publish(
+        ProcessChunkMessage(
+            process_key=process_key,
+            run_id=process_run.ref_id,
+            content_version=process.content_version,
+            content_etag=process.content_etag,
+            row_start=row_range.row_start,
+            row_end=row_range.row_end,
+            content_offset=row_range.offset,
+            content_header=row_range.header,
+        ).model_dump(mode="json", exclude_none=True)
+        for row_range in row_ranges
+    )
+    if result.errors:
+        raise SQSPublishError(f"{result.failed} of {len(row_ranges)} chunks of run {process_run.ref_id} weren't sent")
+
+    logger.info(f"Process {process_key} run {process_run.ref_id}: {total_rows} rows in {len(row_ranges)} chunks")
+    return process_run
+
+
+async def start_process_chunk(chunk: ProcessChunkMessage, db_session: DBSession, logger: logging.Logger) -> None:
+    """Inicia o processo para o intervalo de linhas de um item de trabalho.
+
+    Itens já concluídos (mensagens reentregues) são ignorados, mas a entrega é at-least-once: um item
+    interrompido antes de ser concluído é reentregue por inteiro e inicia de novo os clientes que já
+    tinham sido iniciados nele, então os processos devem tolerar inícios duplicados (ex: pelo business key).
+    Se o arquivo foi substituído depois do fan-out (412 na leitura condicional pelo ETag), as posições do
+    item não valem mais: a execução é marcada como FAILED sem iniciar nenhum cliente.
+    """
+    if runs.is_chunk_completed(db_session, chunk.run_id, chunk.row_start):
+        logger.warning(f"Process {chunk.process_key} run {chunk.run_id} chunk {chunk.row_start} already completed")
+        return
+
+    logger.info(f"Starting process {chunk.process_key} run {chunk.run_id} rows [{chunk.row_start}, {chunk.row_end})")
+
+    process = get_process_starter(chunk.process_key, db_session, logger)
+    process.content_version = chunk.content_version
+    process.content_etag = chunk.content_etag
+    process.run_id = chunk.run_id
+    content_range = s3_utils.ContentRange(chunk.row_start, chunk.row_end, chunk.content_offset, chunk.content_header)
+    try:
+        process_content = process.get_process_content_range(content_range)
+    except Exception as e:
+        if not s3_utils.is_precondition_failed(e):
+            raise
+        error = f"Content of run {chunk.run_id} changed after the fan-out, chunk {chunk.row_start} can't be read"
+        logger.error(f"Process {chunk.process_key}: {error}")
+        runs.set_status(db_session, chunk.run_id, ProcessRunStatus.FAILED, error=error)
+        db_session.commit()
+        return
+
+    selected_rows = 0
+
+    def count_rows(rows: Iterable[CustomerData]) -> Iterator[CustomerData]:
+        nonlocal selected_rows
+        for row in rows:
+            selected_rows += 1
+            yield row
+
+    process.start_process(count_rows(process_content))
+
+    if runs.complete_chunk(db_session, chunk.run_id, chunk.row_start):
+        # Linhas descartadas pelas regras de elegibilidade contam como ignoradas, como no total_rows
+        runs.record_progress(
+            db_session, chunk.run_id, ProcessProgress(skipped=chunk.row_end - chunk.row_start - selected_rows)
+        )
+    db_session.commit()
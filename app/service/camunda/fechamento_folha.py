@@ -1,53 +1,78 @@
 """Fechamento Folha Familias 3, 4 e 5"""
 
-import csv
+import calendar
 import datetime
 import json
-from io import StringIO
+from dataclasses import dataclass
 
 from core.config import settings
 from helpers import s3_utils
-from service.camunda.base import CamundaProcessStarter
+from helpers.business_days import get_business_calendar
+from service.camunda.base import CamundaProcessStarter, ProcessRunContext
+from service.camunda.composite import CompositeProcessStarter
+from service.camunda.eligibility import EligibilityRules, InSet
+from service.camunda.records import CustomerRecord, RowSchema, column
 
 
 # from service.camunda.enums import RegimeTributario
 
+DATE_EXECUCAO_FORMAT = "%Y-%m-%dT06:00:00-03:00"
+
+MESES_PTBR = {
+    1: "Janeiro",
+    2: "Fevereiro",
+    3: "Março",
+    4: "Abril",
+    5: "Maio",
+    6: "Junho",
+    7: "Julho",
+    8: "Agosto",
+    9: "Setembro",
+    10: "Outubro",
+    11: "Novembro",
+    12: "Dezembro",
+}
+
+
+@dataclass(slots=True, frozen=True)
+class FolhaCustomer(CustomerRecord):
+    """Cliente do arquivo de elegíveis do fechamento de folha"""
+
+    id: str = column("ID")
+    cnpj: str = column("cnpj")
+    company: str = column("company")
+    origin_cnpj: str = column("origin_cnpj")
+    customer_profile: str = column("customer_profile")
+    codigo_dominio: str = column("COD Dominio")
+    tipo_folha: str = column("Tipo de folha (tratado)")
+    analista_dp: str = column("Analista_dp")
+    cnpj_procuracao_federal: str = column("CNPJ_procuração_federal")
+    erp_operado: str = column("erp_operado")
+    data_pagamento_folha: str = column("Data de pagamento de folha (tratado)")
+    util_ou_corrido: str = column("útil ou corrido")
+
 
 class FechamentoFolha3Process(CamundaProcessStarter):
     INCLUDED_CNPJS = ["30473147000160", "12603959000109", "44968739000167"]
+    ELIGIBILITY_RULES = EligibilityRules(InSet("cnpj", INCLUDED_CNPJS))
+    ROW_SCHEMA = RowSchema(FolhaCustomer)
 
     def __init__(self, *args, **kwargs):
         # super().__init__("fechamento_folha_dp_3", *args, **kwargs)
         super().__init__("tarefa_fgts_familia3", *args, **kwargs)
         self.s3_file_path = "dp/fechamento-folha/folha-elegiveis.csv"
 
-    def is_eligible(self, customer_data: dict):
+    def is_eligible(self, customer_data: FolhaCustomer):
         return True
 
-    def ano_corrente(self):
-        return datetime.datetime.now().year
-
-    def mes_corrente_ptbr(self, customer_data: dict):
-        meses = {
-            1: "Janeiro",
-            2: "Fevereiro",
-            3: "Março",
-            4: "Abril",
-            5: "Maio",
-            6: "Junho",
-            7: "Julho",
-            8: "Agosto",
-            9: "Setembro",
-            10: "Outubro",
-            11: "Novembro",
-            12: "Dezembro",
-        }
+    def ano_corrente(self, reference_date: datetime.datetime):
+        return reference_date.year
 
-        mes_competencia = datetime.datetime.now().month
-        return meses[mes_competencia]
+    def mes_corrente_ptbr(self, reference_date: datetime.datetime):
+        return MESES_PTBR[reference_date.month]
 
-    def mes_ano_ptbr(self, customer_data: dict):
-        return f"{self.mes_corrente_ptbr(customer_data)}/{self.ano_corrente()}"
+    def mes_ano_ptbr(self, reference_date: datetime.datetime):
+        return f"{self.mes_corrente_ptbr(reference_date)}/{self.ano_corrente(reference_date)}"
 
     def get_upload_url(self):
         # TODO: Mover para variaveis de ambiente
@@ -55,105 +80,70 @@ class FechamentoFolha3Process(CamundaProcessStarter):
             return "https://task-manager.cexp-dev.bhub.ai/upload-url"
         return "https://task-manager.bhub.ai/upload-url"
 
-    def get_hr_pay_day(self, customer_data: dict):
-        if customer_data["Data de pagamento de folha (tratado)"] == "n/a":
+    def get_hr_pay_day(self, customer_data: FolhaCustomer):
+        if customer_data.data_pagamento_folha == "n/a":
             return "30"
-        return customer_data["Data de pagamento de folha (tratado)"]
+        return customer_data.data_pagamento_folha
 
-    def get_hr_pay_day_type(self, customer_data: dict):
-        if customer_data["útil ou corrido"] == "útil":
+    def get_hr_pay_day_type(self, customer_data: FolhaCustomer):
+        if customer_data.util_ou_corrido == "útil":
             return "dia útil"
         return "NTH_WORK_DAY"
 
-    def get_data_execucao_dctf(self, customer_data: dict):
-        if customer_data["Data de pagamento de folha (tratado)"] == "5":
-            return (
-                (datetime.datetime.now().replace(day=1) + datetime.timedelta(days=35))
-                .replace(day=5)
-                .strftime("%Y-%m-%dT06:00:00-03:00")
-            )
-        return datetime.datetime.now().replace(day=30).strftime("%Y-%m-%dT06:00:00-03:00")
-
-    def get_data_execucao_fgts(self, customer_data: dict):
-        return (
-            (datetime.datetime.now().replace(day=1) + datetime.timedelta(days=40))
-            .replace(day=11)
-            .strftime("%Y-%m-%dT06:00:00-03:00")
-        )
+    def get_data_execucao_dctf(self, customer_data: FolhaCustomer, run_context: ProcessRunContext):
+        if customer_data.data_pagamento_folha == "5":
+            return run_context.values["data_execucao_dctf_dia_5"]
+        return run_context.values["data_execucao_dctf"]
 
-    def get_process_content(self):
-        """Load process content from s3 object"""
-        process_data = s3_utils.get_object(settings.CORE_SAIDA_BUCKET_NAME, self.s3_file_path)
-
-        csv_file = StringIO(process_data)
-        csv_reader = csv.DictReader(csv_file)
-        for row in csv_reader:
-            if row["cnpj"] not in self.INCLUDED_CNPJS:
-                continue
-            yield row
-
-    def get_process_variables(self, customer_data: dict):
-        return {
-            "customer": {
-                "value": json.dumps(
-                    {
-                        "trading_name": customer_data["company"],
-                        "ID": customer_data["ID"],
-                        "cnpj": customer_data["cnpj"],
-                        "origem": customer_data["origin_cnpj"],
-                        "customer_profile": customer_data["customer_profile"],
-                        "company_tax_type": "SIMPLES NACIONAL",  # RegimeTributario.get_by_name(customer_data["company_tax_type"]),  # noqa E501
-                        "codigo_dominio": customer_data["COD Dominio"],
-                    }
-                ),
-                "type": "json",
-            },
-            "customer_guid": {
-                "value": customer_data["ID"],
-                "type": "string",
-            },
+    def get_data_execucao_fgts(self, run_context: ProcessRunContext):
+        return run_context.values["data_execucao_fgts"]
+
+    def get_data_pagamento_folha(self, customer_data: FolhaCustomer, run_context: ProcessRunContext):
+        """Data real de pagamento da folha no mês de pagamento, resolvendo os pagamentos em dia útil"""
+        pay_day = self.get_hr_pay_day(customer_data)
+        if not pay_day.isdigit() or int(pay_day) < 1:
+            return None
+
+        year, month = run_context.values["mes_pagamento"]
+        if customer_data.util_ou_corrido == "útil":
+            return get_business_calendar().nth_business_day(year, month, int(pay_day)).isoformat()
+
+        return datetime.date(year, month, min(int(pay_day), calendar.monthrange(year, month)[1])).isoformat()
+
+    def get_run_context(self) -> ProcessRunContext:
+        """Pré-calcula as datas e as variáveis que não dependem do cliente"""
+        now = datetime.datetime.now()
+        ultimo_dia_mes = calendar.monthrange(now.year, now.month)[1]
+        proximo_mes = now.replace(day=1) + datetime.timedelta(days=32)
+        business_calendar = get_business_calendar()
+
+        def execution_date(date: datetime.date) -> str:
+            # Vencimentos em fins de semana ou feriados são antecipados para o dia útil anterior
+            return business_calendar.previous_business_day(date).strftime(DATE_EXECUCAO_FORMAT)
+
+        values = {
+            "data_execucao_dctf_dia_5": execution_date(proximo_mes.replace(day=5).date()),
+            "data_execucao_dctf": execution_date(now.replace(day=min(30, ultimo_dia_mes)).date()),
+            "data_execucao_fgts": execution_date(proximo_mes.replace(day=11).date()),
+            # A folha do mês é paga no mês seguinte
+            "mes_pagamento": (proximo_mes.year, proximo_mes.month),
+        }
+
+        variables_template = {
             "regime_tributario": {
                 "value": "SIMPLES NACIONAL",  # RegimeTributario.get_by_name(customer_data["company_tax_type"]),
                 "type": "string",
             },
             "competencia": {
-                "value": "05/2025",  # datetime.datetime.now().strftime("%m/%Y"),
-                "type": "string",
-            },
-            "cliente_possui_movimento_folha": {
-                "value": True if customer_data["Tipo de folha (tratado)"] != "sem movimento" else False,
-                "type": "boolean",
-            },
-            "cliente_elegibilidade": {
-                "value": "valido" if self.is_eligible(customer_data) else "invalido",
-                "type": "string",
-            },
-            "assignee": {
-                "value": customer_data["Analista_dp"],
-                "type": "string",
-            },
-            "tipo_movimento_folha": {
-                "value": customer_data["Tipo de folha (tratado)"],
+                "value": "05/2025",  # now.strftime("%m/%Y"),
                 "type": "string",
             },
             "tem_contribuicao": {
                 "value": "no",
                 "type": "string",
             },
-            "envia_notificacao": {
-                "value": "no" if customer_data["customer_profile"] == "FAMILY_5" else "yes",
-                "type": "string",
-            },
             "mes_ano": {
-                "value": self.mes_ano_ptbr(customer_data),
-                "type": "string",
-            },
-            "cnpj_escritorio": {
-                "value": customer_data["CNPJ_procuração_federal"],
-                "type": "string",
-            },
-            "erp_operado": {
-                "value": customer_data["erp_operado"],
+                "value": self.mes_ano_ptbr(now),
                 "type": "string",
             },
             "upload_url": {
@@ -161,19 +151,15 @@ class FechamentoFolha3Process(CamundaProcessStarter):
                 "type": "string",
             },
             "caminho_gdocs": {
-                "value": f"/Reports de fechamento/{self.ano_corrente()}/DP/Impostos/{self.mes_corrente_ptbr(customer_data)}/",  # noqa: E501
+                "value": f"/Reports de fechamento/{self.ano_corrente(now)}/DP/Impostos/{self.mes_corrente_ptbr(now)}/",
                 "type": "string",
             },
             "start_rpa_url": {
                 "value": f"{settings.CORE_APP_URL}/api/melius/start-rpa",
                 "type": "string",
             },
-            "waiting_dctf_date": {
-                "value": self.get_data_execucao_dctf(customer_data),
-                "type": "string",
-            },
             "waiting_fgts_date": {
-                "value": self.get_data_execucao_fgts(customer_data),
+                "value": values["data_execucao_fgts"],
                 "type": "string",
             },
             "tracking_endpoint": {
@@ -182,5 +168,119 @@ class FechamentoFolha3Process(CamundaProcessStarter):
             },
         }
 
+        return ProcessRunContext(started_at=now, values=values, variables_template=variables_template)
+
+    def fetch_process_data(self, start=None):
+        """Open the process data stream from s3 object, optionally starting at a byte offset"""
+        process_data, self.content_version = s3_utils.open_object_stream(
+            settings.CORE_SAIDA_BUCKET_NAME,
+            self.s3_file_path,
+            self.content_version,
+            start=start,
+            etag=self.content_etag,
+        )
+        return process_data
+
+    def get_content_source(self):
+        return f"s3://{settings.CORE_SAIDA_BUCKET_NAME}/{self.s3_file_path}"
+
+    def iter_content_batches(self, process_data, columns=None, header=None):
+        """Read the process content (csv, csv.gz or parquet) in column batches"""
+        return s3_utils.iter_content_column_batches(
+            process_data, self.s3_file_path, columns=columns or self.get_content_columns(), header=header
+        )
+
+    def parse_process_content(self, process_data):
+        """Parse process content, filtering the included customers column by column"""
+        return self.select_eligible_rows(self.iter_content_batches(process_data))
+
+    def split_process_content(self, rows_per_range):
+        """Split the content rows (before the eligibility rules) in ranges that start at their own byte offset.
+        The version and ETag are taken first, so the offsets always refer to the content every range will read.
+        """
+        self.content_version, self.content_etag = s3_utils.get_object_version(
+            settings.CORE_SAIDA_BUCKET_NAME, self.s3_file_path, self.content_version
+        )
+        return s3_utils.split_content(self.fetch_process_data(), self.s3_file_path, rows_per_range)
+
+    def get_process_content_range(self, content_range):
+        """Read only the rows of the range, starting at its offset when the content is a plain csv"""
+        process_data = self.fetch_process_data(start=content_range.offset)
+        batches = self.iter_content_batches(process_data, header=content_range.header)
+        if content_range.offset is None:
+            batches = s3_utils.slice_column_batches(batches, content_range.row_start, content_range.row_end)
+        else:
+            batches = s3_utils.slice_column_batches(batches, 0, content_range.row_end - content_range.row_start)
+        return self.select_eligible_rows(batches)
+
+    def get_process_variables(self, customer_data: FolhaCustomer, run_context: ProcessRunContext):
+        return run_context.build_variables(
+            {
+                "customer": {
+                    "value": json.dumps(
+                        {
+                            "trading_name": customer_data.company,
+                            "ID": customer_data.id,
+                            "cnpj": customer_data.cnpj,
+                            "origem": customer_data.origin_cnpj,
+                            "customer_profile": customer_data.customer_profile,
+                            "company_tax_type": "SIMPLES NACIONAL",  # RegimeTributario.get_by_name(customer_data["company_tax_type"]),  # noqa E501
+                            "codigo_dominio": customer_data.codigo_dominio,
+                        }
+                    ),
+                    "type": "json",
+                },
+                "customer_guid": {
+                    "value": customer_data.id,
+                    "type": "string",
+                },
+                "cliente_possui_movimento_folha": {
+                    "value": True if customer_data.tipo_folha != "sem movimento" else False,
+                    "type": "boolean",
+                },
+                "cliente_elegibilidade": {
+                    "value": "valido" if self.is_eligible(customer_data) else "invalido",
+                    "type": "string",
+                },
+                "assignee": {
+                    "value": customer_data.analista_dp,
+                    "type": "string",
+                },
+                "tipo_movimento_folha": {
+                    "value": customer_data.tipo_folha,
+                    "type": "string",
+                },
+                "envia_notificacao": {
+                    "value": "no" if customer_data.customer_profile == "FAMILY_5" else "yes",
+                    "type": "string",
+                },
+                "cnpj_escritorio": {
+                    "value": customer_data.cnpj_procuracao_federal,
+                    "type": "string",
+                },
+                "erp_operado": {
+                    "value": customer_data.erp_operado,
+                    "type": "string",
+                },
+                "waiting_dctf_date": {
+                    "value": self.get_data_execucao_dctf(customer_data, run_context),
+                    "type": "string",
+                },
+                "data_pagamento_folha": {
+                    "value": self.get_data_pagamento_folha(customer_data, run_context),
+                    "type": "string",
+                },
+            }
+        )
+
+
+class FechamentoFolhaProcesses(CompositeProcessStarter):
+    """Processos de fechamento de folha iniciados a partir do mesmo arquivo de elegíveis.
+    As famílias 4 e 5 entram nesta lista quando seus processos forem publicados no Camunda.
+    """
+
+    PROCESSES = [FechamentoFolha3Process]
+
 
 fechamento_folha_3 = FechamentoFolha3Process
+fechamento_folha = FechamentoFolhaProcesses
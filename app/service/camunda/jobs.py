@@ -0,0 +1,101 @@
+"""Execução assíncrona (jobs) de processos via SQS"""
+
+import asyncio
+import logging
+import uuid
+
+from api.deps import DBSession
+from core.config import settings
+from core.exceptions import CoreSaidaOrchestratorException
+from db.session import get_session_maker
+from fastapi import BackgroundTasks
+from models.camunda import ProcessRun, ProcessRunStatus
+from queues.publisher import SQSPublisher
+from service.camunda import runs
+from service.camunda.base import get_process_starter
+from service.camunda.composite import CompositeProcessStarter
+from service.camunda.fan_out import fan_out_process
+
+
+async def enqueue_process_job(
+    process_key: str,
+    db_session: DBSession,
+    logger: logging.Logger,
+    background_tasks: BackgroundTasks,
+    fan_out: bool = False,
+) -> ProcessRun:
+    """Registra a execução do processo e a envia para a fila, sem aguardar o processamento.
+
+    Sem os subscribers do SQS (SQS_SUBSCRIBERS_ENABLED), ninguém consome a fila: o job é executado
+    em background na própria instância, após a resposta.
+    """
+    # Valida a chave do processo antes de enfileirar
+    process = get_process_starter(process_key, db_session, logger)
+    if fan_out and isinstance(process, CompositeProcessStarter):
+        raise CoreSaidaOrchestratorException(f"Composite process {process_key} can't be fanned out")
+    if fan_out and not settings.SQS_SUBSCRIBERS_ENABLED:
+        raise CoreSaidaOrchestratorException(f"Process {process_key} can't be fanned out without the SQS subscribers")
+
+    process_run = ProcessRun(process_key=process_key, run_data={"fan_out": fan_out})
+    db_session.add(process_run)
+    db_session.commit()
+
+    if not settings.SQS_SUBSCRIBERS_ENABLED:
+        background_tasks.add_task(run_process_job_in_background, process_run.ref_id, logger)
+        logger.info(f"Process {process_key} scheduled as job {process_run.ref_id}")
+        return process_run
+
+    try:
+        SQSPublisher(settings.PROCESS_STARTER_QUEUE_NAME).send(
+            {"process_key": process_key, "run_id": str(process_run.ref_id), "fan_out": fan_out}
+        )
+    except Exception as e:
+        # Sem a mensagem o job nunca sairia de QUEUED
+        process_run = runs.set_status(db_session, process_run.ref_id, ProcessRunStatus.FAILED, error=str(e))
+        db_session.commit()
+        raise
+
+    logger.info(f"Process {process_key} enqueued as job {process_run.ref_id}")
+    return process_run
+
+
+def run_process_job_in_background(run_id: uuid.UUID, logger: logging.Logger) -> None:
+    """Executa o job com uma sessão própria, fora do request (executado no threadpool pelo FastAPI)"""
+    SessionLocal = get_session_maker()
+    with SessionLocal() as db_session:
+        asyncio.run(run_process_job(run_id, db_session, logger))
+
+
+async def run_process_job(run_id: uuid.UUID, db_session: DBSession, logger: logging.Logger) -> None:
+    """Executa um job de processo enfileirado por `enqueue_process_job`.
+
+    Apenas jobs em QUEUED são executados, então uma mensagem reentregue não executa o processo de novo.
+    Falhas ficam registradas no job (FAILED) e não são propagadas, para que a mensagem não seja reentregue.
+    """
+    process_run = runs.get_process_run(db_session, run_id, for_update=True)
+    if process_run.status != ProcessRunStatus.QUEUED:
+        logger.warning(f"Job {run_id} of process {process_run.process_key} is {process_run.status}, skipping")
+        db_session.rollback()
+        return
+
+    logger.info(f"Running job {run_id} of process {process_run.process_key}")
+    runs.set_status(db_session, run_id, ProcessRunStatus.RUNNING)
+    db_session.commit()
+
+    try:
+        if (process_run.run_data or {}).get("fan_out"):
+            await fan_out_process(process_run.process_key, db_session, logger, run_id=run_id)
+            return
+
+        process = get_process_starter(process_run.process_key, db_session, logger)
+        process.run_id = run_id
+        process.start_process()
+
+        process_run = runs.set_status(db_session, run_id, ProcessRunStatus.COMPLETED)
+        process_run.total_rows = process_run.started_count + process_run.skipped_count + process_run.error_count
+        db_session.commit()
+    except Exception as e:
+        logger.error(f"Error running job {run_id} of process {process_run.process_key}: {e}")
+        db_session.rollback()
+        runs.set_status(db_session, run_id, ProcessRunStatus.FAILED, error=str(e))
+        db_session.commit()
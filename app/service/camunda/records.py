@@ -0,0 +1,64 @@
+"""Registros tipados dos clientes de um processo.
+
+Cada processo declara um dataclass com `slots=True` cujos campos apontam para as colunas do arquivo de entrada.
+As colunas do `RowSchema` são validadas contra o cabeçalho uma única vez, ao abrir o conteúdo, e cada coluna do
+lote é convertida inteira antes de montar os registros, que ocupam menos memória e são acessados por atributo
+em vez de pelo nome da coluna.
+"""
+
+import dataclasses
+from typing import Any, Callable, ClassVar, Iterator, Optional
+
+from helpers import s3_utils
+
+
+def column(header: str, converter: Optional[Callable[[str], Any]] = None) -> Any:
+    """Declara o campo de um registro lido da coluna `header`, convertido opcionalmente por `converter`"""
+    return dataclasses.field(metadata={"column": header, "converter": converter})
+
+
+@dataclasses.dataclass(slots=True, frozen=True)
+class CustomerRecord:
+    """Base dos registros de clientes"""
+
+    # Campo que identifica o cliente nos logs e na auditoria
+    CUSTOMER_ID_FIELD: ClassVar[str] = "cnpj"
+
+    @property
+    def customer_id(self) -> str:
+        return getattr(self, self.CUSTOMER_ID_FIELD)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Retorna o registro com os nomes originais das colunas, usado na auditoria"""
+        return {field.metadata["column"]: getattr(self, field.name) for field in dataclasses.fields(self)}
+
+
+class RowSchema:
+    """Esquema das linhas de um processo, derivado do seu tipo de registro"""
+
+    def __init__(self, record_type: type[CustomerRecord]):
+        self.record_type = record_type
+        self.fields = [
+            (field.metadata["column"], field.metadata.get("converter")) for field in dataclasses.fields(record_type)
+        ]
+
+    @property
+    def columns(self) -> list[str]:
+        return [header for header, _ in self.fields]
+
+    @property
+    def customer_id_column(self) -> str:
+        """Coluna do conteúdo que identifica o cliente"""
+        fields = {field.name: field.metadata["column"] for field in dataclasses.fields(self.record_type)}
+        return fields[self.record_type.CUSTOMER_ID_FIELD]
+
+    def materialize(self, batch: s3_utils.ColumnBatch, indexes: list[int]) -> Iterator[CustomerRecord]:
+        """Monta os registros das linhas `indexes` do lote, convertendo coluna a coluna"""
+        columns = []
+        for header, converter in self.fields:
+            values = s3_utils.take_values(batch.columns[header], indexes)
+            columns.append([converter(value) for value in values] if converter else values)
+
+        record_type = self.record_type
+        for values in zip(*columns, strict=True):
+            yield record_type(*values)
@@ -0,0 +1,79 @@
+"""Persistência do estado das execuções (jobs) de processos"""
+
+import datetime
+import uuid
+from typing import TYPE_CHECKING, Optional
+
+from api.deps import DBSession
+from core.exceptions import ObjectNotFound
+from models.camunda import ProcessRun, ProcessRunStatus
+from sqlalchemy import select
+
+
+if TYPE_CHECKING:
+    from service.camunda.base import ProcessProgress
+
+
+MAX_RUN_ERRORS = 100
+
+
+def get_process_run(db_session: DBSession, run_id: uuid.UUID, for_update: bool = False) -> ProcessRun:
+    """Retorna a execução pelo seu identificador"""
+    stmt = select(ProcessRun).where(ProcessRun.ref_id == run_id)
+    if for_update:
+        stmt = stmt.with_for_update()
+
+    process_run = db_session.execute(stmt).scalar_one_or_none()
+    if process_run is None:
+        raise ObjectNotFound(f"Process run {run_id} not found")
+
+    return process_run
+
+
+def set_status(
+    db_session: DBSession, run_id: uuid.UUID, status: ProcessRunStatus, error: Optional[str] = None
+) -> ProcessRun:
+    """Atualiza o status da execução, registrando o erro informado"""
+    process_run = get_process_run(db_session, run_id, for_update=True)
+    process_run.status = status
+    process_run.updated_at = datetime.datetime.utcnow()
+    if error:
+        process_run.errors = [*(process_run.errors or []), error][-MAX_RUN_ERRORS:]
+
+    return process_run
+
+
+def record_progress(db_session: DBSession, run_id: uuid.UUID, progress: "ProcessProgress") -> None:
+    """Soma os contadores de progresso na execução"""
+    process_run = get_process_run(db_session, run_id, for_update=True)
+    process_run.started_count += progress.started
+    process_run.skipped_count += progress.skipped
+    process_run.error_count += progress.errors
+    if progress.error_messages:
+        process_run.errors = [*(process_run.errors or []), *progress.error_messages][-MAX_RUN_ERRORS:]
+    process_run.updated_at = datetime.datetime.utcnow()
+
+
+def is_chunk_completed(db_session: DBSession, run_id: uuid.UUID, row_start: int) -> bool:
+    """Verifica se o item de trabalho iniciado em `row_start` já foi concluído"""
+    process_run = get_process_run(db_session, run_id)
+    return row_start in (process_run.run_data or {}).get("completed_rows", [])
+
+
+def complete_chunk(db_session: DBSession, run_id: uuid.UUID, row_start: int) -> bool:
+    """Registra a conclusão de um item de trabalho, finalizando a execução no último deles.
+
+    Os itens concluídos ficam registrados na execução (pela linha inicial), então uma mensagem reentregue
+    não é contada de novo. Retorna False nesse caso.
+    """
+    process_run = get_process_run(db_session, run_id, for_update=True)
+    completed_rows = (process_run.run_data or {}).get("completed_rows", [])
+    if row_start in completed_rows:
+        return False
+
+    process_run.run_data = {**(process_run.run_data or {}), "completed_rows": [*completed_rows, row_start]}
+    process_run.completed_chunks = len(completed_rows) + 1
+    if process_run.completed_chunks >= process_run.total_chunks:
+        process_run.status = ProcessRunStatus.COMPLETED
+    process_run.updated_at = datetime.datetime.utcnow()
+    return True
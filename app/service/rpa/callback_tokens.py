@@ -0,0 +1,108 @@
+"""Tokens de retorno (tokenRetorno) das tarefas de RPA assinados com HMAC.
+
+O token carrega a tarefa (idTarefaCliente), o tipo da tarefa (tipoTarefaRpa) e a expiração,
+então o webhook autentica e roteia o retorno sem consultar o banco. Formato:
+
+    v1.<payload em base64url>.<HMAC-SHA256 de "v1.<payload>" em base64url>
+"""
+
+import base64
+import binascii
+import hashlib
+import hmac
+import json
+import secrets
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from core.config import settings
+from core.exceptions import RPAException
+
+
+TOKEN_VERSION = "v1"
+
+
+@dataclass(frozen=True)
+class CallbackClaims:
+    id_tarefa_cliente: str
+    tipo_tarefa_rpa: str
+    expires_at: int
+    nonce: str = ""
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _sign(secret: str, message: str) -> str:
+    return _b64encode(hmac.new(secret.encode(), message.encode(), hashlib.sha256).digest())
+
+
+def signing_enabled() -> bool:
+    return bool(settings.MELIUS_CALLBACK_TOKEN_SECRET)
+
+
+def is_signed_token(token: str) -> bool:
+    return token.startswith(f"{TOKEN_VERSION}.")
+
+
+def sign_callback_token(
+    id_tarefa_cliente: str,
+    tipo_tarefa_rpa: str,
+    ttl: Optional[int] = None,
+    now: Optional[float] = None,
+    nonce: Optional[str] = None,
+) -> str:
+    """Gera o token de retorno da tarefa, válido por `ttl` segundos (MELIUS_CALLBACK_TOKEN_TTL por padrão)"""
+    expires_at = int((now or time.time()) + (ttl or settings.MELIUS_CALLBACK_TOKEN_TTL))
+    # O nonce diferencia os envios da mesma tarefa; no reenvio, começa pela linhagem do envio anterior
+    claims = {"t": id_tarefa_cliente, "k": tipo_tarefa_rpa, "e": expires_at, "n": nonce or secrets.token_hex(4)}
+    payload = _b64encode(json.dumps(claims, separators=(",", ":")).encode())
+    message = f"{TOKEN_VERSION}.{payload}"
+    return f"{message}.{_sign(settings.MELIUS_CALLBACK_TOKEN_SECRET, message)}"
+
+
+def verify_callback_token(token: str, id_tarefa_cliente: str, now: Optional[float] = None) -> CallbackClaims:
+    """Valida a assinatura, a expiração e a tarefa do token, retornando seus dados"""
+    try:
+        version, payload, signature = token.split(".")
+    except ValueError:
+        raise RPAException("Token de retorno malformado")
+
+    message = f"{version}.{payload}"
+    valid_secrets = [settings.MELIUS_CALLBACK_TOKEN_SECRET, settings.MELIUS_CALLBACK_TOKEN_PREVIOUS_SECRET]
+    if version != TOKEN_VERSION or not any(
+        secret and hmac.compare_digest(_sign(secret, message), signature) for secret in valid_secrets
+    ):
+        raise RPAException("Assinatura do token de retorno inválida")
+
+    try:
+        claims = json.loads(_b64decode(payload))
+        callback_claims = CallbackClaims(
+            id_tarefa_cliente=claims["t"],
+            tipo_tarefa_rpa=claims["k"],
+            expires_at=claims["e"],
+            nonce=claims.get("n", ""),
+        )
+    except (binascii.Error, ValueError, KeyError):
+        raise RPAException("Token de retorno malformado")
+
+    if callback_claims.expires_at < (now or time.time()):
+        raise RPAException("Token de retorno expirado")
+    if callback_claims.id_tarefa_cliente != id_tarefa_cliente:
+        raise RPAException("Token de retorno de outra tarefa")
+
+    return callback_claims
+
+
+def token_nonce(token: str) -> str:
+    """Nonce do token assinado, sem validar a assinatura (vazio se o token for malformado)"""
+    try:
+        return json.loads(_b64decode(token.split(".")[1])).get("n", "")
+    except (binascii.Error, ValueError, IndexError, AttributeError):
+        return ""
@@ -0,0 +1,86 @@
+"""Cópia dos arquivos gerados pelos RPAs para o S3.
+
+Os provedores retornam apenas as URLs dos arquivos gerados, que podem expirar. Antes de enviar
+a mensagem ao Camunda, o OutboxDispatcher baixa os arquivos (em paralelo, por streaming) para o
+CORE_SAIDA_BUCKET_NAME e reescreve as variáveis da mensagem para apontar para as cópias.
+Nada disso acontece no webhook.
+"""
+
+import copy
+import hashlib
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from urllib.parse import urlparse
+
+import httpx
+from core.config import settings
+from core.logging import setup_logger
+from helpers import s3_utils
+
+
+logger = setup_logger(__name__)
+
+S3_SCHEME = "s3://"
+
+
+def mirror_key(process_instance_id: str, arquivo: dict) -> str:
+    """Chave da cópia do arquivo: a mesma URL sempre gera a mesma chave, então as retentativas sobrescrevem a cópia"""
+    url_hash = hashlib.sha1(arquivo["url"].encode()).hexdigest()[:12]
+    file_name = posixpath.basename(arquivo.get("nome_arquivo") or urlparse(arquivo["url"]).path) or "arquivo"
+    return f"{settings.RPA_FILE_MIRROR_PREFIX}{process_instance_id}/{url_hash}/{file_name}"
+
+
+def is_mirrored(arquivo: dict) -> bool:
+    return arquivo.get("url", "").startswith(S3_SCHEME)
+
+
+def mirror_file(process_instance_id: str, arquivo: dict) -> dict:
+    """Baixa o arquivo do provedor direto para o S3, retornando o arquivo com a URL da cópia"""
+    object_key = mirror_key(process_instance_id, arquivo)
+    timeout = httpx.Timeout(settings.RPA_FILE_MIRROR_TIMEOUT)
+    with httpx.stream("GET", arquivo["url"], timeout=timeout, follow_redirects=True) as response:
+        response.raise_for_status()
+        uploaded = s3_utils.upload_stream(
+            settings.CORE_SAIDA_BUCKET_NAME,
+            object_key,
+            response.iter_bytes(settings.S3_STREAM_CHUNK_SIZE),
+            content_type=response.headers.get("Content-Type"),
+        )
+
+    logger.info(f"Mirrored {arquivo['url']} to {object_key} ({uploaded['size']} bytes)")
+    return {**arquivo, "url": f"{S3_SCHEME}{uploaded['bucket']}/{uploaded['key']}", "url_origem": arquivo["url"]}
+
+
+def _try_mirror_file(process_instance_id: str, arquivo: dict) -> dict:
+    try:
+        return mirror_file(process_instance_id, arquivo)
+    except Exception as e:
+        # A mensagem segue com a URL do provedor; a cópia é tentada de novo se o envio ao Camunda falhar
+        logger.warning(f"Error mirroring {arquivo.get('url')} for process {process_instance_id}: {e}")
+        return arquivo
+
+
+def mirror_generated_files(process_instance_id: str, payload: dict) -> Optional[dict]:
+    """Copia os `arquivos_gerados` das variáveis da mensagem para o S3.
+
+    Retorna uma cópia da mensagem com as URLs reescritas, ou None se nenhum arquivo foi copiado.
+    """
+    payload = copy.deepcopy(payload)
+    pending = [
+        (files, position)
+        for variable in payload.get("processVariables", {}).values()
+        if isinstance(variable.get("value"), dict)
+        for files in [variable["value"].get("arquivos_gerados") or []]
+        for position, arquivo in enumerate(files)
+        if not is_mirrored(arquivo)
+    ]
+    if not pending:
+        return None
+
+    with ThreadPoolExecutor(max_workers=min(settings.RPA_FILE_MIRROR_CONCURRENCY, len(pending))) as executor:
+        mirrored = list(executor.map(lambda item: _try_mirror_file(process_instance_id, item[0][item[1]]), pending))
+
+    for (files, position), arquivo in zip(pending, mirrored, strict=True):
+        files[position] = arquivo
+    return payload if any(is_mirrored(arquivo) for arquivo in mirrored) else None
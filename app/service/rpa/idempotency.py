@@ -0,0 +1,116 @@
+"""Idempotência dos inícios de RPA.
+
+Quando o Camunda repete um início de RPA (ex: depois de um timeout), a requisição repetida deve
+retornar a resposta da primeira sem enviar uma nova tarefa ao provedor nem gravar outro START.
+A chave vem do header Idempotency-Key ou, sem ele, de idTarefaCliente e tipoTarefaRpa (nas external
+tasks, do id da tarefa, que se mantém quando o Camunda a reentrega), e é guardada em
+`rpa_idempotency_key` (indexada pela chave e pela expiração) até expirar.
+Enquanto a requisição original não termina, a chave fica IN_PROGRESS apenas durante um lease curto
+(MELIUS_RPA_IDEMPOTENCY_LEASE): se a requisição morrer sem liberar a chave, uma nova tentativa a assume.
+"""
+
+import datetime
+import hashlib
+import json
+from typing import Optional
+
+from api.deps import DBSession
+from core.config import settings
+from core.exceptions import IdempotencyConflict
+from core.logging import setup_logger
+from models.rpa import RPAIdempotencyKey, RPAIdempotencyStatus
+from sqlalchemy import and_, delete, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+
+
+logger = setup_logger(__name__)
+
+
+def request_key(process_data: dict, idempotency_key: Optional[str] = None) -> Optional[str]:
+    """Chave de idempotência da requisição, ou None se não houver como identificá-la"""
+    if idempotency_key:
+        return f"header:{idempotency_key}"
+    task_id, task_type = process_data.get("idTarefaCliente"), process_data.get("tipoTarefaRpa")
+    if settings.MELIUS_RPA_IDEMPOTENCY_DERIVE_KEY and task_id and task_type:
+        return f"task:{task_id}:{task_type}"
+    return None
+
+
+def external_task_key(task_id: str) -> str:
+    """Chave de idempotência de uma external task, reentregue pelo Camunda com o mesmo id"""
+    return f"external-task:{task_id}"
+
+
+def request_hash(process_data: dict) -> str:
+    return hashlib.sha256(json.dumps(process_data, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def claim_key(db_session: DBSession, key: str, body_hash: str) -> Optional[dict]:
+    """Reserva a chave para esta requisição.
+
+    Retorna None se a requisição deve ser processada (chave nova, expirada ou IN_PROGRESS com o lease vencido,
+    da mesma requisição) ou a resposta guardada da requisição original. A reserva é confirmada na hora,
+    para que requisições simultâneas a vejam.
+    """
+    now = datetime.datetime.utcnow()
+    expires_at = now + datetime.timedelta(seconds=settings.MELIUS_RPA_IDEMPOTENCY_TTL)
+    values = {
+        "key": key,
+        "request_hash": body_hash,
+        "status": RPAIdempotencyStatus.IN_PROGRESS,
+        "response": None,
+        "in_progress_until": now + datetime.timedelta(seconds=settings.MELIUS_RPA_IDEMPOTENCY_LEASE),
+    }
+
+    claimed = db_session.execute(
+        insert(RPAIdempotencyKey)
+        .values(**values, expires_at=expires_at, created_at=now)
+        .on_conflict_do_nothing(index_elements=[RPAIdempotencyKey.key])
+    ).rowcount
+    if not claimed:
+        # Uma chave expirada (ainda não removida) é reaproveitada, assim como a reserva abandonada da mesma requisição
+        abandoned = and_(
+            RPAIdempotencyKey.status == RPAIdempotencyStatus.IN_PROGRESS,
+            RPAIdempotencyKey.request_hash == body_hash,
+            RPAIdempotencyKey.in_progress_until <= now,  # type: ignore
+        )
+        claimed = db_session.execute(
+            update(RPAIdempotencyKey)
+            .where(RPAIdempotencyKey.key == key, or_(RPAIdempotencyKey.expires_at <= now, abandoned))  # type: ignore
+            .values(**values, expires_at=expires_at, created_at=now)
+        ).rowcount
+    db_session.commit()
+    if claimed:
+        return None
+
+    stored = db_session.execute(select(RPAIdempotencyKey).where(RPAIdempotencyKey.key == key)).scalar_one()
+    if stored.request_hash != body_hash:
+        raise IdempotencyConflict(f"Chave de idempotência {key} já usada com outra requisição")
+    if stored.status != RPAIdempotencyStatus.COMPLETED:
+        raise IdempotencyConflict(f"Requisição com a chave de idempotência {key} ainda em andamento")
+
+    logger.info(f"Returning stored response for idempotency key {key}")
+    return stored.response
+
+
+def complete_key(db_session: DBSession, key: str, response: Optional[dict]) -> None:
+    """Guarda a resposta da requisição; gravada na mesma transação do log START"""
+    db_session.execute(
+        update(RPAIdempotencyKey)
+        .where(RPAIdempotencyKey.key == key)
+        .values(status=RPAIdempotencyStatus.COMPLETED, response=response, in_progress_until=None)
+    )
+
+
+def release_key(db_session: DBSession, key: str) -> None:
+    """Libera a chave de uma requisição com erro, para que a próxima tentativa envie a tarefa"""
+    db_session.execute(delete(RPAIdempotencyKey).where(RPAIdempotencyKey.key == key))
+
+
+def purge_expired_keys(db_session: DBSession) -> int:
+    """Remove as chaves expiradas, retornando quantas foram removidas"""
+    deleted = db_session.execute(
+        delete(RPAIdempotencyKey).where(RPAIdempotencyKey.expires_at <= datetime.datetime.utcnow())  # type: ignore
+    ).rowcount
+    db_session.commit()
+    return deleted
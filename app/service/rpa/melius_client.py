@@ -0,0 +1,39 @@
+"""Cliente HTTP assíncrono da Melius, compartilhado por todas as requisições do processo"""
+
+from typing import Optional
+
+import httpx
+from core.config import settings
+
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def get_melius_client() -> httpx.AsyncClient:
+    """Retorna o cliente da Melius, criando-o na primeira chamada.
+
+    As conexões são mantidas abertas (keep-alive) e reaproveitadas entre as requisições,
+    limitadas por MELIUS_RPA_MAX_CONNECTIONS. O cliente é fechado no shutdown da aplicação.
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(
+                settings.MELIUS_RPA_READ_TIMEOUT,
+                connect=settings.MELIUS_RPA_CONNECT_TIMEOUT,
+                pool=settings.MELIUS_RPA_POOL_TIMEOUT,
+            ),
+            limits=httpx.Limits(
+                max_connections=settings.MELIUS_RPA_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.MELIUS_RPA_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.MELIUS_RPA_KEEPALIVE_EXPIRY,
+            ),
+        )
+    return _client
+
+
+async def close_melius_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -0,0 +1,311 @@
+"""Outbox das mensagens de retorno dos RPAs para o Camunda.
+
+O webhook apenas valida e grava a mensagem na outbox, na sua própria transação, e responde.
+O OutboxDispatcher correlaciona as mensagens pendentes no Camunda em background, com
+retentativas e backoff exponencial, entregando as mensagens de uma mesma instância de
+processo na ordem em que chegaram. As mensagens são reservadas (lease) em uma transação curta
+e enviadas fora dela, sem manter linhas bloqueadas durante as chamadas HTTP. Antes do envio,
+os arquivos gerados pelos RPAs podem ser copiados para o S3 (ver file_mirror).
+"""
+
+import asyncio
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
+
+import httpx
+from api.deps import DBSession
+from core.config import settings
+from core.logging import setup_logger
+from db.session import get_session_maker
+from models.rpa import (
+    CamundaOutbox,
+    CamundaOutboxStatus,
+    RPAEventLog,
+    RPAEventTypes,
+    RPASource,
+)
+from service.rpa import file_mirror
+from sqlalchemy import exists, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import aliased
+
+
+logger = setup_logger(__name__)
+
+
+def _make_camunda_request(url, params: dict):
+    headers = {
+        "Content-Type": "application/json",
+    }
+    timeout = httpx.Timeout(30.0)
+
+    if settings.ENV == "production":
+        headers["X-API-Key"] = f"{settings.CAMUNDA_API_TOKEN}"
+        response = httpx.post(url, json=params, headers=headers, timeout=timeout)
+    else:
+        auth = httpx.BasicAuth(settings.CAMUNDA_USERNAME, settings.CAMUNDA_PASSWORD)
+        response = httpx.post(url, json=params, headers=headers, auth=auth, timeout=timeout)
+
+    response.raise_for_status()
+
+    return response
+
+
+def enqueue_message(
+    db_session: DBSession,
+    dedup_key: str,
+    process_instance_id: str,
+    event_source: RPASource,
+    message_name: str,
+    payload: dict,
+    event_data: dict,
+) -> bool:
+    """Grava a mensagem na outbox. Retorna False se uma mensagem com a mesma dedup_key já existir"""
+    message = CamundaOutbox(
+        dedup_key=dedup_key,
+        process_instance_id=process_instance_id,
+        event_source=event_source,
+        message_name=message_name,
+        payload=payload,
+        event_data=event_data,
+    )
+    stmt = (
+        insert(CamundaOutbox)
+        .values(**message.model_dump(exclude={"id"}))
+        .on_conflict_do_nothing(index_elements=[CamundaOutbox.dedup_key])
+    )
+    return db_session.execute(stmt).rowcount == 1
+
+
+def claim_messages(db_session: DBSession, limit: int) -> list[CamundaOutbox]:
+    """Reserva (lease) as mensagens prontas para envio, no máximo uma (a mais antiga) por instância de processo.
+
+    A reserva conta a tentativa e adia o next_attempt_at por CAMUNDA_OUTBOX_LEASE_SECONDS, e vale após o
+    commit: o envio acontece fora da transação, sem manter as linhas bloqueadas. Como as mensagens reservadas
+    continuam pendentes, as mensagens seguintes da mesma instância só são enviadas depois delas; se o
+    dispatcher cair no meio do envio, a mensagem volta a ser enviada quando a reserva expira.
+    """
+    now = datetime.datetime.utcnow()
+    earlier = aliased(CamundaOutbox)
+    stmt = (
+        select(CamundaOutbox)
+        .where(
+            CamundaOutbox.status == CamundaOutboxStatus.PENDING,
+            CamundaOutbox.next_attempt_at <= now,  # type: ignore
+            ~exists().where(
+                earlier.process_instance_id == CamundaOutbox.process_instance_id,
+                earlier.status == CamundaOutboxStatus.PENDING,
+                earlier.id < CamundaOutbox.id,  # type: ignore
+            ),
+        )
+        .order_by(CamundaOutbox.id)  # type: ignore
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    messages = list(db_session.execute(stmt).scalars().all())
+    for message in messages:
+        message.attempts += 1
+        message.next_attempt_at = now + datetime.timedelta(seconds=settings.CAMUNDA_OUTBOX_LEASE_SECONDS)
+    return messages
+
+
+@dataclass
+class DeliveryError:
+    error: str
+    response_content: str
+
+
+def _deliver(payload: dict) -> Optional[DeliveryError]:
+    try:
+        _make_camunda_request(f"{settings.CAMUNDA_ENGINE_URL}/message", payload)
+    except httpx.HTTPStatusError as e:
+        return DeliveryError(error=str(e), response_content=e.response.content.decode())
+    except Exception as e:
+        return DeliveryError(error=str(e), response_content=str(e))
+    return None
+
+
+def _mirror_and_deliver(process_instance_id: str, payload: dict) -> tuple[Optional[dict], Optional[DeliveryError]]:
+    """Copia os arquivos gerados para o S3 (se habilitado) e envia a mensagem, retornando a mensagem reescrita"""
+    mirrored = None
+    if settings.RPA_FILE_MIRROR_ENABLED:
+        mirrored = file_mirror.mirror_generated_files(process_instance_id, payload)
+    return mirrored, _deliver(mirrored or payload)
+
+
+def retry_delay(attempts: int) -> datetime.timedelta:
+    """Backoff exponencial a partir da primeira falha, limitado por CAMUNDA_OUTBOX_MAX_BACKOFF"""
+    delay = settings.CAMUNDA_OUTBOX_RETRY_BACKOFF * 2 ** (attempts - 1)
+    return datetime.timedelta(seconds=min(delay, settings.CAMUNDA_OUTBOX_MAX_BACKOFF))
+
+
+@dataclass
+class DeliveryAttempt:
+    """Mensagem reservada, copiada para fora da sessão para o envio sem transação aberta"""
+
+    id: int
+    attempts: int
+    process_instance_id: str
+    payload: dict
+
+
+def dispatch_pending(db_session: DBSession, limit: Optional[int] = None) -> int:
+    """Envia um lote de mensagens pendentes ao Camunda, retornando quantas foram processadas"""
+    attempts = [
+        DeliveryAttempt(message.id, message.attempts, message.process_instance_id, message.payload)  # type: ignore
+        for message in claim_messages(db_session, limit or settings.CAMUNDA_OUTBOX_BATCH_SIZE)
+    ]
+    db_session.commit()
+    if not attempts:
+        return 0
+
+    # Cada mensagem do lote é de uma instância diferente, então podem ser enviadas em paralelo
+    with ThreadPoolExecutor(max_workers=min(settings.CAMUNDA_OUTBOX_CONCURRENCY, len(attempts))) as executor:
+        results = list(
+            executor.map(
+                _mirror_and_deliver,
+                [attempt.process_instance_id for attempt in attempts],
+                [attempt.payload for attempt in attempts],
+            )
+        )
+
+    record_outcomes(db_session, attempts, results)
+    db_session.commit()
+    return len(attempts)
+
+
+def record_outcomes(
+    db_session: DBSession,
+    attempts: list[DeliveryAttempt],
+    results: list[tuple[Optional[dict], Optional[DeliveryError]]],
+) -> None:
+    """Registra o resultado dos envios, ignorando as mensagens cuja reserva expirou e foi retomada"""
+    stmt = (
+        select(CamundaOutbox)
+        .where(CamundaOutbox.id.in_([attempt.id for attempt in attempts]))  # type: ignore
+        .with_for_update()
+    )
+    messages = {message.id: message for message in db_session.execute(stmt).scalars().all()}
+
+    now = datetime.datetime.utcnow()
+    for attempt, (mirrored, error) in zip(attempts, results, strict=True):
+        message = messages.get(attempt.id)
+        if message is None or message.status != CamundaOutboxStatus.PENDING or message.attempts != attempt.attempts:
+            logger.warning(f"Lease of outbox message {attempt.id} expired during the delivery, discarding its outcome")
+            continue
+
+        if mirrored is not None:
+            # As cópias já feitas não são refeitas nas próximas tentativas
+            message.payload = mirrored
+        if error is None:
+            message.status = CamundaOutboxStatus.DELIVERED
+            message.delivered_at = now
+            message.last_error = None
+            logger.info(
+                f"Delivered {message.message_name} to process {message.process_instance_id} "
+                f"after {(now - message.created_at.replace(tzinfo=None)).total_seconds():.1f}s"
+            )
+            _log_rpa_event(db_session, message, RPAEventTypes.FINISH, message.event_data)
+            continue
+
+        message.last_error = error.error
+        if message.attempts >= settings.CAMUNDA_OUTBOX_MAX_ATTEMPTS:
+            logger.error(f"Giving up {message.message_name} to process {message.process_instance_id}: {error.error}")
+            message.status = CamundaOutboxStatus.FAILED
+            event_data = {
+                "error": error.error,
+                "response_content": error.response_content,
+                "camunda_request": message.payload,
+                **message.event_data,
+            }
+            _log_rpa_event(db_session, message, RPAEventTypes.FINISH_WITH_ERROR, event_data)
+        else:
+            logger.warning(
+                f"Error sending {message.message_name} to process {message.process_instance_id} "
+                f"(attempt {message.attempts}): {error.error}"
+            )
+            message.next_attempt_at = now + retry_delay(message.attempts)
+
+
+def _start_event_data(db_session: DBSession, message: CamundaOutbox) -> dict:
+    """Dados do START da tarefa, para completar o log do retorno (webhooks com token assinado não os consultam)"""
+    stmt = (
+        select(RPAEventLog.event_data)
+        .where(
+            RPAEventLog.process_id == message.process_instance_id,
+            RPAEventLog.event_type == RPAEventTypes.START,
+            RPAEventLog.event_data.op("->>")("tokenRetorno") == message.event_data.get("tokenRetorno"),  # type: ignore
+        )
+        .order_by(RPAEventLog.created_at.desc())  # type: ignore
+        .limit(1)
+    )
+    return db_session.execute(stmt).scalar() or {}
+
+
+def _log_rpa_event(db_session: DBSession, message: CamundaOutbox, event_type: RPAEventTypes, event_data: dict):
+    db_session.add(
+        RPAEventLog(
+            process_id=message.process_instance_id,
+            event_type=event_type,
+            event_source=message.event_source,
+            event_data={**_start_event_data(db_session, message), **event_data},
+        )
+    )
+
+
+def get_outbox_lag(db_session: DBSession) -> dict:
+    """Mensagens pendentes e com falha, e a idade (em segundos) da mensagem pendente mais antiga"""
+    counts = dict(
+        db_session.execute(
+            select(CamundaOutbox.status, func.count())
+            .where(CamundaOutbox.status != CamundaOutboxStatus.DELIVERED)
+            .group_by(CamundaOutbox.status)
+        ).all()
+    )
+    oldest_pending = db_session.execute(
+        select(func.min(CamundaOutbox.created_at)).where(CamundaOutbox.status == CamundaOutboxStatus.PENDING)
+    ).scalar()
+    lag = 0.0
+    if oldest_pending is not None:
+        lag = (datetime.datetime.utcnow() - oldest_pending.replace(tzinfo=None)).total_seconds()
+
+    return {
+        "pending": counts.get(CamundaOutboxStatus.PENDING, 0),
+        "failed": counts.get(CamundaOutboxStatus.FAILED, 0),
+        "oldest_pending_seconds": max(lag, 0.0),
+    }
+
+
+class OutboxDispatcher:
+    """Envia continuamente as mensagens pendentes da outbox, em background"""
+
+    def __init__(self, poll_interval: Optional[float] = None, batch_size: Optional[int] = None):
+        self.poll_interval = poll_interval or settings.CAMUNDA_OUTBOX_POLL_INTERVAL
+        self.batch_size = batch_size or settings.CAMUNDA_OUTBOX_BATCH_SIZE
+        self.running = False
+
+    def dispatch_once(self) -> int:
+        SessionLocal = get_session_maker()
+        with SessionLocal() as db_session:
+            return dispatch_pending(db_session, self.batch_size)
+
+    async def start(self) -> None:
+        self.running = True
+        logger.info("Starting Camunda outbox dispatcher")
+
+        while self.running:
+            try:
+                dispatched = await asyncio.to_thread(self.dispatch_once)
+            except Exception as e:
+                logger.error(f"Error dispatching Camunda outbox: {e}")
+                dispatched = 0
+
+            # Um lote cheio indica que há mais mensagens pendentes
+            if dispatched < self.batch_size:
+                await asyncio.sleep(self.poll_interval)
+
+    async def stop(self) -> None:
+        logger.info("Stopping Camunda outbox dispatcher...")
+        self.running = False
@@ -0,0 +1,329 @@
+"""Provedores de RPA.
+
+Cada provedor (RPASource) tem um adaptador registrado com seu cliente HTTP, limite de envios
+simultâneos, rate limit e fila de espera próprios, então um provedor lento não consome a
+capacidade dos outros. O envio, os logs (RPAEventLog) e as tarefas pendentes são comuns a todos.
+"""
+
+import asyncio
+import datetime
+import secrets
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional
+
+import httpx
+from api.deps import DBSession
+from core.config import settings
+from core.exceptions import RPAException
+from core.logging import setup_logger
+from models.rpa import RPAEventLog, RPAEventTypes, RPAPendingTask, RPASource
+from schemas.rpa_schema import CamundaRequest
+from service.rpa import callback_tokens, outbox
+from service.rpa.melius_client import get_melius_client
+from sqlalchemy import delete
+
+
+logger = setup_logger(__name__)
+
+
+@dataclass
+class RPADispatch:
+    """Resultado do envio de uma tarefa ao provedor, com o log do evento ainda não gravado"""
+
+    process_data: dict
+    event_log: RPAEventLog
+    content: Optional[dict] = None
+    error: Optional[str] = None
+    pending_task: Optional[RPAPendingTask] = None
+
+
+def save_dispatch(db_session: DBSession, dispatch: RPADispatch) -> None:
+    """Adiciona à sessão o log do envio e, se a tarefa foi enviada, sua tarefa pendente"""
+    db_session.add(dispatch.event_log)
+    if dispatch.pending_task is not None:
+        db_session.add(dispatch.pending_task)
+
+
+def callback_lineage(callback_token: str) -> str:
+    """Identifica o envio original da tarefa: o nonce dos reenvios (ou o token aleatório) começa pela linhagem
+    do token anterior, no formato `<linhagem>.<aleatório>`"""
+    if callback_tokens.is_signed_token(callback_token):
+        nonce = callback_tokens.token_nonce(callback_token)
+        return nonce.split(".", 1)[0] if nonce else callback_token
+    return callback_token.split(".", 1)[0]
+
+
+def _dedup_key(process_instance_id: str, callback_token: str) -> str:
+    # Os retornos de todos os envios da tarefa têm a mesma chave, então só o primeiro chega ao Camunda
+    return f"{process_instance_id}:{callback_lineage(callback_token)}"
+
+
+def accept_callback(
+    db_session: DBSession,
+    process_instance_id: str,
+    event_source: RPASource,
+    callback_token: str,
+    tipo_tarefa_rpa: str,
+    result: dict,
+    event_data: dict,
+) -> bool:
+    """Roteia o retorno (já autenticado) de uma tarefa de qualquer provedor para o Camunda.
+
+    A mensagem `result_rpa_<tipo>` é gravada na outbox e a tarefa deixa de ser acompanhada pelo
+    sweeper. Retorna False se o retorno já havia sido recebido.
+    """
+    message_name = f"result_rpa_{tipo_tarefa_rpa}"
+    camunda_request = CamundaRequest(
+        message_name=message_name,
+        process_variables={message_name: {"value": result}},
+        process_instance_id=process_instance_id,
+    )
+    enqueued = outbox.enqueue_message(
+        db_session,
+        dedup_key=_dedup_key(process_instance_id, callback_token),
+        process_instance_id=process_instance_id,
+        event_source=event_source,
+        message_name=message_name,
+        payload=camunda_request.model_dump(by_alias=True),
+        event_data=event_data,
+    )
+    if not enqueued:
+        logger.info(f"RPA result for task {process_instance_id} already received")
+
+    # Remove a tarefa pendente de qualquer envio, inclusive de um reenvio posterior ao token recebido: o Camunda
+    # correlaciona a mensagem só pela instância e pelo tipo da tarefa
+    db_session.execute(
+        delete(RPAPendingTask).where(
+            RPAPendingTask.process_id == process_instance_id,  # type: ignore
+            RPAPendingTask.tipo_tarefa_rpa == tipo_tarefa_rpa,  # type: ignore
+        )
+    )
+    return enqueued
+
+
+class RateLimiter:
+    """Espaça as chamadas para no máximo `rate` por segundo (0 desabilita)"""
+
+    def __init__(self, rate: float):
+        self.interval = 1 / rate if rate else 0.0
+        self._next_at = 0.0
+
+    async def acquire(self) -> None:
+        if not self.interval:
+            return
+
+        now = asyncio.get_running_loop().time()
+        wait = self._next_at - now
+        self._next_at = max(now, self._next_at) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+@dataclass
+class ProviderLimits:
+    semaphore: asyncio.Semaphore
+    rate_limiter: RateLimiter
+    waiting: int = 0
+
+
+class RPAProvider(ABC):
+    """Adaptador de um provedor de RPA"""
+
+    source: RPASource
+    # Campos preenchidos a cada envio, que não são guardados para o reenvio da tarefa
+    DISPATCH_FIELDS: tuple[str, ...] = ()
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._limits: Optional[ProviderLimits] = None
+
+    @property
+    @abstractmethod
+    def max_concurrency(self) -> int: ...
+
+    @property
+    @abstractmethod
+    def rate_limit(self) -> float: ...
+
+    @property
+    @abstractmethod
+    def max_queue(self) -> int: ...
+
+    @property
+    @abstractmethod
+    def task_timeout(self) -> int: ...
+
+    @abstractmethod
+    def get_client(self) -> httpx.AsyncClient: ...
+
+    @abstractmethod
+    def task_id(self, process_data: dict) -> str: ...
+
+    @abstractmethod
+    def task_type(self, process_data: dict) -> str: ...
+
+    @abstractmethod
+    def prepare(self, process_data: dict, callback_token: str) -> None:
+        """Completa os dados da tarefa com a autenticação e o retorno (webhook e token)"""
+
+    @abstractmethod
+    async def send(self, process_data: dict) -> dict:
+        """Envia a tarefa ao provedor, retornando o conteúdo da resposta"""
+
+    def callback_token(self, process_data: dict, previous_token: Optional[str] = None) -> str:
+        """Token de retorno do envio. No reenvio, mantém a linhagem do token anterior (ver callback_lineage)"""
+        nonce = f"{callback_lineage(previous_token)}.{secrets.token_hex(4)}" if previous_token else None
+        if callback_tokens.signing_enabled():
+            return callback_tokens.sign_callback_token(
+                self.task_id(process_data), self.task_type(process_data), nonce=nonce
+            )
+        return nonce or secrets.token_hex(16)
+
+    def limits(self) -> ProviderLimits:
+        # Os primitivos do asyncio pertencem ao event loop em que são usados
+        loop = asyncio.get_running_loop()
+        if self._limits is None or self._loop is not loop:
+            self._loop = loop
+            self._limits = ProviderLimits(asyncio.Semaphore(self.max_concurrency), RateLimiter(self.rate_limit))
+        return self._limits
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Aguarda, na fila do provedor, uma vaga de envio dentro dos limites de concorrência e de taxa"""
+        limits = self.limits()
+        if limits.waiting >= self.max_queue:
+            raise RPAException(f"Fila de envio do provedor {self.source.value} cheia")
+
+        limits.waiting += 1
+        try:
+            await limits.semaphore.acquire()
+        finally:
+            limits.waiting -= 1
+
+        try:
+            await limits.rate_limiter.acquire()
+            yield
+        finally:
+            limits.semaphore.release()
+
+    def _event_log(self, process_data: dict, event_type: RPAEventTypes, event_data: dict) -> RPAEventLog:
+        return RPAEventLog(
+            process_id=self.task_id(process_data),
+            event_type=event_type,
+            event_source=self.source,
+            event_data=event_data,
+        )
+
+    def _pending_task(self, process_data: dict, callback_token: str, attempts: int) -> RPAPendingTask:
+        return RPAPendingTask(
+            process_id=self.task_id(process_data),
+            token_retorno=callback_token,
+            tipo_tarefa_rpa=self.task_type(process_data),
+            event_source=self.source,
+            process_data={key: value for key, value in process_data.items() if key not in self.DISPATCH_FIELDS},
+            attempts=attempts,
+            deadline_at=datetime.datetime.utcnow() + datetime.timedelta(seconds=self.task_timeout),
+        )
+
+    async def dispatch(
+        self, process_data: dict, attempts: int = 1, previous_token: Optional[str] = None
+    ) -> RPADispatch:
+        """Envia a tarefa sem acessar o banco: erros são retornados no resultado, junto do log START_ERROR.
+
+        Em caso de sucesso, o resultado inclui a tarefa pendente, que aguarda o webhook até o prazo do provedor.
+        No reenvio de uma tarefa sem retorno, `previous_token` é o token do envio anterior.
+        """
+        try:
+            async with self.slot():
+                callback_token = self.callback_token(process_data, previous_token)
+                self.prepare(process_data, callback_token)
+                logger.info(f"Starting {self.source.value} RPA with process data: {process_data}")
+                content = await self.send(process_data)
+        except httpx.HTTPStatusError as e:
+            logger.error(f"Error starting {self.source.value} RPA: {e} | Content: {e.response.content}")
+            event_log = self._event_log(
+                process_data,
+                RPAEventTypes.START_ERROR,
+                {
+                    "error": str(e),
+                    "response_content": e.response.content.decode(),
+                    "process_data_request": process_data,
+                },
+            )
+            return RPADispatch(process_data=process_data, event_log=event_log, error=e.response.content.decode())
+        except Exception as e:
+            logger.error(f"Error starting {self.source.value} RPA: {e}")
+            event_log = self._event_log(
+                process_data, RPAEventTypes.START_ERROR, {"error": str(e), "process_data_request": process_data}
+            )
+            return RPADispatch(process_data=process_data, event_log=event_log, error=str(e))
+
+        return RPADispatch(
+            process_data=process_data,
+            event_log=self._event_log(process_data, RPAEventTypes.START, process_data),
+            content=content,
+            pending_task=self._pending_task(process_data, callback_token, attempts),
+        )
+
+
+class MeliusProvider(RPAProvider):
+    source = RPASource.MELIUS
+    DISPATCH_FIELDS = ("token", "urlRetorno", "tokenRetorno", "idRequisicao")
+
+    @property
+    def max_concurrency(self) -> int:
+        return settings.MELIUS_RPA_MAX_CONCURRENCY
+
+    @property
+    def rate_limit(self) -> float:
+        return settings.MELIUS_RPA_RATE_LIMIT
+
+    @property
+    def max_queue(self) -> int:
+        return settings.MELIUS_RPA_MAX_QUEUE
+
+    @property
+    def task_timeout(self) -> int:
+        return settings.MELIUS_RPA_TASK_TIMEOUT
+
+    def get_client(self) -> httpx.AsyncClient:
+        return get_melius_client()
+
+    def task_id(self, process_data: dict) -> str:
+        return process_data.get("idTarefaCliente", "")
+
+    def task_type(self, process_data: dict) -> str:
+        return process_data.get("tipoTarefaRpa", "")
+
+    def prepare(self, process_data: dict, callback_token: str) -> None:
+        process_data["token"] = settings.MELIUS_RPA_TOKEN
+        process_data["urlRetorno"] = f"{settings.CORE_APP_URL}/api/melius/webhook"  # Link do webhook
+        process_data["tokenRetorno"] = callback_token
+
+    async def send(self, process_data: dict) -> dict:
+        response = await self.get_client().post(f"{settings.MELIUS_RPA_URL}/envia-tarefa-rpa", json=process_data)
+        response.raise_for_status()
+
+        content = response.json()
+        logger.info(f"Response from Melius RPA: {content}")
+        process_data["idRequisicao"] = content.get("idRequisicao", "")
+        return content
+
+
+_PROVIDERS: dict[RPASource, RPAProvider] = {}
+
+
+def register_provider(provider: RPAProvider) -> None:
+    _PROVIDERS[provider.source] = provider
+
+
+def get_provider(source: RPASource) -> RPAProvider:
+    provider = _PROVIDERS.get(RPASource(source))
+    if provider is None:
+        raise RPAException(f"Provedor de RPA não suportado: {source}")
+    return provider
+
+
+register_provider(MeliusProvider())
@@ -1,101 +1,158 @@
-import secrets
+import asyncio
+import json
+from typing import Optional
 
-import httpx
 from api.deps import DBSession
 from core.config import settings
 from core.exceptions import RPAException
 from core.logging import setup_logger
-from models.rpa import RPAEventLog, RPAEventTypes, RPASource
-from schemas.rpa_schema import CamundaRequest, MeliusWebhookRequest
-from sqlalchemy import select
+from db.session import get_session_maker
+from models.rpa import RPAEventLog, RPAEventTypes, RPAPendingTask, RPASource
+from schemas.rpa_schema import (
+    MeliusBatchItemResult,
+    MeliusBatchResponse,
+    MeliusWebhookRequest,
+)
+from service.camunda.external_tasks import ExternalTask
+from service.rpa import callback_tokens, idempotency, providers
+from service.rpa.providers import RPADispatch, save_dispatch
+from sqlalchemy import insert, select
+from starlette.concurrency import run_in_threadpool
 
 
 logger = setup_logger(__name__)
 
 
-def start_melius_rpa(process_data: dict, db_session: DBSession):
+async def dispatch_melius_rpa(process_data: dict, attempts: int = 1) -> RPADispatch:
+    """Envia a tarefa para a Melius, dentro dos limites do provedor, sem acessar o banco"""
+    return await providers.get_provider(RPASource.MELIUS).dispatch(process_data, attempts=attempts)
+
+
+async def start_melius_rpa(process_data: dict, db_session: DBSession, idempotency_key: Optional[str] = None):
+    """Envia a tarefa para a Melius; requisições repetidas (mesma chave de idempotência) retornam a resposta guardada"""
+    key = idempotency.request_key(process_data, idempotency_key)
+    if key is not None:
+        body_hash = idempotency.request_hash(process_data)
+        stored_response = await run_in_threadpool(idempotency.claim_key, db_session, key, body_hash)
+        if stored_response is not None:
+            return stored_response
+
     try:
-        process_data["token"] = settings.MELIUS_RPA_TOKEN
-        logger.info(f"Starting Melius RPA with process data: {process_data}")
+        dispatch = await dispatch_melius_rpa(process_data)
+    except BaseException:
+        # Inclui o cancelamento da requisição: sem liberar a chave, as novas tentativas esperariam o lease
+        if key is not None:
+            await run_in_threadpool(_release_idempotency_key, db_session, key)
+        raise
 
-        process_data["urlRetorno"] = f"{settings.CORE_APP_URL}/api/melius/webhook"  # Link do webhook
+    save_dispatch(db_session, dispatch)
+    if dispatch.error is not None:
+        if key is not None:
+            await run_in_threadpool(idempotency.release_key, db_session, key)
+        await run_in_threadpool(db_session.commit)
+        raise RPAException(dispatch.error)
 
-        process_data["tokenRetorno"] = secrets.token_hex(16)
-        url = f"{settings.MELIUS_RPA_URL}/envia-tarefa-rpa"
+    if key is not None:
+        await run_in_threadpool(idempotency.complete_key, db_session, key, dispatch.content)
+    # A resposta guardada e o log START são confirmados juntos
+    await run_in_threadpool(db_session.commit)
+    return dispatch.content
 
-        response = httpx.post(url, json=process_data)
-        response.raise_for_status()
 
-        logger.info(f"Response from Melius RPA: {response.json()}")
-        content = response.json()
-        process_data["idRequisicao"] = content.get("idRequisicao", "")
+def _release_idempotency_key(db_session: DBSession, key: str) -> None:
+    db_session.rollback()
+    idempotency.release_key(db_session, key)
+    db_session.commit()
 
-        db_session.add(
-            RPAEventLog(
-                process_id=process_data.get("idTarefaCliente", ""),
-                event_type=RPAEventTypes.START,
-                event_source=RPASource.MELIUS,
-                event_data=process_data,
-            )
-        )
 
-        return content
-    except httpx.HTTPStatusError as e:
-        logger.error(f"Error starting Melius RPA: {e} | Content: {e.response.content}")
-        db_session.add(
-            RPAEventLog(
-                process_id=process_data.get("idTarefaCliente", ""),
-                event_type=RPAEventTypes.START_ERROR,
-                event_source=RPASource.MELIUS,
-                event_data={
-                    "error": str(e),
-                    "response_content": e.response.content.decode(),
-                    "process_data_request": process_data,
-                },
-            )
+async def start_melius_rpa_batch(items: list[dict], db_session: DBSession) -> MeliusBatchResponse:
+    """Envia várias tarefas para a Melius em paralelo, limitadas por MELIUS_RPA_BATCH_CONCURRENCY.
+
+    Os logs START/START_ERROR de todas as tarefas são gravados em um único insert.
+    """
+    semaphore = asyncio.Semaphore(settings.MELIUS_RPA_BATCH_CONCURRENCY)
+
+    async def dispatch(process_data: dict) -> RPADispatch:
+        async with semaphore:
+            return await dispatch_melius_rpa(process_data)
+
+    dispatches = await asyncio.gather(*(dispatch(process_data) for process_data in items))
+
+    event_logs = [dispatch.event_log.model_dump(exclude={"id"}) for dispatch in dispatches]
+    await run_in_threadpool(db_session.execute, insert(RPAEventLog), event_logs)
+    pending_tasks = [
+        dispatch.pending_task.model_dump(exclude={"id"}) for dispatch in dispatches if dispatch.pending_task
+    ]
+    if pending_tasks:
+        await run_in_threadpool(db_session.execute, insert(RPAPendingTask), pending_tasks)
+
+    results = [
+        MeliusBatchItemResult(
+            id_tarefa_cliente=dispatch.process_data.get("idTarefaCliente", ""),
+            success=dispatch.error is None,
+            response=dispatch.content,
+            error=dispatch.error,
         )
+        for dispatch in dispatches
+    ]
+    started = sum(result.success for result in results)
+    logger.info(f"Melius RPA batch: {started} started, {len(results) - started} failed")
+    return MeliusBatchResponse(started=started, failed=len(results) - started, results=results)
+
+
+def _save_dispatch(dispatch: RPADispatch, key: Optional[str] = None) -> None:
+    """Grava o envio e, quando há chave de idempotência, guarda a resposta (ou libera a chave) na mesma transação"""
+    SessionLocal = get_session_maker()
+    with SessionLocal() as db_session:
+        save_dispatch(db_session, dispatch)
+        if key is not None and dispatch.error is not None:
+            idempotency.release_key(db_session, key)
+        elif key is not None:
+            idempotency.complete_key(db_session, key, dispatch.content)
         db_session.commit()
-        raise RPAException(str(e.response.content.decode()))
-    except Exception as e:
-        logger.error(f"Error starting Melius RPA: {e}")
-        db_session.add(
-            RPAEventLog(
-                process_id=process_data.get("idTarefaCliente", ""),
-                event_type=RPAEventTypes.START_ERROR,
-                event_source=RPASource.MELIUS,
-                event_data={"error": str(e), "process_data_request": process_data},
-            )
-        )
+
+
+def _claim_key(key: str, body_hash: str) -> Optional[dict]:
+    SessionLocal = get_session_maker()
+    with SessionLocal() as db_session:
+        return idempotency.claim_key(db_session, key, body_hash)
+
+
+def _release_key(key: str) -> None:
+    SessionLocal = get_session_maker()
+    with SessionLocal() as db_session:
+        idempotency.release_key(db_session, key)
         db_session.commit()
-        raise RPAException(str(e))
 
 
-def _make_camunda_request(url, params: dict):
-    headers = {
-        "Content-Type": "application/json",
-    }
-    timeout = httpx.Timeout(30.0)
+async def handle_melius_external_task(task: ExternalTask) -> dict:
+    """Handler das external tasks de RPA da Melius: a variável `process_data` da tarefa é enviada à Melius.
+    Uma tarefa reentregue (ex: o complete não chegou ao Camunda) retorna a resposta guardada, sem um novo envio.
+    """
+    process_data = dict(task.get_variable("process_data") or {})
+    process_data.setdefault("idTarefaCliente", task.process_instance_id)
 
-    if settings.ENV == "production":
-        headers["X-API-Key"] = f"{settings.CAMUNDA_API_TOKEN}"
-        response = httpx.post(url, json=params, headers=headers, timeout=timeout)
-    else:
-        auth = httpx.BasicAuth(settings.CAMUNDA_USERNAME, settings.CAMUNDA_PASSWORD)
-        response = httpx.post(url, json=params, headers=headers, auth=auth, timeout=timeout)
+    key = idempotency.external_task_key(task.id)
+    content = await run_in_threadpool(_claim_key, key, idempotency.request_hash(process_data))
+    if content is not None:
+        logger.info(f"External task {task.id} already dispatched to Melius, returning the stored response")
+        return {"melius_response": {"value": json.dumps(content), "type": "Json"}}
 
-    response.raise_for_status()
+    try:
+        dispatch = await dispatch_melius_rpa(process_data)
+    except BaseException:
+        await run_in_threadpool(_release_key, key)
+        raise
 
-    return response
+    await run_in_threadpool(_save_dispatch, dispatch, key)
+    if dispatch.error is not None:
+        raise RPAException(dispatch.error)
 
+    return {"melius_response": {"value": json.dumps(dispatch.content), "type": "Json"}}
 
-def handle_webhook_request(request: MeliusWebhookRequest, db_session: DBSession):
-    """
-    Webhook para receber update dos RPAs da Melius.
 
-    - Recebe o payload do webhook
-    - Processa o payload
-    - Envia o payload para o Camunda
-    """
+def _get_start_event_data(request: MeliusWebhookRequest, db_session: DBSession) -> dict:
+    """Valida um token aleatório (legado) pelo log de START da tarefa, retornando os dados do START"""
     stmt = (
         select(RPAEventLog)
         .where(
@@ -110,68 +167,43 @@ def handle_webhook_request(request: MeliusWebhookRequest, db_session: DBSession)
     if not rpa_event_logs or rpa_event_logs[0].event_type != RPAEventTypes.START:
         raise RPAException("Token inválido ou tarefa não encontrada")
 
-    logger.info(f"Received Melius Webhook request with process_data: {request.model_dump()}")
-    try:
-        message_name = f"result_rpa_{rpa_event_logs[0].event_data['tipoTarefaRpa']}"
-        camunda_request = CamundaRequest(
-            message_name=message_name,
-            process_variables={
-                message_name: {
-                    "value": request.model_dump(
-                        include=[
-                            "status_tarefa_rpa",
-                            "mensagem_retorno",
-                            "arquivos_gerados",
-                            "parametros_complementares",
-                        ]  # type: ignore
-                    ),
-                },
-            },
-            process_instance_id=request.id_tarefa_cliente,
-        )
+    return rpa_event_logs[0].event_data
 
-        _make_camunda_request(
-            f"{settings.CAMUNDA_ENGINE_URL}/message",
-            camunda_request.model_dump(by_alias=True),
-        )
-    except httpx.HTTPStatusError as e:
-        logger.error(f"Error sending request to Camunda: {e} | Content: {e.response.content}")
-        db_session.add(
-            RPAEventLog(
-                process_id=request.id_tarefa_cliente,
-                event_type=RPAEventTypes.FINISH_WITH_ERROR,
-                event_source=RPASource.MELIUS,
-                event_data={
-                    "error": str(e),
-                    "response_content": e.response.content.decode(),
-                    "camunda_request": camunda_request.model_dump(by_alias=True),
-                    **rpa_event_logs[0].event_data,
-                },
-            )
-        )
-    except Exception as e:
-        logger.error(f"Error processing Melius request: {e} ")
-        db_session.add(
-            RPAEventLog(
-                process_id=request.id_tarefa_cliente,
-                event_type=RPAEventTypes.FINISH_WITH_ERROR,
-                event_source=RPASource.MELIUS,
-                event_data={
-                    "error": str(e),
-                    "response_content": str(e),
-                    "camunda_request": camunda_request.model_dump(by_alias=True),
-                    **rpa_event_logs[0].event_data,
-                },
-            )
-        )
+
+def handle_webhook_request(request: MeliusWebhookRequest, db_session: DBSession):
+    """
+    Webhook para receber update dos RPAs da Melius.
+
+    - Recebe o payload do webhook
+    - Valida o token de retorno da tarefa: tokens assinados são validados sem consulta ao banco,
+      tokens aleatórios (legado) pelo log de START
+    - Grava a mensagem para o Camunda na outbox, enviada em background pelo OutboxDispatcher
+    """
+    if callback_tokens.is_signed_token(request.token_retorno):
+        claims = callback_tokens.verify_callback_token(request.token_retorno, request.id_tarefa_cliente)
+        start_event_data = {"tipoTarefaRpa": claims.tipo_tarefa_rpa, "tokenRetorno": request.token_retorno}
+    elif settings.MELIUS_CALLBACK_LEGACY_TOKENS_ENABLED:
+        start_event_data = _get_start_event_data(request, db_session)
     else:
-        db_session.add(
-            RPAEventLog(
-                process_id=request.id_tarefa_cliente,
-                event_type=RPAEventTypes.FINISH,
-                event_source=RPASource.MELIUS,
-                event_data=request.model_dump(),
-            )
-        )
+        raise RPAException("Token inválido ou tarefa não encontrada")
+
+    logger.info(f"Received Melius Webhook request with process_data: {request.model_dump()}")
+    providers.accept_callback(
+        db_session,
+        process_instance_id=request.id_tarefa_cliente,
+        event_source=RPASource.MELIUS,
+        callback_token=request.token_retorno,
+        tipo_tarefa_rpa=start_event_data["tipoTarefaRpa"],
+        result=request.model_dump(
+            include=[
+                "status_tarefa_rpa",
+                "mensagem_retorno",
+                "arquivos_gerados",
+                "parametros_complementares",
+            ]  # type: ignore
+        ),
+        # O log FINISH mantém os dados do START (incluindo o tokenRetorno) para identificar webhooks repetidos
+        event_data={**start_event_data, **request.model_dump()},
+    )
 
     return {"message": "Webhook Melius recebido com sucesso"}
@@ -0,0 +1,205 @@
+"""Sweeper das tarefas de RPA sem retorno.
+
+As tarefas enviadas ficam em `rpa_pending_task` até a chegada do webhook. Periodicamente, o
+sweeper busca pelo índice de prazo as tarefas vencidas: reenvia a tarefa ao RPA enquanto houver
+tentativas (MELIUS_RPA_TASK_MAX_ATTEMPTS) e, depois disso, notifica o Camunda do timeout pela
+outbox, com o status de tratativa manual.
+
+As tarefas são reservadas adiando o prazo (RPA_SWEEPER_LEASE_SECONDS) em uma transação curta;
+o reenvio aos provedores acontece fora da transação, sem locks no banco. O token do reenvio mantém
+a linhagem do token anterior, então um webhook atrasado do envio anterior é deduplicado com o do reenvio.
+"""
+
+import asyncio
+import datetime
+from dataclasses import dataclass
+from typing import Optional
+
+from api.deps import DBSession
+from core.config import settings
+from core.logging import setup_logger
+from db.session import get_session_maker
+from models.rpa import RPAPendingTask, RPASource
+from schemas.rpa_schema import CamundaRequest, StatusTarefaRpa
+from service.rpa import idempotency, outbox, providers
+from sqlalchemy import select
+from starlette.concurrency import run_in_threadpool
+
+
+logger = setup_logger(__name__)
+
+TIMEOUT_MESSAGE = "Tempo limite para o retorno do RPA excedido"
+
+
+@dataclass
+class ClaimedTask:
+    """Dados da tarefa reservada para o reenvio, usados fora da transação"""
+
+    id: int
+    event_source: RPASource
+    process_data: dict
+    attempts: int
+    token_retorno: str
+
+
+def claim_expired_tasks(db_session: DBSession, limit: int) -> list[RPAPendingTask]:
+    """Reserva as tarefas com prazo vencido, ignorando as que outro sweeper já está tratando.
+
+    O prazo das tarefas é adiado por RPA_SWEEPER_LEASE_SECONDS: depois do commit, as tarefas
+    continuam fora das outras varreduras sem manter os locks.
+    """
+    now = datetime.datetime.utcnow()
+    stmt = (
+        select(RPAPendingTask)
+        .where(RPAPendingTask.deadline_at <= now)  # type: ignore
+        .order_by(RPAPendingTask.deadline_at)  # type: ignore
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    tasks = list(db_session.execute(stmt).scalars().all())
+    for task in tasks:
+        task.deadline_at = now + datetime.timedelta(seconds=settings.RPA_SWEEPER_LEASE_SECONDS)
+    return tasks
+
+
+def notify_timeout(db_session: DBSession, task: RPAPendingTask) -> None:
+    """Envia ao Camunda, pela outbox, o retorno de tratativa manual da tarefa que excedeu o prazo"""
+    message_name = f"result_rpa_{task.tipo_tarefa_rpa}"
+    camunda_request = CamundaRequest(
+        message_name=message_name,
+        process_variables={
+            message_name: {
+                "value": {
+                    "status_tarefa_rpa": StatusTarefaRpa.TRATATIVA_MANUAL,
+                    "mensagem_retorno": TIMEOUT_MESSAGE,
+                    "arquivos_gerados": None,
+                    "parametros_complementares": None,
+                },
+            },
+        },
+        process_instance_id=task.process_id,
+    )
+    outbox.enqueue_message(
+        db_session,
+        dedup_key=f"{task.process_id}:timeout:{task.id}",
+        process_instance_id=task.process_id,
+        event_source=task.event_source,
+        message_name=message_name,
+        payload=camunda_request.model_dump(by_alias=True),
+        event_data={
+            "tipoTarefaRpa": task.tipo_tarefa_rpa,
+            "tokenRetorno": task.token_retorno,
+            "mensagem_retorno": TIMEOUT_MESSAGE,
+            "timeout": True,
+        },
+    )
+
+
+def _claim_tasks(db_session: DBSession, limit: int) -> tuple[list[ClaimedTask], int]:
+    """Reserva as tarefas vencidas a reenviar e encerra por timeout as que não têm mais tentativas"""
+    redispatch, timed_out = [], 0
+    for task in claim_expired_tasks(db_session, limit):
+        if task.attempts < settings.MELIUS_RPA_TASK_MAX_ATTEMPTS:
+            redispatch.append(
+                ClaimedTask(
+                    id=task.id,  # type: ignore
+                    event_source=task.event_source,
+                    process_data=dict(task.process_data),
+                    attempts=task.attempts,
+                    token_retorno=task.token_retorno,
+                )
+            )
+            continue
+
+        logger.warning(f"RPA task {task.process_id} ({task.tipo_tarefa_rpa}) timed out after {task.attempts} attempts")
+        notify_timeout(db_session, task)
+        db_session.delete(task)
+        timed_out += 1
+
+    db_session.commit()
+    return redispatch, timed_out
+
+
+def _record_redispatches(
+    db_session: DBSession, tasks: list[ClaimedTask], dispatches: list[providers.RPADispatch]
+) -> dict:
+    """Grava o resultado dos reenvios, relendo as tarefas reservadas"""
+    result = {"redispatched": 0, "redispatch_errors": 0}
+    for claimed, dispatch in zip(tasks, dispatches, strict=True):
+        stmt = select(RPAPendingTask).where(RPAPendingTask.id == claimed.id).with_for_update()  # type: ignore
+        task = db_session.execute(stmt).scalar_one_or_none()
+        if task is None:
+            # O webhook do envio anterior chegou durante o reenvio: o retorno do reenvio será deduplicado
+            dispatch.pending_task = None
+
+        providers.save_dispatch(db_session, dispatch)
+        if dispatch.error is None:
+            if task is not None:
+                db_session.delete(task)
+            result["redispatched"] += 1
+        else:
+            # A falha conta como tentativa; a tarefa volta na próxima varredura
+            if task is not None:
+                task.attempts += 1
+                task.deadline_at = datetime.datetime.utcnow()
+            result["redispatch_errors"] += 1
+
+    db_session.commit()
+    return result
+
+
+async def sweep_expired_tasks(db_session: DBSession, limit: Optional[int] = None) -> dict:
+    """Reenvia ou encerra por timeout as tarefas vencidas, retornando a quantidade de cada caso"""
+    redispatch, timed_out = await run_in_threadpool(_claim_tasks, db_session, limit or settings.RPA_SWEEPER_BATCH_SIZE)
+
+    dispatches = await asyncio.gather(
+        *(
+            providers.get_provider(task.event_source).dispatch(
+                dict(task.process_data), attempts=task.attempts + 1, previous_token=task.token_retorno
+            )
+            for task in redispatch
+        )
+    )
+
+    result = await run_in_threadpool(_record_redispatches, db_session, redispatch, dispatches)
+    result["timed_out"] = timed_out
+    if redispatch or timed_out:
+        logger.info(f"RPA sweeper: {result}")
+    return result
+
+
+class RPATaskSweeper:
+    """Executa a varredura das tarefas vencidas a cada RPA_SWEEPER_INTERVAL segundos.
+
+    A cada varredura também remove as chaves de idempotência expiradas.
+    """
+
+    def __init__(self, interval: Optional[float] = None):
+        self.interval = interval or settings.RPA_SWEEPER_INTERVAL
+        self.running = False
+
+    async def sweep_once(self) -> dict:
+        SessionLocal = get_session_maker()
+        db_session = SessionLocal()
+        try:
+            result = await sweep_expired_tasks(db_session)
+            await run_in_threadpool(idempotency.purge_expired_keys, db_session)
+            return result
+        finally:
+            await run_in_threadpool(db_session.close)
+
+    async def start(self) -> None:
+        self.running = True
+        logger.info("Starting RPA task sweeper")
+
+        while self.running:
+            try:
+                await self.sweep_once()
+            except Exception as e:
+                logger.error(f"Error sweeping RPA tasks: {e}")
+
+            await asyncio.sleep(self.interval)
+
+    async def stop(self) -> None:
+        logger.info("Stopping RPA task sweeper...")
+        self.running = False
@@ -0,0 +1,300 @@
+import asyncio
+import datetime
+import threading
+import time
+
+from core.config import settings
+from fastapi.testclient import TestClient
+from httpx import codes
+from models.audit import ReplayAttempt, ReplayAttemptStatus, ReplayEventLog
+from models.camunda import ProcessEventLog, ProcessEventTypes
+from models.rpa import (
+    CamundaOutbox,
+    RPAEventLog,
+    RPAEventTypes,
+    RPAPendingTask,
+    RPASource,
+)
+from schemas.replay_schema import ReplayRequest, ReplaySource
+from service.audit import replay
+from sqlmodel import select
+
+
+NOW = datetime.datetime.now()
+
+
+def start_payload(cnpj: str) -> dict:
+    return {"variables": {"cnpj": {"value": cnpj, "type": "string"}}, "businessKey": "fechamento_folha_3"}
+
+
+def add_process_error(
+    db_session, process_key: str, cnpj: str, minutes_ago: int = 5, error: str = "Read timeout", payload: bool = True
+) -> ProcessEventLog:
+    event_data = {"cnpj": cnpj, "company": f"Empresa {cnpj}", "error": error}
+    if payload:
+        event_data["payload"] = start_payload(cnpj)
+    event = ProcessEventLog(
+        process_id=process_key,
+        event_type=ProcessEventTypes.START_ERROR,
+        event_data=event_data,
+        created_at=NOW - datetime.timedelta(minutes=minutes_ago),
+    )
+    db_session.add(event)
+    db_session.commit()
+    return event
+
+
+def add_rpa_error(db_session, process_id: str, event_type: RPAEventTypes, event_data: dict) -> RPAEventLog:
+    event = RPAEventLog(
+        process_id=process_id,
+        event_type=event_type,
+        event_source=RPASource.MELIUS,
+        event_data=event_data,
+        created_at=datetime.datetime.utcnow() - datetime.timedelta(minutes=5),
+    )
+    db_session.add(event)
+    db_session.commit()
+    return event
+
+
+def start_error(process_id: str, error: str = "Read timeout") -> dict:
+    return {
+        "error": error,
+        "process_data_request": {
+            "idTarefaCliente": process_id,
+            "tipoTarefaRpa": "traDctf",
+            "tokenRetorno": "token-antigo",
+            "urlRetorno": "http://antigo",
+        },
+    }
+
+
+def request(source: ReplaySource, **kwargs) -> ReplayRequest:
+    return ReplayRequest(source=source, created_from=NOW - datetime.timedelta(hours=1), **kwargs)
+
+
+def get_attempts(db_session) -> list[ReplayAttempt]:
+    return list(db_session.execute(select(ReplayAttempt).order_by(ReplayAttempt.id)).scalars().all())
+
+
+def process_starts(fake_camunda) -> list[dict]:
+    return [call.body for call in fake_camunda.calls_to(r"/process-definition/key/fechamento_folha_3/start$")]
+
+
+def test_replay_process_errors(db_session, fake_camunda):
+    first = add_process_error(db_session, "fechamento_folha_3", "30473147000160", minutes_ago=10)
+    latest = add_process_error(db_session, "fechamento_folha_3", "30473147000160")
+    other = add_process_error(db_session, "fechamento_folha_3", "44968739000167")
+    add_process_error(db_session, "fechamento_folha_3", "12603959000109", minutes_ago=120)
+
+    result = asyncio.run(replay.replay_failed_events(db_session, request(ReplaySource.PROCESS)))
+
+    assert result["selected"] == 3
+    assert result["duplicates"] == 1
+    assert result["dispatched"] == 2
+    assert result["errors"] == 0
+    # O processo é iniciado de novo com o payload registrado no erro
+    starts = sorted(process_starts(fake_camunda), key=lambda payload: payload["variables"]["cnpj"]["value"])
+    assert starts == [start_payload("30473147000160"), start_payload("44968739000167")]
+
+    attempts = {attempt.event_id: attempt for attempt in get_attempts(db_session)}
+    assert attempts[latest.id].status == ReplayAttemptStatus.DISPATCHED
+    assert attempts[other.id].status == ReplayAttemptStatus.DISPATCHED
+    process_instance_id = attempts[latest.id].result["process_instance_id"]
+    start = db_session.execute(select(ProcessEventLog).where(ProcessEventLog.process_id == process_instance_id))
+    assert start.scalar_one().event_type == ProcessEventTypes.START
+    assert attempts[first.id].status == ReplayAttemptStatus.DUPLICATE
+    assert attempts[first.id].result == {"replayed_event_id": latest.id}
+    assert {attempt.event_log for attempt in attempts.values()} == {ReplayEventLog.PROCESS}
+
+    # Eventos já reenviados só são selecionados de novo com force
+    assert asyncio.run(replay.replay_failed_events(db_session, request(ReplaySource.PROCESS)))["selected"] == 0
+    forced = asyncio.run(replay.replay_failed_events(db_session, request(ReplaySource.PROCESS, force=True)))
+    assert forced["selected"] == 3
+
+
+def test_replay_dry_run_does_not_dispatch(db_session, fake_camunda):
+    add_process_error(db_session, "fechamento_folha_3", "30473147000160")
+
+    result = asyncio.run(replay.replay_failed_events(db_session, request(ReplaySource.PROCESS, dry_run=True)))
+
+    assert result["selected"] == 1
+    assert result["dispatched"] == 0
+    assert process_starts(fake_camunda) == []
+    assert get_attempts(db_session) == []
+
+
+def test_replay_error_pattern_matches_only_the_error(db_session, fake_camunda):
+    timeout = add_process_error(db_session, "fechamento_folha_3", "30473147000160")
+    add_process_error(db_session, "fechamento_folha_3", "44968739000167", error="Invalid CNPJ")
+
+    # Os dados do cliente não são considerados
+    no_match = request(ReplaySource.PROCESS, error_pattern="30473147000160", dry_run=True)
+    assert asyncio.run(replay.replay_failed_events(db_session, no_match))["selected"] == 0
+
+    result = asyncio.run(
+        replay.replay_failed_events(db_session, request(ReplaySource.PROCESS, error_pattern="TIMEOUT"))
+    )
+
+    assert result["selected"] == 1
+    [attempt] = get_attempts(db_session)
+    assert attempt.event_id == timeout.id
+
+
+def test_replay_process_error_without_payload(db_session, fake_camunda):
+    add_process_error(db_session, "fechamento_folha_3", "30473147000160", payload=False)
+
+    result = asyncio.run(replay.replay_failed_events(db_session, request(ReplaySource.PROCESS)))
+
+    assert result["errors"] == 1
+    assert process_starts(fake_camunda) == []
+    [attempt] = get_attempts(db_session)
+    assert attempt.status == ReplayAttemptStatus.ERROR
+    assert "payload" in attempt.error
+
+
+def test_replay_records_each_attempt_once_dispatched(db_session, session_maker, fake_camunda, mocker, monkeypatch):
+    monkeypatch.setattr(settings, "REPLAY_CONCURRENCY", 1)
+    add_process_error(db_session, "fechamento_folha_3", "30473147000160")
+    add_process_error(db_session, "fechamento_folha_3", "44968739000167")
+    recorded = []
+
+    def check_attempts_and_start(process_key, payload):
+        with session_maker() as other_session:
+            recorded.append(len(other_session.execute(select(ReplayAttempt)).scalars().all()))
+        return f"instance-{len(recorded)}"
+
+    mocker.patch("service.audit.replay.request_process_start", side_effect=check_attempts_and_start)
+
+    asyncio.run(replay.replay_failed_events(db_session, request(ReplaySource.PROCESS)))
+
+    # A tentativa do primeiro evento já está gravada quando o segundo é reenviado
+    assert recorded == [0, 1]
+
+
+def test_replay_process_starts_are_concurrent_and_bounded(db_session, fake_camunda, mocker, monkeypatch):
+    monkeypatch.setattr(settings, "REPLAY_CONCURRENCY", 2)
+    monkeypatch.setattr(settings, "REPLAY_RATE_LIMIT", 0)
+    for cnpj in ["30473147000160", "12603959000109", "44968739000167", "11111111000111"]:
+        add_process_error(db_session, "fechamento_folha_3", cnpj)
+    lock = threading.Lock()
+    in_flight = peak = 0
+
+    def start(process_key, payload):
+        nonlocal in_flight, peak
+        with lock:
+            in_flight += 1
+            peak = max(peak, in_flight)
+        time.sleep(0.05)
+        with lock:
+            in_flight -= 1
+        return f"instance-{payload['variables']['cnpj']['value']}"
+
+    mocker.patch("service.audit.replay.request_process_start", side_effect=start)
+
+    result = asyncio.run(replay.replay_failed_events(db_session, request(ReplaySource.PROCESS)))
+
+    assert result["dispatched"] == 4
+    assert peak == 2
+    attempts = get_attempts(db_session)
+    assert {attempt.status for attempt in attempts} == {ReplayAttemptStatus.DISPATCHED}
+    starts = db_session.execute(select(ProcessEventLog).where(ProcessEventLog.event_type == ProcessEventTypes.START))
+    assert len(starts.scalars().all()) == 4
+
+
+def test_replay_unknown_process_records_errors(db_session, fake_camunda):
+    add_process_error(db_session, "processo_inexistente", "30473147000160")
+
+    result = asyncio.run(replay.replay_failed_events(db_session, request(ReplaySource.PROCESS)))
+
+    assert result["errors"] == 1
+    [attempt] = get_attempts(db_session)
+    assert attempt.status == ReplayAttemptStatus.ERROR
+    assert "processo_inexistente" in attempt.error
+
+    # Tentativas com erro não impedem um novo replay
+    assert asyncio.run(replay.replay_failed_events(db_session, request(ReplaySource.PROCESS)))["selected"] == 1
+
+
+def test_replay_rpa_start_errors(db_session, melius_api, monkeypatch):
+    monkeypatch.setattr(settings, "REPLAY_RATE_LIMIT", 0)
+    timeout = add_rpa_error(db_session, "task-1", RPAEventTypes.START_ERROR, start_error("task-1"))
+    add_rpa_error(db_session, "task-2", RPAEventTypes.START_ERROR, start_error("task-2", error="Invalid CNPJ"))
+
+    result = asyncio.run(
+        replay.replay_failed_events(db_session, request(ReplaySource.RPA, error_pattern="read TIMEOUT"))
+    )
+
+    assert result["selected"] == 1
+    assert result["dispatched"] == 1
+    [melius_request] = melius_api.requests
+    assert b'"idTarefaCliente":"task-1"' in melius_request.content
+    assert b"token-antigo" not in melius_request.content
+
+    [attempt] = get_attempts(db_session)
+    assert attempt.event_id == timeout.id
+    assert attempt.status == ReplayAttemptStatus.DISPATCHED
+    new_log = db_session.get(RPAEventLog, attempt.result["event_id"])
+    assert new_log.event_type == RPAEventTypes.START
+    assert db_session.execute(select(RPAPendingTask)).scalar_one().process_id == "task-1"
+
+
+def test_replay_dry_run_endpoint_returns_summary(db_session, client: TestClient, fake_camunda):
+    add_process_error(db_session, "fechamento_folha_3", "30473147000160")
+
+    response = client.post(
+        "/api/audit/replay",
+        json={"source": "process", "created_from": (NOW - datetime.timedelta(hours=1)).isoformat(), "dry_run": True},
+    )
+
+    assert response.status_code == codes.OK
+    assert response.json()["selected"] == 1
+    assert response.json()["dispatched"] == 0
+    assert process_starts(fake_camunda) == []
+
+
+def test_replay_rpa_start_error_that_fails_again(db_session, melius_api, monkeypatch):
+    monkeypatch.setattr(settings, "REPLAY_RATE_LIMIT", 0)
+    melius_api.responses.append(RuntimeError("connection refused"))
+    add_rpa_error(db_session, "task-1", RPAEventTypes.START_ERROR, start_error("task-1"))
+
+    result = asyncio.run(replay.replay_failed_events(db_session, request(ReplaySource.RPA)))
+
+    assert result["errors"] == 1
+    [attempt] = get_attempts(db_session)
+    assert attempt.status == ReplayAttemptStatus.ERROR
+    assert db_session.get(RPAEventLog, attempt.result["event_id"]).event_type == RPAEventTypes.START_ERROR
+
+
+def test_replay_rpa_finish_errors_through_outbox(db_session, session_maker, client: TestClient, mocker):
+    mocker.patch("service.audit.replay.get_session_maker", return_value=session_maker)
+    camunda_request = {"messageName": "result_rpa_traDctf", "processInstanceId": "task-1", "processVariables": {}}
+    event_data = {"error": "503", "camunda_request": camunda_request, "tipoTarefaRpa": "traDctf", "tokenRetorno": "t"}
+    event = add_rpa_error(db_session, "task-1", RPAEventTypes.FINISH_WITH_ERROR, event_data)
+    add_rpa_error(db_session, "task-2", RPAEventTypes.FINISH_WITH_ERROR, {**event_data, "tipoTarefaRpa": "outra"})
+
+    response = client.post(
+        "/api/audit/replay",
+        json={
+            "source": "rpa",
+            "created_from": (NOW - datetime.timedelta(hours=1)).isoformat(),
+            "process_key": "traDctf",
+        },
+    )
+
+    # O reenvio é executado em background, depois da resposta
+    assert response.status_code == codes.ACCEPTED
+    body = response.json()
+    assert body["selected"] == 1
+    assert body["dispatched"] is None
+
+    message = db_session.execute(select(CamundaOutbox)).scalar_one()
+    assert message.payload == camunda_request
+    assert message.event_data == {"tipoTarefaRpa": "traDctf", "tokenRetorno": "t"}
+
+    response = client.get(f"/api/audit/replay/{body['replay_id']}")
+
+    assert response.status_code == codes.OK
+    [attempt] = response.json()
+    assert attempt["event_id"] == event.id
+    assert attempt["result"] == {"outbox_dedup_key": message.dedup_key}
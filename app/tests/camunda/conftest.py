@@ -0,0 +1,68 @@
+import csv
+from io import StringIO
+from typing import Iterable
+
+import pytest
+from core.config import settings
+
+
+FOLHA_OBJECT_KEY = "dp/fechamento-folha/folha-elegiveis.csv"
+
+FOLHA_HEADER = [
+    "company",
+    "ID",
+    "cnpj",
+    "origin_cnpj",
+    "customer_profile",
+    "COD Dominio",
+    "Tipo de folha (tratado)",
+    "Analista_dp",
+    "CNPJ_procuração_federal",
+    "erp_operado",
+    "Data de pagamento de folha (tratado)",
+    "útil ou corrido",
+]
+
+
+def build_folha_row(cnpj: str, **overrides) -> dict:
+    row = {
+        "company": f"Empresa {cnpj}",
+        "ID": f"id-{cnpj}",
+        "cnpj": cnpj,
+        "origin_cnpj": cnpj,
+        "customer_profile": "FAMILY_3",
+        "COD Dominio": "123",
+        "Tipo de folha (tratado)": "com movimento",
+        "Analista_dp": "analista@bhub.ai",
+        "CNPJ_procuração_federal": "12603959000109",
+        "erp_operado": "dominio",
+        "Data de pagamento de folha (tratado)": "5",
+        "útil ou corrido": "útil",
+    }
+    row.update(overrides)
+    return row
+
+
+def build_folha_csv(rows: list[dict], header: Iterable[str] = FOLHA_HEADER) -> str:
+    output = StringIO()
+    writer = csv.DictWriter(output, fieldnames=list(header))
+    writer.writeheader()
+    writer.writerows(rows)
+    return output.getvalue()
+
+
+@pytest.fixture
+def folha_csv():
+    return build_folha_csv(
+        [
+            build_folha_row("30473147000160"),
+            build_folha_row("12603959000109", **{"Data de pagamento de folha (tratado)": "n/a"}),
+            build_folha_row("44968739000167", customer_profile="FAMILY_5"),
+            build_folha_row("99999999000199"),
+        ]
+    )
+
+
+@pytest.fixture
+def folha_object(fake_s3, folha_csv):
+    return fake_s3.put_object(Bucket=settings.CORE_SAIDA_BUCKET_NAME, Key=FOLHA_OBJECT_KEY, Body=folha_csv)
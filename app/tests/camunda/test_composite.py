@@ -0,0 +1,54 @@
+import logging
+
+import pytest
+from core.exceptions import CoreSaidaOrchestratorException
+from models.camunda import ProcessEventLog, ProcessEventTypes
+from service.camunda.composite import CompositeProcessStarter
+from service.camunda.eligibility import EligibilityRules, ValueMap
+from service.camunda.fechamento_folha import FechamentoFolha3Process
+from sqlmodel import select
+
+
+logger = logging.getLogger(__name__)
+
+
+class FechamentoFolha5Process(FechamentoFolha3Process):
+    ELIGIBILITY_RULES = EligibilityRules(ValueMap("customer_profile", {"FAMILY_5": True}))
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.process_key = "tarefa_fgts_familia5"
+
+
+def test_composite_reads_content_once(fake_camunda, fake_s3, db_session, folha_object):
+    composite = CompositeProcessStarter(
+        db_session=db_session,
+        logger=logger,
+        processes=[
+            FechamentoFolha3Process(db_session=db_session, logger=logger),
+            FechamentoFolha5Process(db_session=db_session, logger=logger),
+        ],
+    )
+
+    composite.start_process()
+
+    assert len(fake_s3.calls_to("get_object")) == 1
+    assert composite.content_version == folha_object["VersionId"]
+    assert len(fake_camunda.calls_to(r"/key/tarefa_fgts_familia3/start$")) == 3
+    familia5_calls = fake_camunda.calls_to(r"/key/tarefa_fgts_familia5/start$")
+    assert [call.body["businessKey"] for call in familia5_calls] == ["tarefa_fgts_familia5"]
+
+    events = db_session.execute(select(ProcessEventLog)).scalars().all()
+    assert len([event for event in events if event.event_type == ProcessEventTypes.START]) == 4
+
+
+def test_composite_requires_same_content_source(db_session):
+    other_file = FechamentoFolha5Process(db_session=db_session, logger=logger)
+    other_file.s3_file_path = "dp/fechamento-folha/outro.csv"
+
+    with pytest.raises(CoreSaidaOrchestratorException, match="content source"):
+        CompositeProcessStarter(
+            db_session=db_session,
+            logger=logger,
+            processes=[FechamentoFolha3Process(db_session=db_session, logger=logger), other_file],
+        )
@@ -0,0 +1,80 @@
+import datetime
+import io
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from helpers import s3_utils
+from service.camunda.eligibility import (
+    DateRule,
+    EligibilityRules,
+    InSet,
+    NotInSet,
+    ValueMap,
+)
+
+
+CONTENT = (
+    "cnpj,perfil,inicio\n"
+    "1,FAMILY_3,01/01/2025\n"
+    "2,FAMILY_5,15/01/2025\n"
+    "3,FAMILY_4,\n"
+    "4,FAMILY_3,10/03/2025\n"
+    "5,FAMILY_4,20/01/2025\n"
+).encode()
+
+
+def batches(batch_size=2):
+    return s3_utils.iter_csv_column_batches(io.BytesIO(CONTENT), batch_size=batch_size)
+
+
+def parquet_batches(batch_size=2):
+    rows = list(s3_utils.iter_csv_rows(io.BytesIO(CONTENT)))
+    table = pa.table({column: [row[column] or None for row in rows] for column in rows[0]})
+    buffer = io.BytesIO()
+    pq.write_table(table, buffer)
+    return s3_utils.iter_parquet_column_batches(io.BytesIO(buffer.getvalue()), batch_size=batch_size)
+
+
+def test_column_batches():
+    loaded = list(batches())
+
+    assert [batch.size for batch in loaded] == [2, 2, 1]
+    assert loaded[0].columns == {
+        "cnpj": ["1", "2"],
+        "perfil": ["FAMILY_3", "FAMILY_5"],
+        "inicio": ["01/01/2025", "15/01/2025"],
+    }
+
+
+@pytest.mark.parametrize("load", [batches, parquet_batches])
+def test_filter_combines_predicates(load):
+    rules = EligibilityRules(
+        NotInSet("cnpj", ["1"]),
+        ValueMap("perfil", {"FAMILY_3": True, "FAMILY_4": True}),
+        DateRule.between("inicio", end=datetime.date(2025, 1, 31)),
+    )
+
+    assert list(rules.filter(load())) == [{"cnpj": "5", "perfil": "FAMILY_4", "inicio": "20/01/2025"}]
+
+
+def test_predicates_on_arrow_columns():
+    values = pa.array(["FAMILY_3", "FAMILY_5", "", "FAMILY_4"])
+
+    assert InSet("perfil", ["FAMILY_3", "FAMILY_4"]).evaluate(values).to_pylist() == [True, False, False, True]
+    assert NotInSet("perfil", ["FAMILY_5"]).evaluate(values).to_pylist() == [True, False, True, True]
+    assert ValueMap("perfil", {"FAMILY_5": False}, default=True).evaluate(values).to_pylist() == [
+        True,
+        False,
+        True,
+        True,
+    ]
+
+
+def test_filter_without_predicates_keeps_all_rows():
+    assert [row["cnpj"] for row in EligibilityRules().filter(batches())] == ["1", "2", "3", "4", "5"]
+
+
+def test_filter_missing_column():
+    with pytest.raises(ValueError, match="tipo"):
+        list(EligibilityRules(InSet("tipo", ["a"])).filter(batches()))
@@ -0,0 +1,99 @@
+import asyncio
+
+from core.config import settings
+from service.camunda.external_tasks import ExternalTask, ExternalTaskWorker
+
+
+def run_worker(handlers: dict, polls: int = 1) -> ExternalTaskWorker:
+    async def run():
+        worker = ExternalTaskWorker(handlers, worker_id="worker-test")
+        try:
+            for _ in range(polls):
+                await worker.poll()
+            await worker.drain()
+        finally:
+            await worker.client.close()
+        return worker
+
+    return asyncio.run(run())
+
+
+def test_worker_completes_tasks(fake_camunda):
+    task_ids = [fake_camunda.add_external_task("topic", {"index": {"value": index}}) for index in range(5)]
+    fake_camunda.add_external_task("other-topic")
+
+    async def handler(task: ExternalTask):
+        return {"result": {"value": task.get_variable("index") * 2}}
+
+    run_worker({"topic": handler})
+
+    for index, task_id in enumerate(task_ids):
+        task = fake_camunda.external_tasks[task_id]
+        assert task["state"] == "completed"
+        assert task["completedVariables"] == {"result": {"value": index * 2}}
+    assert len(fake_camunda.calls_to(r"/fetchAndLock$")) == 1
+    assert [task["state"] for task in fake_camunda.external_tasks.values()].count("available") == 1
+
+
+def test_worker_reports_failures(fake_camunda, monkeypatch):
+    monkeypatch.setattr(settings, "CAMUNDA_EXTERNAL_TASK_RETRIES", 3)
+    retried = fake_camunda.add_external_task("topic")
+    exhausted = fake_camunda.add_external_task("topic", retries=1)
+
+    async def handler(task: ExternalTask):
+        raise ValueError("handler failed")
+
+    run_worker({"topic": handler})
+
+    assert fake_camunda.external_tasks[retried]["state"] == "available"
+    assert fake_camunda.external_tasks[retried]["retries"] == 2
+    assert fake_camunda.external_tasks[retried]["errorMessage"] == "handler failed"
+    assert fake_camunda.external_tasks[exhausted]["state"] == "incident"
+
+
+def test_worker_respects_concurrency(fake_camunda, monkeypatch):
+    monkeypatch.setattr(settings, "CAMUNDA_EXTERNAL_TASK_CONCURRENCY", 2)
+    monkeypatch.setattr(settings, "CAMUNDA_EXTERNAL_TASK_MAX_TASKS", 10)
+    for _ in range(5):
+        fake_camunda.add_external_task("topic")
+    running, max_running = 0, 0
+
+    async def handler(task: ExternalTask):
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+
+    run_worker({"topic": handler}, polls=8)
+
+    assert max_running == 2
+    assert [call.body["maxTasks"] for call in fake_camunda.calls_to(r"/fetchAndLock$")][0] == 2
+    assert {task["state"] for task in fake_camunda.external_tasks.values()} == {"completed"}
+
+
+def test_worker_extends_lock_of_long_tasks(fake_camunda, monkeypatch):
+    monkeypatch.setattr(settings, "CAMUNDA_EXTERNAL_TASK_LOCK_DURATION", 100)
+    task_id = fake_camunda.add_external_task("topic")
+
+    async def handler(task: ExternalTask):
+        await asyncio.sleep(0.25)
+
+    run_worker({"topic": handler})
+
+    assert fake_camunda.external_tasks[task_id]["lockExtensions"] >= 2
+    assert fake_camunda.external_tasks[task_id]["state"] == "completed"
+
+
+def test_external_task_json_variables():
+    task = ExternalTask.from_response(
+        {
+            "id": "task-id",
+            "topicName": "topic",
+            "processInstanceId": "instance-id",
+            "variables": {"process_data": {"type": "Json", "value": '{"tipoTarefaRpa": "traDctf"}'}},
+        }
+    )
+
+    assert task.get_variable("process_data") == {"tipoTarefaRpa": "traDctf"}
+    assert task.get_variable("missing", "default") == "default"
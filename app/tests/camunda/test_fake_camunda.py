@@ -0,0 +1,84 @@
+import logging
+import random
+
+import pytest
+import requests
+from httpx import codes
+from models.rpa import RPAEventLog, RPAEventTypes, RPASource
+from schemas.rpa_schema import MeliusWebhookRequest
+from service.camunda.fechamento_folha import FechamentoFolha3Process
+from service.rpa import outbox, rpa_services
+from tests.fakes.camunda import (
+    FakeCamundaConfig,
+    FakeCamundaServer,
+    LatencyDistribution,
+)
+
+
+def test_start_process_against_fake_camunda(fake_camunda, db_session, folha_object):
+    FechamentoFolha3Process(db_session=db_session, logger=logging.getLogger(__name__)).start_process()
+
+    calls = fake_camunda.calls_to(r"/process-definition/key/tarefa_fgts_familia3/start$")
+    assert len(calls) == 3
+    assert {call.status for call in calls} == {codes.OK}
+    assert calls[0].body["businessKey"] == "tarefa_fgts_familia3"
+
+
+def test_melius_webhook_against_fake_camunda(fake_camunda, db_session):
+    db_session.add(
+        RPAEventLog(
+            process_id="process-instance-id",
+            event_type=RPAEventTypes.START,
+            event_source=RPASource.MELIUS,
+            event_data={"tipoTarefaRpa": "traDctf", "tokenRetorno": "token"},
+        )
+    )
+    webhook_request = MeliusWebhookRequest.model_validate(
+        {"idTarefaCliente": "process-instance-id", "statusTarefaRpa": 1, "tokenRetorno": "token"}
+    )
+
+    rpa_services.handle_webhook_request(webhook_request, db_session)
+    assert fake_camunda.calls_to(r"/message$") == []
+    outbox.dispatch_pending(db_session)
+
+    (call,) = fake_camunda.calls_to(r"/message$")
+    assert call.status == codes.NO_CONTENT
+    assert call.body["messageName"] == "result_rpa_traDctf"
+
+
+def test_fake_camunda_failures():
+    config = FakeCamundaConfig(throttle_rate=0.5, error_rate=0.5, retry_after=7, seed=42)
+
+    with FakeCamundaServer(config) as server:
+        responses = [requests.post(f"{server.url}/message", json={}) for _ in range(20)]
+
+    assert {response.status_code for response in responses} == {codes.TOO_MANY_REQUESTS, codes.INTERNAL_SERVER_ERROR}
+    throttled = [response for response in responses if response.status_code == codes.TOO_MANY_REQUESTS]
+    assert throttled[0].headers["Retry-After"] == "7"
+    assert len(server.calls) == 20
+
+
+def test_fake_camunda_unknown_route(fake_camunda):
+    response = requests.get(f"{fake_camunda.url}/process-instance")
+
+    assert response.status_code == codes.NOT_FOUND
+    assert fake_camunda.calls == []
+
+
+@pytest.mark.parametrize(
+    "value, bounds",
+    [
+        ("constant:20", (0.02, 0.02)),
+        ("uniform:10,30", (0.01, 0.03)),
+        ("lognormal:40,0.0", (0.04, 0.04)),
+    ],
+)
+def test_latency_distribution(value, bounds):
+    distribution = LatencyDistribution.parse(value)
+
+    assert bounds[0] <= distribution.sample(random.Random(1)) <= bounds[1]
+
+
+def test_latency_distribution_invalid():
+    with pytest.raises(ValueError):
+        LatencyDistribution.parse("exponential:10")
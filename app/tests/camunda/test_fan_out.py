@@ -0,0 +1,111 @@
+import asyncio
+import logging
+
+from core.config import settings
+from models.camunda import (
+    ProcessEventLog,
+    ProcessEventTypes,
+    ProcessRun,
+    ProcessRunStatus,
+)
+from schemas.camunda_schema import ProcessChunkMessage
+from service.camunda.fan_out import fan_out_process, start_process_chunk
+from sqlmodel import func, select
+from tests.camunda.conftest import FOLHA_HEADER, FOLHA_OBJECT_KEY, build_folha_csv
+
+
+logger = logging.getLogger(__name__)
+
+
+def test_fan_out_process(mocker, db_session, fake_s3, fake_sqs, folha_object, folha_csv):
+    mock_post = mocker.patch("service.camunda.base.requests.post")
+    mock_post.return_value.json.return_value = {"id": "process-instance-id"}
+
+    process_run = asyncio.run(fan_out_process("fechamento_folha_3", db_session, logger, chunk_size=2))
+
+    # As linhas são contadas antes das regras de elegibilidade
+    assert process_run.total_rows == 4
+    assert process_run.total_chunks == 2
+    assert process_run.status == ProcessRunStatus.RUNNING
+    assert len(fake_sqs.calls_to("send_message_batch")) == 1
+
+    messages = fake_sqs.messages(settings.PROCESS_STARTER_QUEUE_NAME)
+    chunks = [ProcessChunkMessage.model_validate_json(message["MessageBody"]) for message in messages]
+    assert len({message["MessageGroupId"] for message in messages}) == 2
+    assert [(chunk.row_start, chunk.row_end) for chunk in chunks] == [(0, 2), (2, 4)]
+    assert {chunk.content_version for chunk in chunks} == {folha_object["VersionId"]}
+    assert {chunk.content_etag for chunk in chunks} == {folha_object["ETag"]}
+    assert chunks[0].content_offset == folha_csv.encode().index(b"\n") + 1
+    assert chunks[1].content_header == FOLHA_HEADER
+
+    # Uma nova versão do arquivo não deve afetar os chunks da execução
+    fake_s3.put_object(Bucket=settings.CORE_SAIDA_BUCKET_NAME, Key=FOLHA_OBJECT_KEY, Body="cnpj\n")
+
+    for chunk in chunks:
+        asyncio.run(start_process_chunk(chunk, db_session, logger))
+
+    assert all(params.get("VersionId") for params in fake_s3.calls_to("get_object")[1:])
+    assert mock_post.call_count == 3
+
+    db_session.refresh(process_run)
+    assert process_run.completed_chunks == 2
+    assert process_run.status == ProcessRunStatus.COMPLETED
+    # A linha fora das regras de elegibilidade conta como ignorada, fechando o total_rows
+    assert (process_run.started_count, process_run.skipped_count, process_run.error_count) == (3, 1, 0)
+
+    started = db_session.execute(
+        select(func.count()).select_from(ProcessEventLog).where(ProcessEventLog.event_type == ProcessEventTypes.START)
+    ).scalar()
+    assert started == 3
+
+
+def test_fan_out_chunk_fails_when_unversioned_content_changes(
+    mocker, monkeypatch, db_session, fake_s3, fake_sqs, folha_csv
+):
+    # Os chunks são lidos direto do S3, como em uma instância que não tem o arquivo no cache
+    monkeypatch.setattr(settings, "S3_CACHE_ENABLED", False)
+    mock_post = mocker.patch("service.camunda.base.requests.post")
+    fake_s3.versioned = False
+    fake_s3.put_object(Bucket=settings.CORE_SAIDA_BUCKET_NAME, Key=FOLHA_OBJECT_KEY, Body=folha_csv)
+    process_run = asyncio.run(fan_out_process("fechamento_folha_3", db_session, logger, chunk_size=2))
+    messages = fake_sqs.messages(settings.PROCESS_STARTER_QUEUE_NAME)
+    chunks = [ProcessChunkMessage.model_validate_json(message["MessageBody"]) for message in messages]
+    assert chunks[0].content_version is None
+
+    # Sem versionamento, o novo upload só é detectado pelo ETag: as posições dos chunks não valem mais
+    fake_s3.put_object(Bucket=settings.CORE_SAIDA_BUCKET_NAME, Key=FOLHA_OBJECT_KEY, Body="cnpj\n" + folha_csv)
+
+    asyncio.run(start_process_chunk(chunks[1], db_session, logger))
+
+    mock_post.assert_not_called()
+    assert fake_s3.calls_to("get_object")[-1]["IfMatch"] == chunks[1].content_etag
+    db_session.refresh(process_run)
+    assert process_run.status == ProcessRunStatus.FAILED
+    assert process_run.completed_chunks == 0
+    assert "changed after the fan-out" in process_run.errors[-1]
+
+
+def test_fan_out_empty_process(mocker, db_session, fake_s3, fake_sqs):
+    fake_s3.put_object(Bucket=settings.CORE_SAIDA_BUCKET_NAME, Key=FOLHA_OBJECT_KEY, Body=build_folha_csv([]))
+    process_run = asyncio.run(fan_out_process("fechamento_folha_3", db_session, logger))
+
+    assert process_run.total_chunks == 0
+    assert process_run.status == ProcessRunStatus.COMPLETED
+    assert fake_sqs.calls_to("send_message_batch") == []
+    assert db_session.execute(select(ProcessRun)).scalar_one().ref_id == process_run.ref_id
+
+
+def test_redelivered_chunk_is_not_processed_again(mocker, db_session, fake_s3, fake_sqs, folha_object):
+    mock_post = mocker.patch("service.camunda.base.requests.post")
+    mock_post.return_value.json.return_value = {"id": "process-instance-id"}
+    process_run = asyncio.run(fan_out_process("fechamento_folha_3", db_session, logger, chunk_size=2))
+    messages = fake_sqs.messages(settings.PROCESS_STARTER_QUEUE_NAME)
+    first_chunk = ProcessChunkMessage.model_validate_json(messages[0]["MessageBody"])
+
+    asyncio.run(start_process_chunk(first_chunk, db_session, logger))
+    asyncio.run(start_process_chunk(first_chunk, db_session, logger))
+
+    assert mock_post.call_count == 2
+    db_session.refresh(process_run)
+    assert process_run.completed_chunks == 1
+    assert process_run.status == ProcessRunStatus.RUNNING
@@ -0,0 +1,117 @@
+import dataclasses
+import datetime
+import io
+import json
+import logging
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from core.config import settings
+from core.exceptions import InvalidProcessContent
+from service.camunda.fechamento_folha import FechamentoFolha3Process, FolhaCustomer
+from tests.camunda.conftest import build_folha_csv, build_folha_row
+
+
+CUSTOMER_DATA = FolhaCustomer(
+    id="c0ffee",
+    cnpj="30473147000160",
+    company="Empresa Teste",
+    origin_cnpj="30473147000160",
+    customer_profile="FAMILY_3",
+    codigo_dominio="123",
+    tipo_folha="com movimento",
+    analista_dp="analista@bhub.ai",
+    cnpj_procuracao_federal="12603959000109",
+    erp_operado="dominio",
+    data_pagamento_folha="5",
+    util_ou_corrido="útil",
+)
+
+
+@pytest.fixture
+def process():
+    return FechamentoFolha3Process(db_session=None, logger=logging.getLogger(__name__))
+
+
+def test_run_context_is_computed_once(process, mocker):
+    run_context = process.get_run_context()
+    now_spy = mocker.patch("service.camunda.fechamento_folha.datetime")
+
+    process.get_process_variables(CUSTOMER_DATA, run_context)
+    process.get_process_variables(dataclasses.replace(CUSTOMER_DATA, data_pagamento_folha="n/a"), run_context)
+
+    now_spy.datetime.now.assert_not_called()
+
+
+def test_process_variables(process):
+    run_context = process.get_run_context()
+    variables = process.get_process_variables(CUSTOMER_DATA, run_context)
+
+    assert json.loads(variables["customer"]["value"])["cnpj"] == CUSTOMER_DATA.cnpj
+    assert variables["customer_guid"]["value"] == CUSTOMER_DATA.id
+    assert variables["waiting_dctf_date"]["value"] == run_context.values["data_execucao_dctf_dia_5"]
+    assert variables["waiting_fgts_date"]["value"] == run_context.values["data_execucao_fgts"]
+    assert variables["mes_ano"]["value"].endswith(f"/{run_context.started_at.year}")
+
+
+class FebruaryDatetime(datetime.datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return cls(2025, 2, 14, 10, 0)
+
+
+def test_run_context_end_of_february(process, mocker):
+    mocker.patch("service.camunda.fechamento_folha.datetime.datetime", FebruaryDatetime)
+
+    run_context = process.get_run_context()
+
+    assert run_context.values["data_execucao_dctf"] == "2025-02-28T06:00:00-03:00"
+    assert run_context.values["data_execucao_dctf_dia_5"] == "2025-03-05T06:00:00-03:00"
+    assert run_context.values["data_execucao_fgts"] == "2025-03-11T06:00:00-03:00"
+    assert run_context.variables_template["mes_ano"]["value"] == "Fevereiro/2025"
+
+
+def test_parse_parquet_content(process, fake_s3):
+    rows = [build_folha_row("30473147000160", extra="ignorada"), build_folha_row("99999999000199", extra="")]
+    buffer = io.BytesIO()
+    pq.write_table(pa.Table.from_pylist(rows), buffer)
+    process.s3_file_path = "dp/fechamento-folha/folha-elegiveis.parquet"
+    fake_s3.put_object(Bucket=settings.CORE_SAIDA_BUCKET_NAME, Key=process.s3_file_path, Body=buffer.getvalue())
+
+    content = list(process.get_process_content())
+
+    assert len(content) == 1
+    assert content[0].as_dict() == {column: rows[0][column] for column in process.get_content_columns()}
+
+
+def test_parse_content_missing_column(process, fake_s3):
+    rows = [{key: value for key, value in build_folha_row("30473147000160").items() if key != "Analista_dp"}]
+    fake_s3.put_object(
+        Bucket=settings.CORE_SAIDA_BUCKET_NAME, Key=process.s3_file_path, Body=build_folha_csv(rows, rows[0].keys())
+    )
+
+    with pytest.raises(InvalidProcessContent, match="Analista_dp"):
+        next(iter(process.get_process_content()))
+
+
+class AprilDatetime(datetime.datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return cls(2025, 4, 11, 10, 0)
+
+
+def test_run_context_business_days(process, mocker):
+    # 11/04/2025 + 1 mês: o FGTS vence em 11/05/2025 (domingo) e é antecipado para sexta, 09/05
+    mocker.patch("service.camunda.fechamento_folha.datetime.datetime", AprilDatetime)
+
+    run_context = process.get_run_context()
+
+    assert run_context.values["data_execucao_fgts"] == "2025-05-09T06:00:00-03:00"
+    assert run_context.values["data_execucao_dctf"] == "2025-04-30T06:00:00-03:00"
+    assert run_context.values["data_execucao_dctf_dia_5"] == "2025-05-05T06:00:00-03:00"
+
+    pay_day_variables = process.get_process_variables(CUSTOMER_DATA, run_context)
+    assert pay_day_variables["data_pagamento_folha"]["value"] == "2025-05-08"
+    corrido = dataclasses.replace(CUSTOMER_DATA, util_ou_corrido="corrido", data_pagamento_folha="n/a")
+    assert process.get_process_variables(corrido, run_context)["data_pagamento_folha"]["value"] == "2025-05-30"
@@ -0,0 +1,169 @@
+import asyncio
+import logging
+import uuid
+from unittest.mock import MagicMock
+
+import requests
+from core.config import settings
+from core.exceptions import SQSPublishError
+from fastapi.testclient import TestClient
+from httpx import codes
+from models.camunda import (
+    ProcessEventLog,
+    ProcessEventTypes,
+    ProcessRun,
+    ProcessRunStatus,
+)
+from service.camunda.jobs import run_process_job
+from sqlmodel import select
+from tests.camunda.conftest import FOLHA_OBJECT_KEY, build_folha_csv, build_folha_row
+
+
+def test_start_process_dry_run(client: TestClient, mocker, db_session, folha_object):
+    mock_post = mocker.patch("service.camunda.base.requests.post")
+
+    response = client.post(
+        "/api/process-message/start",
+        json={"process_key": "fechamento_folha_3", "dry_run": True, "sample_size": 2},
+    )
+
+    assert response.status_code == codes.OK
+    plan = response.json()
+    assert plan["process_key"] == "tarefa_fgts_familia3"
+    assert plan["total"] == 4
+    assert plan["eligible"] == 3
+    assert plan["skipped"] == 1
+    assert plan["errors"] == 0
+    assert len(plan["sample_payloads"]) == 2
+    assert plan["sample_payloads"][0]["businessKey"] == "tarefa_fgts_familia3"
+    assert plan["payload_sizes"]["count"] == 3
+    assert (
+        plan["payload_sizes"]["min_bytes"] <= plan["payload_sizes"]["p50_bytes"] <= plan["payload_sizes"]["max_bytes"]
+    )
+    assert set(plan["timings"]) == {"s3_fetch", "parse", "eligibility", "variable_build", "total"}
+
+    mock_post.assert_not_called()
+    assert db_session.execute(select(ProcessEventLog)).first() is None
+
+
+def test_start_process_dry_run_counts_rows_outside_eligibility_rules(client: TestClient, fake_s3):
+    rows = [build_folha_row(cnpj) for cnpj in ["30473147000160", "11111111000111", "22222222000122"]]
+    fake_s3.put_object(Bucket=settings.CORE_SAIDA_BUCKET_NAME, Key=FOLHA_OBJECT_KEY, Body=build_folha_csv(rows))
+
+    response = client.post("/api/process-message/start", json={"process_key": "fechamento_folha_3", "dry_run": True})
+
+    assert response.status_code == codes.OK
+    plan = response.json()
+    assert plan["total"] == 3
+    assert plan["eligible"] == 1
+    assert plan["skipped"] == 2
+    assert plan["payload_sizes"]["count"] == 1
+    assert plan["timings"]["eligibility"] > 0
+
+
+def test_start_process_dry_run_not_found(client: TestClient):
+    response = client.post("/api/process-message/start", json={"process_key": "inexistente", "dry_run": True})
+
+    assert response.status_code == codes.NOT_FOUND
+
+
+def test_start_process_enqueues_job(client: TestClient, mocker, monkeypatch, db_session, folha_object, fake_sqs):
+    monkeypatch.setattr(settings, "SQS_SUBSCRIBERS_ENABLED", True)
+    mock_post = mocker.patch("service.camunda.base.requests.post")
+
+    response = client.post("/api/process-message/start", json={"process_key": "fechamento_folha_3"})
+
+    assert response.status_code == codes.ACCEPTED
+    job = response.json()
+    assert job["status"] == ProcessRunStatus.QUEUED
+    assert job["process_key"] == "fechamento_folha_3"
+    mock_post.assert_not_called()
+
+    [queue_message] = fake_sqs.bodies(settings.PROCESS_STARTER_QUEUE_NAME)
+    assert queue_message == {"process_key": "fechamento_folha_3", "run_id": job["job_id"], "fan_out": False}
+
+    mock_post.return_value.json.return_value = {"id": "process-instance-id"}
+    mock_post.return_value.raise_for_status.side_effect = [None, requests.HTTPError(response=MagicMock()), None]
+
+    asyncio.run(run_process_job(uuid.UUID(queue_message["run_id"]), db_session, logging.getLogger(__name__)))
+
+    response = client.get(f"/api/process-message/jobs/{job['job_id']}")
+
+    assert response.status_code == codes.OK
+    job = response.json()
+    assert job["status"] == ProcessRunStatus.COMPLETED
+    assert job["total_rows"] == 3
+    assert job["started_count"] == 2
+    assert job["error_count"] == 1
+    assert len(job["errors"]) == 1
+
+    # O erro é auditado com o payload de início, reenviado pelo replay
+    stmt = select(ProcessEventLog).where(ProcessEventLog.event_type == ProcessEventTypes.START_ERROR)
+    start_error = db_session.execute(stmt).scalar_one()
+    assert "error" in start_error.event_data
+    assert start_error.event_data["payload"]["variables"]
+
+    # Uma mensagem reentregue não executa o processo de novo
+    mock_post.reset_mock()
+    asyncio.run(run_process_job(uuid.UUID(queue_message["run_id"]), db_session, logging.getLogger(__name__)))
+
+    mock_post.assert_not_called()
+
+
+def test_start_process_runs_job_without_subscribers(
+    client: TestClient, mocker, session_maker, db_session, folha_object, fake_sqs
+):
+    mocker.patch("service.camunda.jobs.get_session_maker", return_value=session_maker)
+    mock_post = mocker.patch("service.camunda.base.requests.post")
+    mock_post.return_value.json.return_value = {"id": "process-instance-id"}
+
+    response = client.post("/api/process-message/start", json={"process_key": "fechamento_folha_3"})
+
+    assert response.status_code == codes.ACCEPTED
+    assert fake_sqs.bodies(settings.PROCESS_STARTER_QUEUE_NAME) == []
+    assert mock_post.call_count == 3
+
+    response = client.get(f"/api/process-message/jobs/{response.json()['job_id']}")
+
+    assert response.json()["status"] == ProcessRunStatus.COMPLETED
+    assert response.json()["started_count"] == 3
+
+
+def test_start_process_job_fails_when_enqueue_fails(
+    client: TestClient, mocker, monkeypatch, db_session, folha_object, fake_sqs
+):
+    monkeypatch.setattr(settings, "SQS_SUBSCRIBERS_ENABLED", True)
+    mocker.patch("service.camunda.jobs.SQSPublisher.send", side_effect=SQSPublishError("queue unavailable"))
+
+    response = client.post("/api/process-message/start", json={"process_key": "fechamento_folha_3"})
+
+    assert response.status_code == codes.INTERNAL_SERVER_ERROR
+    process_run = db_session.execute(select(ProcessRun)).scalar_one()
+    assert process_run.status == ProcessRunStatus.FAILED
+    assert process_run.errors == ["queue unavailable"]
+
+
+def test_process_job_failure_is_not_raised(mocker, db_session, folha_object):
+    mocker.patch("service.camunda.base.CamundaProcessStarter.start_process", side_effect=RuntimeError("boom"))
+    process_run = ProcessRun(process_key="fechamento_folha_3")
+    db_session.add(process_run)
+    db_session.commit()
+
+    asyncio.run(run_process_job(process_run.ref_id, db_session, logging.getLogger(__name__)))
+
+    db_session.refresh(process_run)
+    assert process_run.status == ProcessRunStatus.FAILED
+    assert process_run.errors == ["boom"]
+
+
+def test_start_fan_out_requires_subscribers(client: TestClient, db_session, folha_object):
+    response = client.post("/api/process-message/start", json={"process_key": "fechamento_folha_3", "fan_out": True})
+
+    assert response.status_code == codes.INTERNAL_SERVER_ERROR
+    assert db_session.execute(select(ProcessRun)).first() is None
+
+
+def test_process_job_not_found(client: TestClient):
+    response = client.get(f"/api/process-message/jobs/{uuid.uuid4()}")
+
+    assert response.status_code == codes.NOT_FOUND
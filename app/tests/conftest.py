@@ -1,11 +1,18 @@
+import httpx
 import main
 import pytest
 from core.config import settings
 from db.session import get_session
 from fastapi.testclient import TestClient
+from helpers import sqs_utils
+from helpers.s3_utils import S3ObjectCache
 from models.base import BaseModel
 from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker
+from tests.fakes.camunda import FakeCamundaServer
+from tests.fakes.melius import FakeMeliusAPI
+from tests.fakes.s3 import FakeS3Client
+from tests.fakes.sqs import FakeSQSClient
 
 
 @pytest.fixture(autouse=True)
@@ -72,3 +79,39 @@ def db_session(session_maker):
 def client(db_session):
     main.app.dependency_overrides[get_session] = lambda: db_session
     return TestClient(main.app)
+
+
+@pytest.fixture
+def fake_camunda(monkeypatch):
+    with FakeCamundaServer() as server:
+        monkeypatch.setattr(settings, "CAMUNDA_ENGINE_URL", server.url)
+        yield server
+
+
+@pytest.fixture
+def fake_s3(mocker, tmp_path):
+    s3_client = FakeS3Client()
+    mocker.patch("helpers.s3_utils.get_s3_client", return_value=s3_client)
+    mocker.patch(
+        "helpers.s3_utils.get_object_cache",
+        return_value=S3ObjectCache(str(tmp_path / "s3-cache"), max_bytes=1024 * 1024),
+    )
+    return s3_client
+
+
+@pytest.fixture
+def fake_sqs(mocker):
+    sqs_client = FakeSQSClient()
+    mocker.patch("helpers.sqs_utils.get_sqs_client", return_value=sqs_client)
+    sqs_utils.get_queue_url.cache_clear()
+    yield sqs_client
+    sqs_utils.get_queue_url.cache_clear()
+
+
+@pytest.fixture
+def melius_api(mocker, monkeypatch):
+    monkeypatch.setattr(settings, "MELIUS_RPA_URL", "http://melius.test")
+    api = FakeMeliusAPI()
+    client = httpx.AsyncClient(transport=httpx.MockTransport(api.handler))
+    mocker.patch("service.rpa.providers.get_melius_client", return_value=client)
+    return api
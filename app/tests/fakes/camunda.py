@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+"""Servidor fake da API REST do Camunda para testes de carga e latência.
+
+Implementa os endpoints usados pelo orquestrador com latência, taxa de erros e de 429
+configuráveis, registrando todas as chamadas recebidas. Roda localmente, sem rede:
+
+    python app/tests/fakes/camunda.py --port 8080 --latency lognormal:40,0.5 --error-rate 0.01
+
+e aponte `CAMUNDA_ENGINE_URL` para `http://localhost:8080/engine-rest`.
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional
+
+
+@dataclass(frozen=True)
+class LatencyDistribution:
+    """Distribuição de latência (em milissegundos) das respostas"""
+
+    kind: str = "constant"
+    params: tuple[float, ...] = (0,)
+
+    @classmethod
+    def parse(cls, value: str) -> "LatencyDistribution":
+        """Interpreta `constant:MS`, `uniform:MIN,MAX`, `normal:MEAN,STDDEV` ou `lognormal:MEDIAN,SIGMA`"""
+        kind, _, params = value.partition(":")
+        distribution = cls(kind=kind, params=tuple(float(param) for param in params.split(",") if param))
+        distribution.sample(random.Random(0))
+        return distribution
+
+    def sample(self, rng: random.Random) -> float:
+        """Sorteia uma latência, em segundos"""
+        if self.kind == "constant":
+            latency = self.params[0]
+        elif self.kind == "uniform":
+            latency = rng.uniform(*self.params)
+        elif self.kind == "normal":
+            latency = rng.gauss(*self.params)
+        elif self.kind == "lognormal":
+            median, sigma = self.params
+            latency = median * rng.lognormvariate(0, sigma)
+        else:
+            raise ValueError(f"Unknown latency distribution: {self.kind}")
+
+        return max(latency, 0) / 1000
+
+
+@dataclass
+class RecordedCall:
+    """Chamada recebida pelo servidor fake"""
+
+    method: str
+    path: str
+    body: Optional[dict]
+    headers: dict[str, str]
+    status: int
+    latency: float
+    timestamp: float = field(default_factory=time.time)
+
+
+@dataclass
+class FakeCamundaConfig:
+    latency: LatencyDistribution = field(default_factory=LatencyDistribution)
+    error_rate: float = 0.0
+    throttle_rate: float = 0.0
+    retry_after: int = 1
+    seed: Optional[int] = None
+
+
+Route = tuple[str, re.Pattern, Callable[["FakeCamundaServer", re.Match, Optional[dict]], tuple[int, Optional[dict]]]]
+
+
+def _start_process(server: "FakeCamundaServer", match: re.Match, body: Optional[dict]):
+    process_instance_id = str(uuid.uuid4())
+    return HTTPStatus.OK, {
+        "id": process_instance_id,
+        "definitionId": f"{match['key']}:1:{uuid.uuid4()}",
+        "businessKey": (body or {}).get("businessKey"),
+        "ended": False,
+        "suspended": False,
+    }
+
+
+def _correlate_message(server: "FakeCamundaServer", match: re.Match, body: Optional[dict]):
+    if (body or {}).get("resultEnabled"):
+        return HTTPStatus.OK, [{"resultType": "ProcessDefinition", "execution": None, "processInstance": None}]
+    return HTTPStatus.NO_CONTENT, None
+
+
+def _external_task(server: "FakeCamundaServer", match: re.Match, body: Optional[dict]):
+    """Retorna a external task da rota e um erro (status, conteúdo) caso ela não esteja bloqueada pelo worker"""
+    task = server.external_tasks.get(match["id"])
+    if task is None:
+        return None, (HTTPStatus.NOT_FOUND, {"type": "NotFound", "message": f"External task {match['id']} not found"})
+    if task["state"] != "locked" or task["workerId"] != (body or {}).get("workerId"):
+        return None, (HTTPStatus.BAD_REQUEST, {"type": "BadUserRequest", "message": "Task is locked by another worker"})
+    return task, None
+
+
+def _fetch_and_lock(server: "FakeCamundaServer", match: re.Match, body: Optional[dict]):
+    body = body or {}
+    lock_durations = {topic["topicName"]: topic["lockDuration"] for topic in body.get("topics", [])}
+    now = time.time()
+    locked = []
+    with server._lock:
+        for task in server.external_tasks.values():
+            if len(locked) >= body.get("maxTasks", 1):
+                break
+            available = task["state"] == "available" and task["availableAt"] <= now
+            expired = task["state"] == "locked" and task["lockExpiresAt"] <= now
+            if task["topicName"] in lock_durations and (available or expired):
+                task.update(
+                    state="locked",
+                    workerId=body.get("workerId"),
+                    lockExpiresAt=now + lock_durations[task["topicName"]] / 1000,
+                )
+                locked.append(
+                    {key: task[key] for key in ("id", "topicName", "processInstanceId", "retries", "variables")}
+                )
+    return HTTPStatus.OK, locked
+
+
+def _extend_lock(server: "FakeCamundaServer", match: re.Match, body: Optional[dict]):
+    with server._lock:
+        task, error = _external_task(server, match, body)
+        if error:
+            return error
+        task["lockExpiresAt"] = time.time() + (body or {})["newDuration"] / 1000
+        task["lockExtensions"] += 1
+    return HTTPStatus.NO_CONTENT, None
+
+
+def _complete_external_task(server: "FakeCamundaServer", match: re.Match, body: Optional[dict]):
+    with server._lock:
+        task, error = _external_task(server, match, body)
+        if error:
+            return error
+        task.update(state="completed", completedVariables=(body or {}).get("variables") or {})
+    return HTTPStatus.NO_CONTENT, None
+
+
+def _external_task_failure(server: "FakeCamundaServer", match: re.Match, body: Optional[dict]):
+    body = body or {}
+    with server._lock:
+        task, error = _external_task(server, match, body)
+        if error:
+            return error
+        task.update(
+            state="available" if body.get("retries", 0) > 0 else "incident",
+            retries=body.get("retries", 0),
+            errorMessage=body.get("errorMessage"),
+            availableAt=time.time() + body.get("retryTimeout", 0) / 1000,
+        )
+    return HTTPStatus.NO_CONTENT, None
+
+
+class FakeCamundaServer:
+    """Servidor HTTP fake do Camunda, executado em uma thread"""
+
+    ROUTES: list[Route] = [
+        ("POST", re.compile(r"/process-definition/key/(?P<key>[^/]+)/start$"), _start_process),
+        ("POST", re.compile(r"/message$"), _correlate_message),
+        ("POST", re.compile(r"/external-task/fetchAndLock$"), _fetch_and_lock),
+        ("POST", re.compile(r"/external-task/(?P<id>[^/]+)/extendLock$"), _extend_lock),
+        ("POST", re.compile(r"/external-task/(?P<id>[^/]+)/complete$"), _complete_external_task),
+        ("POST", re.compile(r"/external-task/(?P<id>[^/]+)/failure$"), _external_task_failure),
+    ]
+
+    def __init__(self, config: Optional[FakeCamundaConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or FakeCamundaConfig()
+        self.calls: list[RecordedCall] = []
+        self.external_tasks: dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._rng = random.Random(self.config.seed)
+        self._httpd = ThreadingHTTPServer((host, port), self._build_handler())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """URL base da API REST, equivalente ao `CAMUNDA_ENGINE_URL`"""
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/engine-rest"
+
+    def start(self) -> "FakeCamundaServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> "FakeCamundaServer":
+        return self.start()
+
+    def __exit__(self, *args) -> None:
+        self.stop()
+
+    def calls_to(self, path_pattern: str) -> list[RecordedCall]:
+        """Chamadas recebidas cujo path corresponde à expressão regular"""
+        with self._lock:
+            return [call for call in self.calls if re.search(path_pattern, call.path)]
+
+    def reset(self) -> None:
+        with self._lock:
+            self.calls.clear()
+            self.external_tasks.clear()
+
+    def add_external_task(
+        self,
+        topic_name: str,
+        variables: Optional[dict] = None,
+        process_instance_id: Optional[str] = None,
+        retries: Optional[int] = None,
+    ) -> str:
+        """Cria uma external task disponível para o fetchAndLock, retornando seu id"""
+        task_id = str(uuid.uuid4())
+        with self._lock:
+            self.external_tasks[task_id] = {
+                "id": task_id,
+                "topicName": topic_name,
+                "processInstanceId": process_instance_id or str(uuid.uuid4()),
+                "retries": retries,
+                "variables": variables or {},
+                "state": "available",
+                "availableAt": 0.0,
+                "workerId": None,
+                "lockExpiresAt": 0.0,
+                "lockExtensions": 0,
+            }
+        return task_id
+
+    def _draw(self) -> tuple[float, Optional[int]]:
+        """Sorteia a latência e a falha (429 ou 500) de uma chamada"""
+        with self._lock:
+            latency = self.config.latency.sample(self._rng)
+            draw = self._rng.random()
+
+        if draw < self.config.throttle_rate:
+            return latency, HTTPStatus.TOO_MANY_REQUESTS
+        if draw < self.config.throttle_rate + self.config.error_rate:
+            return latency, HTTPStatus.INTERNAL_SERVER_ERROR
+        return latency, None
+
+    def _resolve(self, method: str, path: str):
+        """Retorna o handler e o match da rota correspondente à chamada"""
+        for route_method, pattern, route_handler in self.ROUTES:
+            match = pattern.search(path)
+            if route_method == method and match:
+                return route_handler, match
+        return None, None
+
+    def _record(self, call: RecordedCall) -> None:
+        with self._lock:
+            self.calls.append(call)
+
+    def _build_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status: int, content=None, headers: Optional[dict] = None):
+                data = json.dumps(content).encode() if content is not None else b""
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                if data:
+                    self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _handle(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                raw_body = self.rfile.read(length) if length else b""
+                body = json.loads(raw_body) if raw_body else None
+
+                if self.command == "GET" and self.path.endswith("/_calls"):
+                    with server._lock:
+                        calls = [asdict(call) for call in server.calls]
+                    return self._send(HTTPStatus.OK, calls)
+
+                route_handler, match = server._resolve(self.command, self.path)
+                if route_handler is None:
+                    return self._send(HTTPStatus.NOT_FOUND, {"type": "NotFound", "message": self.path})
+
+                latency, failure = server._draw()
+                time.sleep(latency)
+
+                headers: dict[str, str] = {}
+                if failure == HTTPStatus.TOO_MANY_REQUESTS:
+                    status, content = failure, {"type": "TooManyRequests", "message": "Rate limit exceeded"}
+                    headers["Retry-After"] = str(server.config.retry_after)
+                elif failure:
+                    status, content = failure, {"type": "ProcessEngineException", "message": "Fake engine failure"}
+                else:
+                    status, content = route_handler(server, match, body)
+
+                server._record(
+                    RecordedCall(
+                        method=self.command,
+                        path=self.path,
+                        body=body,
+                        headers=dict(self.headers),
+                        status=int(status),
+                        latency=latency,
+                    )
+                )
+                self._send(status, content, headers)
+
+            do_GET = _handle
+            do_POST = _handle
+            do_PUT = _handle
+            do_DELETE = _handle
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Camunda REST engine for load and latency tests")
+    parser.add_argument("--host", default="127.0.0.1", help="Host to bind")
+    parser.add_argument("--port", type=int, default=8080, help="Port to bind")
+    parser.add_argument(
+        "--latency",
+        type=LatencyDistribution.parse,
+        default=LatencyDistribution(),
+        help="Latency distribution in ms: constant:MS, uniform:MIN,MAX, normal:MEAN,STDDEV or lognormal:MEDIAN,SIGMA",
+    )
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of calls answered with 500")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction of calls answered with 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After header of 429 responses")
+    parser.add_argument("--seed", type=int, help="Random seed, for reproducible runs")
+    args = parser.parse_args()
+
+    config = FakeCamundaConfig(
+        latency=args.latency,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        retry_after=args.retry_after,
+        seed=args.seed,
+    )
+    server = FakeCamundaServer(config, host=args.host, port=args.port).start()
+    print(f"Fake Camunda listening on {server.url} (calls recorded at {server.url}/_calls)")
+
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
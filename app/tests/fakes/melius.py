@@ -0,0 +1,31 @@
+"""API fake da Melius, servida por um httpx.MockTransport"""
+
+import asyncio
+
+import httpx
+
+
+class FakeMeliusAPI:
+    """Responde às requisições da Melius com respostas enfileiradas, registrando as requisições recebidas"""
+
+    def __init__(self, delay: float = 0):
+        self.requests: list[httpx.Request] = []
+        self.responses: list = []
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        response = self.responses.pop(0) if self.responses else httpx.Response(200, json={"idRequisicao": "1"})
+
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight -= 1
+
+        if isinstance(response, Exception):
+            raise response
+        return response
@@ -0,0 +1,161 @@
+"""Cliente S3 fake, em memória, com a mesma interface do cliente boto3 usada pelo orquestrador"""
+
+import hashlib
+import io
+import uuid
+from typing import Optional
+
+from botocore.exceptions import ClientError
+from botocore.response import StreamingBody
+
+
+class FakeS3Client:
+    """Cliente S3 em memória com suporte a versionamento de objetos"""
+
+    def __init__(self, versioned: bool = True, page_size: int = 1000):
+        self.versioned = versioned
+        self.page_size = page_size
+        # (bucket, key) -> lista de versões (version_id, conteúdo, etag), da mais antiga para a mais recente
+        self.objects: dict[tuple[str, str], list[tuple[Optional[str], bytes, str]]] = {}
+        self.calls: list[tuple[str, dict]] = []
+        # UploadId -> partes recebidas do multipart upload ainda não concluído
+        self.uploads: dict[str, dict[int, bytes]] = {}
+
+    def put_object(self, Bucket: str, Key: str, Body, **kwargs) -> dict:
+        self.calls.append(("put_object", {"Bucket": Bucket, "Key": Key, **kwargs}))
+        data = Body.encode() if isinstance(Body, str) else Body if isinstance(Body, bytes) else Body.read()
+        return self._store(Bucket, Key, data)
+
+    def _store(self, Bucket: str, Key: str, data: bytes) -> dict:
+        version_id = str(uuid.uuid4()) if self.versioned else None
+        etag = f'"{hashlib.md5(data).hexdigest()}"'
+
+        versions = self.objects.setdefault((Bucket, Key), [])
+        if not self.versioned:
+            versions.clear()
+        versions.append((version_id, data, etag))
+        return {"ETag": etag, "VersionId": version_id}
+
+    def create_multipart_upload(self, Bucket: str, Key: str, **kwargs) -> dict:
+        self.calls.append(("create_multipart_upload", {"Bucket": Bucket, "Key": Key, **kwargs}))
+        upload_id = str(uuid.uuid4())
+        self.uploads[upload_id] = {}
+        return {"UploadId": upload_id}
+
+    def upload_part(self, Bucket: str, Key: str, UploadId: str, PartNumber: int, Body: bytes, **kwargs) -> dict:
+        self.calls.append(("upload_part", {"Bucket": Bucket, "Key": Key, "PartNumber": PartNumber, "Size": len(Body)}))
+        self.uploads[UploadId][PartNumber] = Body
+        return {"ETag": f'"{hashlib.md5(Body).hexdigest()}"'}
+
+    def complete_multipart_upload(self, Bucket: str, Key: str, UploadId: str, MultipartUpload: dict, **kwargs) -> dict:
+        self.calls.append(("complete_multipart_upload", {"Bucket": Bucket, "Key": Key, **MultipartUpload}))
+        parts = self.uploads.pop(UploadId)
+        data = b"".join(parts[part["PartNumber"]] for part in MultipartUpload["Parts"])
+        return self._store(Bucket, Key, data)
+
+    def abort_multipart_upload(self, Bucket: str, Key: str, UploadId: str, **kwargs) -> dict:
+        self.calls.append(("abort_multipart_upload", {"Bucket": Bucket, "Key": Key}))
+        self.uploads.pop(UploadId, None)
+        return {}
+
+    def _get_version(self, operation: str, Bucket: str, Key: str, VersionId: Optional[str] = None):
+        versions = self.objects.get((Bucket, Key))
+        if not versions:
+            raise ClientError({"Error": {"Code": "NoSuchKey", "Message": "Not Found"}}, operation)
+        if VersionId is None:
+            return versions[-1]
+        for version in versions:
+            if version[0] == VersionId:
+                return version
+        raise ClientError({"Error": {"Code": "NoSuchVersion", "Message": "Not Found"}}, operation)
+
+    def get_object(self, Bucket: str, Key: str, **kwargs) -> dict:
+        self.calls.append(("get_object", {"Bucket": Bucket, "Key": Key, **kwargs}))
+        version_id, data, etag = self._get_version("GetObject", Bucket, Key, kwargs.get("VersionId"))
+
+        if kwargs.get("IfMatch") and kwargs["IfMatch"] != etag:
+            error_response = {
+                "Error": {"Code": "PreconditionFailed", "Message": "Precondition Failed"},
+                "ResponseMetadata": {"HTTPStatusCode": 412},
+            }
+            raise ClientError(error_response, "GetObject")
+
+        if kwargs.get("IfNoneMatch") == etag:
+            error_response = {
+                "Error": {"Code": "304", "Message": "Not Modified"},
+                "ResponseMetadata": {"HTTPStatusCode": 304, "HTTPHeaders": {"etag": etag}},
+            }
+            if version_id:
+                error_response["ResponseMetadata"]["HTTPHeaders"]["x-amz-version-id"] = version_id
+            raise ClientError(error_response, "GetObject")
+
+        total_size = len(data)
+        if kwargs.get("Range"):
+            start, end = kwargs["Range"].removeprefix("bytes=").split("-")
+            data = data[int(start) : int(end) + 1 if end else None]
+
+        response = {
+            "Body": StreamingBody(io.BytesIO(data), len(data)),
+            "ContentLength": len(data),
+            "ETag": etag,
+            "TotalSize": total_size,
+        }
+        if version_id:
+            response["VersionId"] = version_id
+        return response
+
+    def head_object(self, Bucket: str, Key: str, **kwargs) -> dict:
+        self.calls.append(("head_object", {"Bucket": Bucket, "Key": Key, **kwargs}))
+        version_id, data, etag = self._get_version("HeadObject", Bucket, Key, kwargs.get("VersionId"))
+        response = {"ContentLength": len(data), "ETag": etag}
+        if version_id:
+            response["VersionId"] = version_id
+        return response
+
+    def delete_object(self, Bucket: str, Key: str, **kwargs) -> dict:
+        self.calls.append(("delete_object", {"Bucket": Bucket, "Key": Key, **kwargs}))
+        self.objects.pop((Bucket, Key), None)
+        return {}
+
+    def list_objects_v2(self, Bucket: str, Prefix: str = "", ContinuationToken: Optional[str] = None, **kwargs):
+        self.calls.append(("list_objects_v2", {"Bucket": Bucket, "Prefix": Prefix, **kwargs}))
+        keys = sorted(key for bucket, key in self.objects if bucket == Bucket and key.startswith(Prefix))
+        start = int(ContinuationToken or 0)
+        page_keys = keys[start : start + self.page_size]
+
+        response = {
+            "Contents": [
+                {
+                    "Key": key,
+                    "Size": len(self.objects[(Bucket, key)][-1][1]),
+                    "ETag": self.objects[(Bucket, key)][-1][2],
+                }
+                for key in page_keys
+            ],
+            "IsTruncated": start + self.page_size < len(keys),
+        }
+        if response["IsTruncated"]:
+            response["NextContinuationToken"] = str(start + self.page_size)
+        return response
+
+    def get_paginator(self, operation: str):
+        assert operation == "list_objects_v2", f"Unsupported paginator: {operation}"
+        return FakePaginator(self.list_objects_v2)
+
+    def calls_to(self, operation: str) -> list[dict]:
+        return [params for name, params in self.calls if name == operation]
+
+
+class FakePaginator:
+    """Paginador no formato do boto3, seguindo o ContinuationToken das respostas"""
+
+    def __init__(self, operation):
+        self.operation = operation
+
+    def paginate(self, **kwargs):
+        while True:
+            page = self.operation(**kwargs)
+            yield page
+            if not page.get("IsTruncated"):
+                return
+            kwargs["ContinuationToken"] = page["NextContinuationToken"]
@@ -0,0 +1,54 @@
+"""Cliente SQS fake, em memória, com a mesma interface do cliente boto3 usada pelo orquestrador"""
+
+import json
+import threading
+import uuid
+from typing import Optional
+
+
+QUEUE_URL_PREFIX = "https://sqs.fake/000000000000/"
+
+
+class FakeSQSClient:
+    """Cliente SQS em memória com injeção de falhas por entrada de lote"""
+
+    def __init__(self):
+        self.queues: dict[str, list[dict]] = {}
+        self.calls: list[tuple[str, dict]] = []
+        # Quantidade de falhas a injetar nos próximos envios: (código, sender_fault)
+        self.failures: list[tuple[str, bool]] = []
+        self._lock = threading.Lock()
+
+    def get_queue_url(self, QueueName: str) -> dict:
+        self.calls.append(("get_queue_url", {"QueueName": QueueName}))
+        return {"QueueUrl": f"{QUEUE_URL_PREFIX}{QueueName}"}
+
+    def send_message_batch(self, QueueUrl: str, Entries: list[dict]) -> dict:
+        assert 1 <= len(Entries) <= 10, "SendMessageBatch accepts between 1 and 10 entries"
+        queue_name = QueueUrl.removeprefix(QUEUE_URL_PREFIX)
+        successful, failed = [], []
+        with self._lock:
+            self.calls.append(("send_message_batch", {"QueueUrl": QueueUrl, "Entries": Entries}))
+            for entry in Entries:
+                if self.failures:
+                    code, sender_fault = self.failures.pop(0)
+                    failed.append({"Id": entry["Id"], "Code": code, "SenderFault": sender_fault, "Message": code})
+                    continue
+
+                message_id = str(uuid.uuid4())
+                self.queues.setdefault(queue_name, []).append({**entry, "MessageId": message_id})
+                successful.append({"Id": entry["Id"], "MessageId": message_id})
+        return {"Successful": successful, "Failed": failed}
+
+    def messages(self, queue_name: str) -> list[dict]:
+        return self.queues.get(queue_name, [])
+
+    def bodies(self, queue_name: str) -> list[dict]:
+        return [json.loads(message["MessageBody"]) for message in self.messages(queue_name)]
+
+    def calls_to(self, operation: str, queue_name: Optional[str] = None) -> list[dict]:
+        return [
+            params
+            for name, params in self.calls
+            if name == operation and (queue_name is None or params.get("QueueUrl", "").endswith(queue_name))
+        ]
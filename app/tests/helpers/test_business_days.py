@@ -0,0 +1,44 @@
+import datetime
+
+import pytest
+from helpers.business_days import BusinessCalendar, easter_sunday
+
+
+@pytest.mark.parametrize(
+    "year,expected",
+    [(2024, datetime.date(2024, 3, 31)), (2025, datetime.date(2025, 4, 20)), (2026, datetime.date(2026, 4, 5))],
+)
+def test_easter_sunday(year, expected):
+    assert easter_sunday(year) == expected
+
+
+def test_national_holidays():
+    business_calendar = BusinessCalendar()
+
+    # Carnaval (3 e 4/03/2025)
+    assert business_calendar.nth_business_day(2025, 3, 1) == datetime.date(2025, 3, 5)
+    # Sexta-feira Santa (18/04/2025) e Tiradentes (21/04/2025)
+    assert business_calendar.previous_business_day(datetime.date(2025, 4, 21)) == datetime.date(2025, 4, 17)
+    assert business_calendar.next_business_day(datetime.date(2025, 4, 18)) == datetime.date(2025, 4, 22)
+    assert not business_calendar.is_business_day(datetime.date(2025, 11, 20))
+
+
+def test_extra_holidays():
+    business_calendar = BusinessCalendar(["07-09", "2025-01-24"])
+
+    assert not business_calendar.is_business_day(datetime.date(2025, 7, 9))
+    assert not business_calendar.is_business_day(datetime.date(2026, 7, 9))
+    assert not business_calendar.is_business_day(datetime.date(2025, 1, 24))
+    assert business_calendar.is_business_day(datetime.date(2026, 1, 23))
+
+
+def test_nth_business_day_is_memoized():
+    business_calendar = BusinessCalendar()
+
+    assert business_calendar.nth_business_day(2025, 6, 5) == datetime.date(2025, 6, 6)
+    assert business_calendar.nth_business_day(2025, 6, 99) == datetime.date(2025, 6, 30)
+    business_calendar.nth_business_day(2025, 6, 1)
+    assert business_calendar.month_business_days.cache_info().misses == 1
+
+    with pytest.raises(ValueError):
+        business_calendar.nth_business_day(2025, 6, 0)
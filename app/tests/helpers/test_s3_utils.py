@@ -0,0 +1,332 @@
+import gzip
+import io
+import tempfile
+import threading
+import time
+from itertools import islice
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from core.config import settings
+from core.exceptions import InvalidProcessContent
+from helpers import s3_utils
+
+
+class TrackingStream(io.BytesIO):
+    def __init__(self, data: bytes):
+        super().__init__(data)
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        data = super().read(size)
+        self.bytes_read += len(data)
+        return data
+
+
+def test_iter_csv_rows_small_chunks():
+    content = 'nome,observação\r\n"Açaí, Ltda","linha 1\r\nlinha 2"\r\nJosé,ção\r\n'.encode()
+
+    rows = list(s3_utils.iter_csv_rows(io.BytesIO(content), chunk_size=3))
+
+    assert rows == [
+        {"nome": "Açaí, Ltda", "observação": "linha 1\r\nlinha 2"},
+        {"nome": "José", "observação": "ção"},
+    ]
+
+
+def test_iter_csv_rows_is_incremental():
+    content = "cnpj,nome\n" + "".join(f"{i:014d},Empresa {i}\n" for i in range(10000))
+    stream = TrackingStream(content.encode())
+
+    rows = s3_utils.iter_csv_rows(stream, chunk_size=1024)
+    first_row = next(rows)
+
+    assert first_row == {"cnpj": f"{0:014d}", "nome": "Empresa 0"}
+    assert stream.bytes_read <= 16 * 1024 < len(content)
+    assert sum(1 for _ in rows) == 9999
+
+
+def test_iter_csv_rows_encoding():
+    content = "nome\nJosé\n".encode("latin-1")
+
+    assert list(s3_utils.iter_csv_rows(io.BytesIO(content), encoding="latin-1")) == [{"nome": "José"}]
+
+
+def test_open_object_stream(fake_s3):
+    first = fake_s3.put_object(Bucket="bucket", Key="file.csv", Body="a\n1\n")
+    fake_s3.put_object(Bucket="bucket", Key="file.csv", Body="a\n2\n")
+
+    stream, version_id = s3_utils.open_object_stream("bucket", "file.csv")
+    assert list(s3_utils.iter_csv_rows(stream)) == [{"a": "2"}]
+
+    stream, version_id = s3_utils.open_object_stream("bucket", "file.csv", first["VersionId"])
+    assert version_id == first["VersionId"]
+    assert list(s3_utils.iter_csv_rows(stream)) == [{"a": "1"}]
+
+
+@pytest.mark.parametrize("use_cache", [False, True])
+def test_open_object_stream_from_offset(fake_s3, use_cache):
+    fake_s3.put_object(Bucket="bucket", Key="folha.csv", Body=b"cnpj\n1\n2\n")
+
+    stream, _ = s3_utils.open_object_stream("bucket", "folha.csv", use_cache=use_cache, start=7)
+
+    assert stream.read() == b"2\n"
+    stream.close()
+
+
+def test_object_cache_revalidates_with_etag(fake_s3, tmp_path):
+    cache = s3_utils.S3ObjectCache(str(tmp_path / "cache"), max_bytes=1024)
+    fake_s3.put_object(Bucket="bucket", Key="file.csv", Body="a\n1\n")
+
+    for _ in range(3):
+        stream, _ = cache.open("bucket", "file.csv")
+        assert stream.read() == b"a\n1\n"
+        stream.close()
+
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["misses"] == 1
+    assert cache.stats()["bytes_saved"] == 8
+    assert [params.get("IfNoneMatch") for params in fake_s3.calls_to("get_object")][1:] == [
+        fake_s3.head_object(Bucket="bucket", Key="file.csv")["ETag"]
+    ] * 2
+
+    new_version = fake_s3.put_object(Bucket="bucket", Key="file.csv", Body="a\n2\n")
+    stream, version_id = cache.open("bucket", "file.csv")
+
+    assert stream.read() == b"a\n2\n"
+    assert version_id == new_version["VersionId"]
+    assert cache.stats()["misses"] == 2
+
+
+def test_object_cache_serves_versions_without_requests(fake_s3, tmp_path):
+    cache = s3_utils.S3ObjectCache(str(tmp_path / "cache"), max_bytes=1024)
+    first = fake_s3.put_object(Bucket="bucket", Key="file.csv", Body="a\n1\n")
+    cache.open("bucket", "file.csv")[0].close()
+    requests_before = len(fake_s3.calls_to("get_object"))
+
+    stream, version_id = cache.open("bucket", "file.csv", first["VersionId"])
+
+    assert stream.read() == b"a\n1\n"
+    assert version_id == first["VersionId"]
+    assert len(fake_s3.calls_to("get_object")) == requests_before
+
+
+def test_object_cache_lru_eviction(fake_s3, tmp_path):
+    cache = s3_utils.S3ObjectCache(str(tmp_path / "cache"), max_bytes=25)
+    for key in ("a.csv", "b.csv", "c.csv"):
+        fake_s3.put_object(Bucket="bucket", Key=key, Body=f"{key}\n1234\n")
+
+    cache.open("bucket", "a.csv")[0].close()
+    cache.open("bucket", "b.csv")[0].close()
+    cache.open("bucket", "a.csv")[0].close()
+    cache.open("bucket", "c.csv")[0].close()
+
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["size"] <= 25
+    assert cache._find("bucket", "b.csv", None) is None
+    assert cache._find("bucket", "a.csv", None) is not None
+
+    reloaded = s3_utils.S3ObjectCache(str(tmp_path / "cache"), max_bytes=25)
+    assert reloaded.stats()["entries"] == 2
+
+
+def test_iter_content_rows_gzip():
+    content = gzip.compress("cnpj,nome\n1,Empresa 1\n2,Empresa 2\n".encode())
+
+    assert list(s3_utils.iter_content_rows(io.BytesIO(content), "folha.csv.gz")) == [
+        {"cnpj": "1", "nome": "Empresa 1"},
+        {"cnpj": "2", "nome": "Empresa 2"},
+    ]
+    # Sem o sufixo, o formato é detectado pelo conteúdo, inclusive em streams sem seek
+    stream = TrackingStream(content)
+    stream.seekable = lambda: False
+    assert [row["cnpj"] for row in s3_utils.iter_content_rows(stream, "folha")] == ["1", "2"]
+    assert stream.closed
+
+
+def test_iter_content_rows_parquet_projection():
+    buffer = io.BytesIO()
+    table = pa.table({"cnpj": ["1", "2"], "dia": [5, None], "nome": ["Empresa 1", "Empresa 2"]})
+    pq.write_table(table, buffer)
+
+    rows = s3_utils.iter_content_rows(io.BytesIO(buffer.getvalue()), "folha.parquet", columns=["cnpj", "dia"])
+
+    assert list(rows) == [{"cnpj": "1", "dia": "5"}, {"cnpj": "2", "dia": ""}]
+
+
+def test_iter_content_rows_missing_column():
+    with pytest.raises(InvalidProcessContent, match="dia"):
+        list(s3_utils.iter_content_rows(io.BytesIO(b"cnpj\n1\n"), "folha.csv", columns=["cnpj", "dia"]))
+
+
+def test_split_content_csv_offsets():
+    content = 'cnpj,nome\n1,"Empresa\n1"\n\n2,Empresa 2\n3,Empresa 3\n'.encode()
+
+    ranges = s3_utils.split_content(io.BytesIO(content), "folha.csv", rows_per_range=2)
+
+    assert [(item.row_start, item.row_end) for item in ranges] == [(0, 2), (2, 3)]
+    assert {tuple(item.header) for item in ranges} == {("cnpj", "nome")}
+    # Cada intervalo é lido a partir da sua posição, sem as linhas anteriores
+    for item, expected in zip(ranges, [["1", "2"], ["3"]], strict=True):
+        rows = s3_utils.iter_content_rows(io.BytesIO(content[item.offset :]), "folha.csv", header=item.header)
+        assert [row["cnpj"] for row in islice(rows, item.row_end - item.row_start)] == expected
+
+
+def test_split_content_gzip_without_offsets():
+    content = gzip.compress("cnpj\n1\n2\n3\n".encode())
+
+    ranges = s3_utils.split_content(io.BytesIO(content), "folha.csv.gz", rows_per_range=2)
+
+    assert [(item.row_start, item.row_end, item.offset) for item in ranges] == [(0, 2, None), (2, 3, None)]
+
+
+def test_slice_column_batches():
+    batches = [
+        s3_utils.ColumnBatch(header=["cnpj"], columns={"cnpj": values}, size=len(values))
+        for values in (["1", "2"], ["3", "4"], ["5"])
+    ]
+
+    sliced = s3_utils.slice_column_batches(iter(batches), 1, 4)
+
+    assert [batch.columns["cnpj"] for batch in sliced] == [["2"], ["3", "4"]]
+
+
+def test_s3_client_config():
+    s3_utils.get_s3_client.cache_clear()
+    config = s3_utils.get_s3_client().meta.config
+    s3_utils.get_s3_client.cache_clear()
+
+    assert config.max_pool_connections == settings.S3_MAX_POOL_CONNECTIONS
+    assert config.retries["mode"] == "adaptive"
+
+
+def test_fetch_objects_by_prefix(fake_s3, mocker):
+    fake_s3.page_size = 2
+    for squad in ("c", "a", "b"):
+        fake_s3.put_object(Bucket="bucket", Key=f"folha/{squad}.csv", Body=f"squad\n{squad}\n")
+    fake_s3.put_object(Bucket="bucket", Key="folha/leiame.txt", Body="ignorado")
+    fake_s3.put_object(Bucket="bucket", Key="outro/d.csv", Body="squad\nd\n")
+
+    objects = s3_utils.fetch_objects("bucket", "folha/", suffix=".csv", max_workers=2)
+
+    assert [key for key, _, _ in objects] == ["folha/a.csv", "folha/b.csv", "folha/c.csv"]
+    assert [list(s3_utils.iter_csv_rows(stream)) for _, stream, _ in objects] == [
+        [{"squad": "a"}],
+        [{"squad": "b"}],
+        [{"squad": "c"}],
+    ]
+    assert len(fake_s3.calls_to("list_objects_v2")) == 2
+
+
+def test_fetch_objects_bounds_concurrent_fetches(fake_s3, monkeypatch):
+    monkeypatch.setattr(settings, "S3_CACHE_ENABLED", False)
+    for index in range(6):
+        fake_s3.put_object(Bucket="bucket", Key=f"folha/{index}.csv", Body="squad\na\n")
+    lock, active, peak = threading.Lock(), [0], [0]
+    read_object_parallel = s3_utils.read_object_parallel
+
+    def tracking_read(*args, **kwargs):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.01)
+        try:
+            return read_object_parallel(*args, **kwargs)
+        finally:
+            with lock:
+                active[0] -= 1
+
+    monkeypatch.setattr(s3_utils, "read_object_parallel", tracking_read)
+
+    assert len(s3_utils.fetch_objects("bucket", "folha/", max_workers=2)) == 6
+    assert peak[0] == 2
+
+
+def test_read_object_parallel(fake_s3):
+    content = bytes(range(256)) * 40
+    put = fake_s3.put_object(Bucket="bucket", Key="grande.bin", Body=content)
+    fake_s3.put_object(Bucket="bucket", Key="grande.bin", Body=b"nova versao")
+
+    stream, version_id = s3_utils.read_object_parallel(
+        "bucket", "grande.bin", put["VersionId"], part_size=1000, max_workers=4
+    )
+
+    assert stream.read() == content
+    assert version_id == put["VersionId"]
+    ranges = [call["Range"] for call in fake_s3.calls_to("get_object")]
+    assert len(ranges) == 11
+    assert "bytes=10000-10239" in ranges
+
+
+def test_read_object_parallel_bounds_parts_in_flight(fake_s3, monkeypatch):
+    content = bytes(range(256)) * 40
+    fake_s3.put_object(Bucket="bucket", Key="grande.bin", Body=content)
+    written, in_flight = [], []
+    get_object, write = fake_s3.get_object, tempfile.SpooledTemporaryFile.write
+
+    def tracking_get_object(**kwargs):
+        if kwargs.get("Range"):
+            in_flight.append(len(fake_s3.calls_to("get_object")) + 1 - len(written))
+        return get_object(**kwargs)
+
+    def tracking_write(self, data):
+        written.append(len(data))
+        return write(self, data)
+
+    monkeypatch.setattr(fake_s3, "get_object", tracking_get_object)
+    monkeypatch.setattr(tempfile.SpooledTemporaryFile, "write", tracking_write)
+
+    stream, _ = s3_utils.read_object_parallel("bucket", "grande.bin", part_size=1000, max_workers=2)
+
+    assert stream.read() == content
+    assert len(written) == 11
+    # Cada nova parte só é pedida depois de gravar a mais antiga em andamento
+    assert max(in_flight) <= 2
+
+
+def test_open_object_stream_parquet_downloads_ranges(fake_s3, mocker, monkeypatch):
+    monkeypatch.setattr(settings, "S3_RANGE_PART_SIZE", 100)
+    buffer = io.BytesIO()
+    pq.write_table(pa.table({"cnpj": [str(number) for number in range(100)]}), buffer)
+    fake_s3.put_object(Bucket="bucket", Key="folha.parquet", Body=buffer.getvalue())
+
+    stream, _ = s3_utils.open_object_stream("bucket", "folha.parquet", use_cache=False)
+
+    assert len(list(s3_utils.iter_content_rows(stream, "folha.parquet"))) == 100
+    assert all(call.get("Range") for call in fake_s3.calls_to("get_object"))
+
+
+def test_upload_stream_small_content_uses_put_object(fake_s3):
+    uploaded = s3_utils.upload_stream("bucket", "pequeno.txt", [b"abc", b"def"], part_size=10)
+
+    assert uploaded["size"] == 6
+    assert fake_s3.get_object(Bucket="bucket", Key="pequeno.txt")["Body"].read() == b"abcdef"
+    assert len(fake_s3.calls_to("put_object")) == 1
+    assert fake_s3.calls_to("create_multipart_upload") == []
+
+
+def test_upload_stream_multipart(fake_s3):
+    content = bytes(range(256)) * 10
+    chunks = [content[start : start + 100] for start in range(0, len(content), 100)]
+
+    uploaded = s3_utils.upload_stream("bucket", "grande.bin", chunks, content_type="text/csv", part_size=1000)
+
+    assert uploaded["size"] == len(content)
+    assert fake_s3.get_object(Bucket="bucket", Key="grande.bin")["Body"].read() == content
+    assert fake_s3.calls_to("create_multipart_upload")[0]["ContentType"] == "text/csv"
+    assert [call["Size"] for call in fake_s3.calls_to("upload_part")] == [1000, 1000, 560]
+    assert fake_s3.calls_to("put_object") == []
+
+
+def test_upload_stream_aborts_failed_multipart(fake_s3):
+    def chunks():
+        yield b"x" * 1500
+        raise ConnectionError("download interrompido")
+
+    with pytest.raises(ConnectionError):
+        s3_utils.upload_stream("bucket", "grande.bin", chunks(), part_size=1000)
+
+    assert len(fake_s3.calls_to("abort_multipart_upload")) == 1
+    assert fake_s3.uploads == {}
+    assert ("bucket", "grande.bin") not in fake_s3.objects
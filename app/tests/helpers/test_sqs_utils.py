@@ -0,0 +1,44 @@
+import gzip
+import json
+
+from core.config import settings
+from helpers import sqs_utils
+
+
+def test_small_body_is_sent_inline(fake_s3):
+    body = {"process_key": "fechamento_folha_3"}
+
+    assert json.loads(sqs_utils.encode_message_body(body)) == body
+    assert sqs_utils.resolve_message_body(json.dumps(body)) == (json.dumps(body), None)
+    assert fake_s3.calls_to("put_object") == []
+
+
+def test_large_body_uses_claim_check(fake_s3, monkeypatch):
+    monkeypatch.setattr(settings, "SQS_CLAIM_CHECK_THRESHOLD_BYTES", 100)
+    body = {"process_key": "fechamento_folha_3", "customers": [f"{i:014d}" for i in range(50)]}
+
+    message_body = sqs_utils.encode_message_body(body)
+
+    claim_check = json.loads(message_body)["claim_check"]
+    assert claim_check["bucket"] == settings.CORE_SAIDA_BUCKET_NAME
+    assert claim_check["key"].startswith(settings.SQS_CLAIM_CHECK_PREFIX)
+    stored = fake_s3.objects[(claim_check["bucket"], claim_check["key"])][-1][1]
+    assert json.loads(gzip.decompress(stored)) == body
+
+    resolved_body, resolved_claim_check = sqs_utils.resolve_message_body(message_body)
+    assert json.loads(resolved_body) == body
+    assert resolved_claim_check == claim_check
+
+    sqs_utils.delete_claim_check(claim_check)
+    assert (claim_check["bucket"], claim_check["key"]) not in fake_s3.objects
+
+
+def test_claim_check_without_compression(fake_s3, monkeypatch):
+    monkeypatch.setattr(settings, "SQS_CLAIM_CHECK_THRESHOLD_BYTES", 10)
+    body = {"process_key": "fechamento_folha_3"}
+
+    message_body = sqs_utils.encode_message_body(body, compress=False)
+
+    claim_check = json.loads(message_body)["claim_check"]
+    assert claim_check["compression"] is None
+    assert json.loads(sqs_utils.resolve_message_body(message_body)[0]) == body
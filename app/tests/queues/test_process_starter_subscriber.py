@@ -0,0 +1,55 @@
+import asyncio
+import json
+
+import pytest
+from core.config import settings
+from helpers import sqs_utils
+from queues.subscribers.process_starter_subscriber import ProcessStarterSubscriber
+from queues.subscribers.sqs import SQSSubscriber
+from tests.camunda.conftest import FOLHA_OBJECT_KEY, build_folha_csv, build_folha_row
+
+
+@pytest.fixture
+def subscriber(mocker, db_session):
+    mocker.patch.object(SQSSubscriber, "_get_sqs_client")
+    mocker.patch.object(SQSSubscriber, "_get_queue_url", return_value="queue-url")
+    mocker.patch("queues.subscribers.sqs.get_session", return_value=iter([db_session]))
+    return ProcessStarterSubscriber(settings.PROCESS_STARTER_QUEUE_NAME)
+
+
+def test_handle_claim_check_message(subscriber, fake_camunda, fake_s3, monkeypatch):
+    rows = [build_folha_row(cnpj) for cnpj in ("30473147000160", "12603959000109", "44968739000167")]
+    fake_s3.put_object(Bucket=settings.CORE_SAIDA_BUCKET_NAME, Key=FOLHA_OBJECT_KEY, Body=build_folha_csv(rows))
+    monkeypatch.setattr(settings, "SQS_CLAIM_CHECK_THRESHOLD_BYTES", 10)
+    body = {
+        "process_key": "fechamento_folha_3",
+        "customers": ["30473147000160", "44968739000167"],
+        "parameters": {"competencia": "06/2025"},
+    }
+    message = {"MessageId": "1", "ReceiptHandle": "receipt", "Body": sqs_utils.encode_message_body(body)}
+    claim_check = json.loads(message["Body"])["claim_check"]
+
+    asyncio.run(subscriber.handle_message(message))
+
+    calls = fake_camunda.calls_to(r"/key/tarefa_fgts_familia3/start$")
+    assert [json.loads(call.body["variables"]["customer"]["value"])["cnpj"] for call in calls] == body["customers"]
+    assert {call.body["variables"]["competencia"]["value"] for call in calls} == {"06/2025"}
+    subscriber.sqs_client.delete_message.assert_called_once_with(QueueUrl="queue-url", ReceiptHandle="receipt")
+    assert (claim_check["bucket"], claim_check["key"]) not in fake_s3.objects
+
+
+def test_claim_check_kept_when_processing_fails(subscriber, mocker, fake_s3, monkeypatch):
+    monkeypatch.setattr(settings, "SQS_CLAIM_CHECK_THRESHOLD_BYTES", 10)
+    mocker.patch.object(ProcessStarterSubscriber, "process_message", side_effect=RuntimeError("boom"))
+    message = {
+        "MessageId": "1",
+        "ReceiptHandle": "receipt",
+        "Body": sqs_utils.encode_message_body({"process_key": "x"}),
+    }
+    claim_check = json.loads(message["Body"])["claim_check"]
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(subscriber.handle_message(message))
+
+    subscriber.sqs_client.delete_message.assert_not_called()
+    assert (claim_check["bucket"], claim_check["key"]) in fake_s3.objects
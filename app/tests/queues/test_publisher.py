@@ -0,0 +1,88 @@
+import pytest
+from core.exceptions import SQSPublishError
+from helpers import sqs_utils
+from queues.publisher import SQSPublisher, content_id, key_id
+
+
+def test_publish_splits_batches(fake_sqs):
+    publisher = SQSPublisher("orchestrator-queue")
+
+    result = publisher.publish({"index": index} for index in range(25))
+
+    assert result.sent == 25
+    assert result.failed == 0
+    batches = fake_sqs.calls_to("send_message_batch")
+    assert sorted(len(call["Entries"]) for call in batches) == [5, 10, 10]
+    assert sorted(body["index"] for body in fake_sqs.bodies("orchestrator-queue")) == list(range(25))
+
+
+def test_publish_caches_queue_url(fake_sqs):
+    publisher = SQSPublisher("orchestrator-queue")
+
+    publisher.publish({"index": index} for index in range(30))
+    publisher.send({"index": 30})
+
+    assert len(fake_sqs.calls_to("get_queue_url")) == 1
+
+
+def test_publish_retries_failed_entries(fake_sqs):
+    fake_sqs.failures = [("InternalError", False), ("ServiceUnavailable", False)]
+    publisher = SQSPublisher("orchestrator-queue", retry_backoff=0)
+
+    result = publisher.publish({"index": index} for index in range(3))
+
+    assert result.sent == 3
+    assert result.failed == 0
+    assert len(fake_sqs.calls_to("send_message_batch")) == 2
+    assert len(fake_sqs.calls_to("send_message_batch")[1]["Entries"]) == 2
+
+
+def test_publish_does_not_retry_sender_fault(fake_sqs):
+    fake_sqs.failures = [("InvalidMessageContents", True)]
+    publisher = SQSPublisher("orchestrator-queue", retry_backoff=0)
+
+    result = publisher.publish({"index": index} for index in range(3))
+
+    assert result.sent == 2
+    assert result.failed == 1
+    assert "InvalidMessageContents" in result.errors[0]
+    assert len(fake_sqs.calls_to("send_message_batch")) == 1
+
+
+def test_publish_gives_up_after_max_retries(fake_sqs):
+    fake_sqs.failures = [("InternalError", False)] * 3
+    publisher = SQSPublisher("orchestrator-queue", max_retries=2, retry_backoff=0)
+
+    with pytest.raises(SQSPublishError):
+        publisher.send({"index": 0})
+
+    assert len(fake_sqs.calls_to("send_message_batch")) == 3
+
+
+def test_publish_fifo_ids(fake_sqs):
+    publisher = SQSPublisher("orchestrator-queue.fifo", group_id=key_id("run_id"), deduplication_id=content_id)
+
+    publisher.publish([{"run_id": 1, "row": 0}, {"run_id": 1, "row": 1}, {"run_id": 2, "row": 0}])
+
+    messages = fake_sqs.messages("orchestrator-queue.fifo")
+    assert [message["MessageGroupId"] for message in messages] == ["1", "1", "2"]
+    assert len({message["MessageDeduplicationId"] for message in messages}) == 3
+    assert messages[0]["MessageDeduplicationId"] == content_id({"row": 0, "run_id": 1})
+
+
+def test_publish_standard_queue_without_fifo_ids(fake_sqs):
+    SQSPublisher("orchestrator-queue").send({"index": 0})
+
+    [message] = fake_sqs.messages("orchestrator-queue")
+    assert "MessageGroupId" not in message
+    assert "MessageDeduplicationId" not in message
+
+
+def test_publish_large_body_uses_claim_check(fake_sqs, fake_s3, monkeypatch):
+    monkeypatch.setattr(sqs_utils.settings, "SQS_CLAIM_CHECK_THRESHOLD_BYTES", 1024)
+    monkeypatch.setattr(sqs_utils.settings, "SQS_CLAIM_CHECK_BUCKET_NAME", "claim-checks")
+
+    SQSPublisher("orchestrator-queue").send({"payload": "x" * 4096})
+
+    [body] = fake_sqs.bodies("orchestrator-queue")
+    assert sqs_utils.CLAIM_CHECK_KEY in body
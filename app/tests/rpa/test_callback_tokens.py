@@ -0,0 +1,72 @@
+import time
+
+import pytest
+from core.config import settings
+from core.exceptions import RPAException
+from service.rpa import callback_tokens
+
+
+@pytest.fixture(autouse=True)
+def callback_secret(monkeypatch):
+    monkeypatch.setattr(settings, "MELIUS_CALLBACK_TOKEN_SECRET", "secret")
+    monkeypatch.setattr(settings, "MELIUS_CALLBACK_TOKEN_PREVIOUS_SECRET", "")
+
+
+def test_sign_and_verify_callback_token():
+    token = callback_tokens.sign_callback_token("task-1", "traDctf", ttl=60)
+
+    assert callback_tokens.is_signed_token(token)
+    claims = callback_tokens.verify_callback_token(token, "task-1")
+    assert claims.id_tarefa_cliente == "task-1"
+    assert claims.tipo_tarefa_rpa == "traDctf"
+    assert claims.expires_at > time.time()
+
+
+def test_callback_tokens_are_unique_per_dispatch():
+    assert callback_tokens.sign_callback_token("task-1", "traDctf") != callback_tokens.sign_callback_token(
+        "task-1", "traDctf"
+    )
+
+
+def test_callback_token_with_nonce():
+    token = callback_tokens.sign_callback_token("task-1", "traDctf", nonce="abcd1234.ef01")
+
+    assert callback_tokens.token_nonce(token) == "abcd1234.ef01"
+    assert callback_tokens.verify_callback_token(token, "task-1").nonce == "abcd1234.ef01"
+
+
+def test_verify_rejects_tampered_token():
+    token = callback_tokens.sign_callback_token("task-1", "traDctf")
+    other = callback_tokens.sign_callback_token("task-2", "traDctf")
+    tampered = ".".join([*other.split(".")[:2], token.split(".")[2]])
+
+    with pytest.raises(RPAException, match="Assinatura"):
+        callback_tokens.verify_callback_token(tampered, "task-2")
+
+
+def test_verify_rejects_expired_token():
+    token = callback_tokens.sign_callback_token("task-1", "traDctf", ttl=60, now=time.time() - 120)
+
+    with pytest.raises(RPAException, match="expirado"):
+        callback_tokens.verify_callback_token(token, "task-1")
+
+
+def test_verify_rejects_token_of_another_task():
+    token = callback_tokens.sign_callback_token("task-1", "traDctf")
+
+    with pytest.raises(RPAException, match="outra tarefa"):
+        callback_tokens.verify_callback_token(token, "task-2")
+
+
+@pytest.mark.parametrize("token", ["v1.abc", "v1.abc.def", "v2.abc.def"])
+def test_verify_rejects_malformed_token(token):
+    with pytest.raises(RPAException):
+        callback_tokens.verify_callback_token(token, "task-1")
+
+
+def test_verify_accepts_previous_secret(monkeypatch):
+    token = callback_tokens.sign_callback_token("task-1", "traDctf")
+    monkeypatch.setattr(settings, "MELIUS_CALLBACK_TOKEN_SECRET", "new-secret")
+    monkeypatch.setattr(settings, "MELIUS_CALLBACK_TOKEN_PREVIOUS_SECRET", "secret")
+
+    assert callback_tokens.verify_callback_token(token, "task-1").tipo_tarefa_rpa == "traDctf"
@@ -0,0 +1,107 @@
+import httpx
+import pytest
+from core.config import settings
+from models.rpa import CamundaOutbox, RPASource
+from service.rpa import file_mirror, outbox
+from sqlmodel import select
+
+
+class FakeFileServer:
+    """Serve os arquivos gerados pelo provedor, registrando os downloads"""
+
+    def __init__(self):
+        self.files: dict[str, bytes] = {}
+        self.requests: list[str] = []
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(str(request.url))
+        content = self.files.get(str(request.url))
+        if content is None:
+            return httpx.Response(404, content=b"expired")
+        return httpx.Response(200, content=content, headers={"Content-Type": "application/pdf"})
+
+
+@pytest.fixture
+def file_server(mocker, monkeypatch):
+    monkeypatch.setattr(settings, "CORE_SAIDA_BUCKET_NAME", "core-saida")
+    server = FakeFileServer()
+    client = httpx.Client(transport=httpx.MockTransport(server.handler))
+    mocker.patch("service.rpa.file_mirror.httpx.stream", client.stream)
+    return server
+
+
+def camunda_payload(*urls: str) -> dict:
+    arquivos = [{"url": url, "nome_arquivo": url.rsplit("/", 1)[-1], "tipo_arquivo": "guia"} for url in urls]
+    return {
+        "messageName": "result_rpa_traDctf",
+        "processVariables": {
+            "result_rpa_traDctf": {"value": {"status_tarefa_rpa": 1, "arquivos_gerados": arquivos}},
+        },
+        "processInstanceId": "instance-1",
+    }
+
+
+def files_of(payload: dict) -> list[dict]:
+    return payload["processVariables"]["result_rpa_traDctf"]["value"]["arquivos_gerados"]
+
+
+def test_mirror_generated_files(fake_s3, file_server):
+    file_server.files["http://melius.test/a.pdf"] = b"arquivo a"
+    file_server.files["http://melius.test/b.pdf"] = b"arquivo b"
+    payload = camunda_payload("http://melius.test/a.pdf", "http://melius.test/b.pdf")
+
+    mirrored = file_mirror.mirror_generated_files("instance-1", payload)
+
+    assert files_of(payload)[0]["url"] == "http://melius.test/a.pdf"
+    first, second = files_of(mirrored)
+    assert first["url"].startswith("s3://core-saida/rpa-arquivos/instance-1/")
+    assert first["url"].endswith("/a.pdf")
+    assert first["url_origem"] == "http://melius.test/a.pdf"
+    key = first["url"].removeprefix("s3://core-saida/")
+    assert fake_s3.get_object(Bucket="core-saida", Key=key)["Body"].read() == b"arquivo a"
+    assert second["url_origem"] == "http://melius.test/b.pdf"
+
+    assert file_mirror.mirror_generated_files("instance-1", mirrored) is None
+    assert len(file_server.requests) == 2
+
+
+def test_mirror_generated_files_keeps_url_on_failure(fake_s3, file_server):
+    file_server.files["http://melius.test/a.pdf"] = b"arquivo a"
+    payload = camunda_payload("http://melius.test/a.pdf", "http://melius.test/expirado.pdf")
+
+    first, second = files_of(file_mirror.mirror_generated_files("instance-1", payload))
+
+    assert file_mirror.is_mirrored(first)
+    assert second == files_of(payload)[1]
+    assert file_mirror.mirror_generated_files("instance-1", camunda_payload("http://melius.test/x.pdf")) is None
+
+
+def test_mirror_generated_files_without_files(fake_s3, file_server):
+    payload = camunda_payload()
+
+    assert file_mirror.mirror_generated_files("instance-1", payload) is None
+    assert file_server.requests == []
+
+
+def test_dispatcher_delivers_mirrored_files(fake_s3, file_server, fake_camunda, db_session, monkeypatch):
+    monkeypatch.setattr(settings, "RPA_FILE_MIRROR_ENABLED", True)
+    file_server.files["http://melius.test/a.pdf"] = b"arquivo a"
+    outbox.enqueue_message(
+        db_session,
+        dedup_key="instance-1:token",
+        process_instance_id="instance-1",
+        event_source=RPASource.MELIUS,
+        message_name="result_rpa_traDctf",
+        payload=camunda_payload("http://melius.test/a.pdf"),
+        event_data={"tipoTarefaRpa": "traDctf", "tokenRetorno": "token"},
+    )
+    db_session.commit()
+
+    assert outbox.dispatch_pending(db_session) == 1
+
+    (call,) = fake_camunda.calls_to(r"/message$")
+    (arquivo,) = files_of(call.body)
+    assert arquivo["url"].startswith("s3://core-saida/")
+    db_session.expire_all()
+    message = db_session.execute(select(CamundaOutbox)).scalar_one()
+    assert files_of(message.payload) == [arquivo]
@@ -1,4 +1,6 @@
+import asyncio
 import datetime
+import json
 from unittest.mock import MagicMock, patch
 
 import httpx
@@ -6,17 +8,28 @@ import pytest
 from core.config import settings
 from fastapi.testclient import TestClient
 from httpx import Request, Response, codes
-from models.rpa import RPAEventLog, RPAEventTypes, RPASource
+from models.rpa import (
+    RPAEventLog,
+    RPAEventTypes,
+    RPAIdempotencyKey,
+    RPAPendingTask,
+    RPASource,
+)
 from schemas.rpa_schema import MeliusWebhookRequest
-from service.rpa import rpa_services
+from service.camunda.external_tasks import ExternalTask
+from service.rpa import (
+    callback_tokens,
+    idempotency,
+    melius_client,
+    outbox,
+    rpa_services,
+)
 from sqlalchemy import func
 from sqlmodel import select
 
 
-def test_start_rpa_endpoint(client: TestClient, mocker, db_session):
-    mock_post = mocker.patch("service.rpa.rpa_services.httpx.post")
-    mock_post.return_value.json.return_value = {"message": "RPA started"}
-    mock_post.return_value.status_code = codes.OK
+def test_start_rpa_endpoint(client: TestClient, db_session, melius_api):
+    melius_api.responses.append(Response(codes.OK, json={"message": "RPA started"}))
 
     process_data = {"idTarefaCliente": "1234567890"}
 
@@ -26,6 +39,10 @@ def test_start_rpa_endpoint(client: TestClient, mocker, db_session):
     assert response.status_code == codes.OK
     assert response.json() == {"message": "RPA started"}
 
+    [melius_request] = melius_api.requests
+    assert str(melius_request.url) == f"{settings.MELIUS_RPA_URL}/envia-tarefa-rpa"
+    assert json.loads(melius_request.content)["idTarefaCliente"] == process_data["idTarefaCliente"]
+
     stmt = select(RPAEventLog)
     rpa_event_log = db_session.execute(stmt).scalar_one()
 
@@ -33,17 +50,14 @@ def test_start_rpa_endpoint(client: TestClient, mocker, db_session):
     assert rpa_event_log.process_id == process_data["idTarefaCliente"]
     assert rpa_event_log.event_type == RPAEventTypes.START
 
+    pending_task = db_session.execute(select(RPAPendingTask)).scalar_one()
+    assert pending_task.process_id == process_data["idTarefaCliente"]
+    assert pending_task.token_retorno == rpa_event_log.event_data["tokenRetorno"]
+    assert "token" not in pending_task.process_data
 
-@patch("service.rpa.rpa_services.httpx.post")
-def test_start_rpa_endpoint_error(mock_post, db_session, client: TestClient):
-    mock_response = MagicMock()
-    mock_response.status_code = codes.BAD_REQUEST
-    mock_response.content = b"400 Bad Request"
-    mock_response.raise_for_status.side_effect = httpx.HTTPStatusError(
-        message="400 Bad Request", request=Request("POST", "http://test.com"), response=mock_response
-    )
 
-    mock_post.return_value = mock_response
+def test_start_rpa_endpoint_error(db_session, client: TestClient, melius_api):
+    melius_api.responses.append(Response(codes.BAD_REQUEST, content=b"400 Bad Request"))
 
     process_data = {"idTarefaCliente": "1234567890"}
     response = client.post("/api/melius/start-rpa", json={"process_data": process_data})
@@ -60,13 +74,8 @@ def test_start_rpa_endpoint_error(mock_post, db_session, client: TestClient):
     assert rpa_event_log.event_type == RPAEventTypes.START_ERROR
 
 
-@patch("service.rpa.rpa_services.httpx.post")
-def test_start_rpa_generic_error(mock_post, db_session, client: TestClient):
-    mock_response = MagicMock()
-    mock_response.content = b"500 Generic Exception"
-    mock_response.raise_for_status.side_effect = Exception("Generic Exception")
-
-    mock_post.return_value = mock_response
+def test_start_rpa_generic_error(db_session, client: TestClient, melius_api):
+    melius_api.responses.append(httpx.ReadTimeout("Generic Exception"))
 
     process_data = {"idTarefaCliente": "1234567890"}
     response = client.post("/api/melius/start-rpa", json={"process_data": process_data})
@@ -83,7 +92,167 @@ def test_start_rpa_generic_error(mock_post, db_session, client: TestClient):
     assert rpa_event_log.event_type == RPAEventTypes.START_ERROR
 
 
-@patch("service.rpa.rpa_services.httpx.post")
+def test_start_rpa_batch_endpoint(client: TestClient, db_session, melius_api, monkeypatch):
+    monkeypatch.setattr(settings, "MELIUS_RPA_BATCH_CONCURRENCY", 3)
+    melius_api.delay = 0.01
+    melius_api.responses.extend(
+        [Response(codes.OK, json={"idRequisicao": str(index)}) for index in range(9)]
+        + [Response(codes.BAD_REQUEST, content=b"400 Bad Request")]
+    )
+
+    items = [{"idTarefaCliente": str(index), "tipoTarefaRpa": "traDctf"} for index in range(10)]
+    response = client.post("/api/melius/start-rpa/batch", json={"items": items})
+    db_session.commit()
+
+    assert response.status_code == codes.OK
+    content = response.json()
+    assert content["started"] == 9
+    assert content["failed"] == 1
+    assert [result["id_tarefa_cliente"] for result in content["results"]] == [str(index) for index in range(10)]
+    assert sum(result["error"] == "400 Bad Request" for result in content["results"]) == 1
+    assert melius_api.max_in_flight == 3
+
+    rpa_event_logs = db_session.execute(select(RPAEventLog)).scalars().all()
+    assert len(rpa_event_logs) == 10
+    assert sum(log.event_type == RPAEventTypes.START for log in rpa_event_logs) == 9
+    assert sum(log.event_type == RPAEventTypes.START_ERROR for log in rpa_event_logs) == 1
+    assert len({log.event_data.get("tokenRetorno") for log in rpa_event_logs}) == 10
+
+
+def test_start_rpa_batch_endpoint_requires_items(client: TestClient, melius_api):
+    response = client.post("/api/melius/start-rpa/batch", json={"items": []})
+
+    assert response.status_code == codes.BAD_REQUEST
+    assert melius_api.requests == []
+
+
+def test_start_rpa_signs_callback_token(client: TestClient, db_session, melius_api, monkeypatch):
+    monkeypatch.setattr(settings, "MELIUS_CALLBACK_TOKEN_SECRET", "secret")
+
+    process_data = {"idTarefaCliente": "1234567890", "tipoTarefaRpa": "traDctf"}
+    response = client.post("/api/melius/start-rpa", json={"process_data": process_data})
+
+    assert response.status_code == codes.OK
+    token = json.loads(melius_api.requests[0].content)["tokenRetorno"]
+    claims = callback_tokens.verify_callback_token(token, "1234567890")
+    assert claims.tipo_tarefa_rpa == "traDctf"
+
+
+@patch("service.rpa.outbox.httpx.post")
+def test_handle_webhook_request_signed_token(mock_post: MagicMock, db_session, monkeypatch):
+    monkeypatch.setattr(settings, "MELIUS_CALLBACK_TOKEN_SECRET", "secret")
+    monkeypatch.setattr(settings, "MELIUS_CALLBACK_LEGACY_TOKENS_ENABLED", False)
+    id_tarefa_cliente = "29c16b26-2213-11f0-a8ae-129143b339f3"
+    token = callback_tokens.sign_callback_token(id_tarefa_cliente, "traDctf")
+    db_session.add(
+        RPAEventLog(
+            process_id=id_tarefa_cliente,
+            event_type=RPAEventTypes.START,
+            event_source=RPASource.MELIUS,
+            event_data={"tipoTarefaRpa": "traDctf", "tokenRetorno": token, "nomeCliente": "Cliente"},
+        )
+    )
+    db_session.commit()
+    mock_post.return_value = Response(
+        status_code=codes.NO_CONTENT, request=Request("POST", "http://localhost:8080/engine-rest/message")
+    )
+    webhook_request = MeliusWebhookRequest.model_validate(
+        {"idTarefaCliente": id_tarefa_cliente, "statusTarefaRpa": 1, "tokenRetorno": token}
+    )
+
+    with patch.object(db_session, "execute", wraps=db_session.execute) as execute:
+        rpa_services.handle_webhook_request(webhook_request, db_session)
+        rpa_services.handle_webhook_request(webhook_request, db_session)
+
+    # Apenas escritas (outbox e tarefa pendente): o token é validado sem consultas
+    assert execute.call_count == 4
+    assert not any(call.args[0].is_select for call in execute.call_args_list)
+
+    assert outbox.dispatch_pending(db_session) == 1
+    assert mock_post.call_args.kwargs["json"]["messageName"] == "result_rpa_traDctf"
+
+    finish_log = db_session.execute(
+        select(RPAEventLog).where(RPAEventLog.event_type == RPAEventTypes.FINISH)
+    ).scalar_one()
+    assert finish_log.event_data["nomeCliente"] == "Cliente"
+    assert finish_log.event_data["tokenRetorno"] == token
+
+
+def test_handle_webhook_request_rejects_forged_token(db_session, monkeypatch):
+    monkeypatch.setattr(settings, "MELIUS_CALLBACK_TOKEN_SECRET", "secret")
+    token = callback_tokens.sign_callback_token("another-task", "traDctf")
+    webhook_request = MeliusWebhookRequest.model_validate(
+        {"idTarefaCliente": "29c16b26-2213-11f0-a8ae-129143b339f3", "statusTarefaRpa": 1, "tokenRetorno": token}
+    )
+
+    with pytest.raises(rpa_services.RPAException):
+        rpa_services.handle_webhook_request(webhook_request, db_session)
+
+
+def test_handle_melius_external_task(db_session, session_maker, melius_api, mocker):
+    mocker.patch("service.rpa.rpa_services.get_session_maker", return_value=session_maker)
+    melius_api.responses.append(Response(codes.OK, json={"idRequisicao": "42"}))
+    task = ExternalTask(
+        id="task-id",
+        topic_name=settings.MELIUS_EXTERNAL_TASK_TOPIC,
+        process_instance_id="process-instance-id",
+        variables={"process_data": {"type": "Json", "value": '{"tipoTarefaRpa": "traDctf"}'}},
+    )
+
+    variables = asyncio.run(rpa_services.handle_melius_external_task(task))
+
+    assert json.loads(variables["melius_response"]["value"]) == {"idRequisicao": "42"}
+    assert json.loads(melius_api.requests[0].content)["idTarefaCliente"] == "process-instance-id"
+    rpa_event_log = db_session.execute(select(RPAEventLog)).scalar_one()
+    assert rpa_event_log.event_type == RPAEventTypes.START
+    assert rpa_event_log.process_id == "process-instance-id"
+
+
+def test_redelivered_melius_external_task_returns_stored_response(db_session, session_maker, melius_api, mocker):
+    mocker.patch("service.rpa.rpa_services.get_session_maker", return_value=session_maker)
+    melius_api.responses.append(Response(codes.OK, json={"idRequisicao": "42"}))
+    task = ExternalTask(
+        id="task-id",
+        topic_name=settings.MELIUS_EXTERNAL_TASK_TOPIC,
+        process_instance_id="process-instance-id",
+        variables={"process_data": {"type": "Json", "value": '{"tipoTarefaRpa": "traDctf"}'}},
+    )
+
+    first = asyncio.run(rpa_services.handle_melius_external_task(task))
+    redelivered = asyncio.run(rpa_services.handle_melius_external_task(task))
+
+    assert redelivered == first
+    assert len(melius_api.requests) == 1
+    assert db_session.execute(select(func.count()).select_from(RPAEventLog)).scalar() == 1
+
+
+def test_handle_melius_external_task_error(db_session, session_maker, melius_api, mocker):
+    mocker.patch("service.rpa.rpa_services.get_session_maker", return_value=session_maker)
+    melius_api.responses.append(Response(codes.BAD_REQUEST, content=b"400 Bad Request"))
+    task = ExternalTask(id="task-id", topic_name="melius-rpa", process_instance_id="process-instance-id")
+
+    with pytest.raises(rpa_services.RPAException, match="400 Bad Request"):
+        asyncio.run(rpa_services.handle_melius_external_task(task))
+
+    # A chave é liberada, para que a nova tentativa do Camunda envie a tarefa
+    assert db_session.execute(select(RPAIdempotencyKey)).scalars().all() == []
+
+
+def test_melius_client_is_reused_and_closed():
+    client = melius_client.get_melius_client()
+
+    assert melius_client.get_melius_client() is client
+    assert client.timeout.connect == settings.MELIUS_RPA_CONNECT_TIMEOUT
+    assert client.timeout.read == settings.MELIUS_RPA_READ_TIMEOUT
+
+    asyncio.run(melius_client.close_melius_client())
+
+    assert client.is_closed
+    assert melius_client.get_melius_client() is not client
+    asyncio.run(melius_client.close_melius_client())
+
+
+@patch("service.rpa.outbox.httpx.post")
 def test_handle_webhook_request(mock_post: MagicMock, db_session, override_envvars):
     settings.CAMUNDA_USERNAME = "admin"
     settings.CAMUNDA_PASSWORD = "admin"
@@ -117,6 +286,9 @@ def test_handle_webhook_request(mock_post: MagicMock, db_session, override_envva
         "tokenRetorno": "token",
     }
     response = rpa_services.handle_webhook_request(MeliusWebhookRequest.model_validate(webhook_request), db_session)
+    mock_post.assert_not_called()
+
+    assert outbox.dispatch_pending(db_session) == 1
 
     expected_camunda_request = {
         "messageName": "result_rpa_traDctf",
@@ -155,7 +327,7 @@ def test_handle_webhook_request(mock_post: MagicMock, db_session, override_envva
     assert response == {"message": "Webhook Melius recebido com sucesso"}
 
 
-@patch("service.rpa.rpa_services.httpx.post")
+@patch("service.rpa.outbox.httpx.post")
 def test_handle_webhook_request_invalid_token(mock_post: MagicMock, db_session):
     id_tarefa_cliente = "29c16b26-2213-11f0-a8ae-129143b339f3"
     db_session.add(
@@ -200,7 +372,7 @@ def test_handle_webhook_request_invalid_token(mock_post: MagicMock, db_session):
     assert rpa_event_log_count == 0
 
 
-@patch("service.rpa.rpa_services.httpx.post")
+@patch("service.rpa.outbox.httpx.post")
 def test_handle_webhook_request_duplicate_request(mock_post: MagicMock, db_session):
     id_tarefa_cliente = "29c16b26-2213-11f0-a8ae-129143b339f3"
     db_session.add(
@@ -255,8 +427,9 @@ def test_handle_webhook_request_duplicate_request(mock_post: MagicMock, db_sessi
     assert rpa_event_log_count == 1
 
 
-@patch("service.rpa.rpa_services.httpx.post")
-def test_handle_melius_webhook_post_error(mock_post: MagicMock, db_session):
+@patch("service.rpa.outbox.httpx.post")
+def test_handle_melius_webhook_post_error(mock_post: MagicMock, db_session, monkeypatch):
+    monkeypatch.setattr(settings, "CAMUNDA_OUTBOX_MAX_ATTEMPTS", 1)
     id_tarefa_cliente = "29c16b26-2213-11f0-a8ae-129143b339f3"
     db_session.add(
         RPAEventLog(
@@ -286,6 +459,7 @@ def test_handle_melius_webhook_post_error(mock_post: MagicMock, db_session):
     }
 
     response = rpa_services.handle_webhook_request(MeliusWebhookRequest.model_validate(webhook_request), db_session)
+    outbox.dispatch_pending(db_session)
 
     stmt = (
         select(RPAEventLog)
@@ -300,3 +474,98 @@ def test_handle_melius_webhook_post_error(mock_post: MagicMock, db_session):
     assert rpa_event_log_count == 1
 
     assert response == {"message": "Webhook Melius recebido com sucesso"}
+
+
+def test_start_rpa_repeated_request_returns_stored_response(client: TestClient, db_session, melius_api):
+    melius_api.responses.append(Response(codes.OK, json={"idRequisicao": "42"}))
+    process_data = {"idTarefaCliente": "1234567890", "tipoTarefaRpa": "traDctf"}
+
+    first = client.post("/api/melius/start-rpa", json={"process_data": process_data})
+    repeated = client.post("/api/melius/start-rpa", json={"process_data": process_data})
+
+    assert first.status_code == repeated.status_code == codes.OK
+    assert repeated.json() == first.json() == {"idRequisicao": "42"}
+    assert len(melius_api.requests) == 1
+    assert db_session.execute(select(func.count()).select_from(RPAEventLog)).scalar() == 1
+
+
+def test_start_rpa_idempotency_key_header(client: TestClient, db_session, melius_api):
+    process_data = {"idTarefaCliente": "1234567890", "tipoTarefaRpa": "traDctf"}
+    headers = {"Idempotency-Key": "request-1"}
+
+    first = client.post("/api/melius/start-rpa", json={"process_data": process_data}, headers=headers)
+    other_body = client.post(
+        "/api/melius/start-rpa", json={"process_data": {**process_data, "extra": 1}}, headers=headers
+    )
+    other_key = client.post(
+        "/api/melius/start-rpa", json={"process_data": process_data}, headers={"Idempotency-Key": "request-2"}
+    )
+
+    assert first.status_code == codes.OK
+    assert other_body.status_code == codes.CONFLICT
+    assert other_key.status_code == codes.OK
+    assert len(melius_api.requests) == 2
+
+
+def test_start_rpa_in_progress_request_conflicts(client: TestClient, db_session, melius_api):
+    process_data = {"idTarefaCliente": "1234567890", "tipoTarefaRpa": "traDctf"}
+    key = idempotency.request_key(process_data)
+    assert idempotency.claim_key(db_session, key, idempotency.request_hash(process_data)) is None
+
+    response = client.post("/api/melius/start-rpa", json={"process_data": process_data})
+
+    assert response.status_code == codes.CONFLICT
+    assert melius_api.requests == []
+
+
+def test_start_rpa_takes_over_abandoned_idempotency_key(client: TestClient, db_session, melius_api, monkeypatch):
+    process_data = {"idTarefaCliente": "1234567890", "tipoTarefaRpa": "traDctf"}
+    key = idempotency.request_key(process_data)
+    # Reserva de uma requisição que morreu sem liberar a chave, com o lease já vencido
+    monkeypatch.setattr(settings, "MELIUS_RPA_IDEMPOTENCY_LEASE", 0)
+    assert idempotency.claim_key(db_session, key, idempotency.request_hash(process_data)) is None
+    monkeypatch.setattr(settings, "MELIUS_RPA_IDEMPOTENCY_LEASE", 300)
+
+    response = client.post("/api/melius/start-rpa", json={"process_data": process_data})
+    other_body = client.post("/api/melius/start-rpa", json={"process_data": {**process_data, "extra": 1}})
+
+    assert response.status_code == codes.OK
+    assert other_body.status_code == codes.CONFLICT
+    assert len(melius_api.requests) == 1
+    stored = db_session.execute(select(RPAIdempotencyKey)).scalar_one()
+    db_session.refresh(stored)
+    assert stored.in_progress_until is None
+
+
+def test_start_rpa_cancelled_releases_idempotency_key(db_session, mocker):
+    mocker.patch.object(rpa_services, "dispatch_melius_rpa", side_effect=asyncio.CancelledError)
+    process_data = {"idTarefaCliente": "1234567890", "tipoTarefaRpa": "traDctf"}
+
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(rpa_services.start_melius_rpa(process_data, db_session))
+
+    assert db_session.execute(select(RPAIdempotencyKey)).scalars().all() == []
+
+
+def test_start_rpa_error_releases_idempotency_key(client: TestClient, db_session, melius_api):
+    melius_api.responses.append(Response(codes.BAD_REQUEST, content=b"400 Bad Request"))
+    process_data = {"idTarefaCliente": "1234567890", "tipoTarefaRpa": "traDctf"}
+
+    failed = client.post("/api/melius/start-rpa", json={"process_data": process_data})
+    retried = client.post("/api/melius/start-rpa", json={"process_data": process_data})
+
+    assert failed.status_code == codes.INTERNAL_SERVER_ERROR
+    assert retried.status_code == codes.OK
+    assert len(melius_api.requests) == 2
+
+
+def test_start_rpa_expired_idempotency_key(client: TestClient, db_session, melius_api, monkeypatch):
+    monkeypatch.setattr(settings, "MELIUS_RPA_IDEMPOTENCY_TTL", 0)
+    process_data = {"idTarefaCliente": "1234567890", "tipoTarefaRpa": "traDctf"}
+
+    client.post("/api/melius/start-rpa", json={"process_data": process_data})
+    client.post("/api/melius/start-rpa", json={"process_data": process_data})
+
+    assert len(melius_api.requests) == 2
+    assert idempotency.purge_expired_keys(db_session) == 1
+    assert db_session.execute(select(RPAIdempotencyKey)).scalars().all() == []
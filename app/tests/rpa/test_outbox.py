@@ -0,0 +1,190 @@
+import datetime
+
+from core.config import settings
+from fastapi.testclient import TestClient
+from httpx import codes
+from models.rpa import (
+    CamundaOutbox,
+    CamundaOutboxStatus,
+    RPAEventLog,
+    RPAEventTypes,
+    RPASource,
+)
+from service.rpa import outbox
+from sqlmodel import select
+
+
+def enqueue(db_session, process_instance_id: str, token: str, event_source: RPASource = RPASource.MELIUS) -> bool:
+    return outbox.enqueue_message(
+        db_session,
+        dedup_key=f"{process_instance_id}:{token}",
+        process_instance_id=process_instance_id,
+        event_source=event_source,
+        message_name="result_rpa_traDctf",
+        payload={"messageName": "result_rpa_traDctf", "processInstanceId": process_instance_id, "token": token},
+        event_data={"tipoTarefaRpa": "traDctf", "tokenRetorno": token},
+    )
+
+
+def get_messages(db_session) -> list[CamundaOutbox]:
+    db_session.expire_all()
+    return list(db_session.execute(select(CamundaOutbox).order_by(CamundaOutbox.id)).scalars().all())
+
+
+def test_enqueue_message_is_idempotent(db_session):
+    assert enqueue(db_session, "instance-1", "token") is True
+    assert enqueue(db_session, "instance-1", "token") is False
+    assert enqueue(db_session, "instance-1", "other-token") is True
+
+    assert len(get_messages(db_session)) == 2
+
+
+def test_dispatch_pending_delivers_in_order_per_instance(fake_camunda, db_session):
+    enqueue(db_session, "instance-1", "first")
+    enqueue(db_session, "instance-2", "first")
+    enqueue(db_session, "instance-1", "second")
+    db_session.commit()
+
+    assert outbox.dispatch_pending(db_session) == 2
+    assert outbox.dispatch_pending(db_session) == 1
+    assert outbox.dispatch_pending(db_session) == 0
+
+    delivered = [(call.body["processInstanceId"], call.body["token"]) for call in fake_camunda.calls_to(r"/message$")]
+    assert sorted(delivered[:2]) == [("instance-1", "first"), ("instance-2", "first")]
+    assert delivered[2] == ("instance-1", "second")
+
+    messages = get_messages(db_session)
+    assert {message.status for message in messages} == {CamundaOutboxStatus.DELIVERED}
+    assert all(message.delivered_at is not None for message in messages)
+
+    finish_logs = db_session.execute(select(RPAEventLog)).scalars().all()
+    assert [log.event_type for log in finish_logs] == [RPAEventTypes.FINISH] * 3
+
+
+def test_dispatch_pending_logs_provider_of_message(fake_camunda, db_session):
+    enqueue(db_session, "instance-1", "token", event_source=RPASource.UIPATH)
+    db_session.commit()
+
+    assert outbox.dispatch_pending(db_session) == 1
+
+    finish_log = db_session.execute(select(RPAEventLog)).scalar_one()
+    assert finish_log.event_type == RPAEventTypes.FINISH
+    assert finish_log.event_source == RPASource.UIPATH
+
+
+def test_dispatch_pending_retries_with_backoff(fake_camunda, db_session, monkeypatch):
+    monkeypatch.setattr(settings, "CAMUNDA_OUTBOX_RETRY_BACKOFF", 60)
+    fake_camunda.config.error_rate = 1.0
+    enqueue(db_session, "instance-1", "first")
+    enqueue(db_session, "instance-1", "second")
+    db_session.commit()
+
+    assert outbox.dispatch_pending(db_session) == 1
+
+    first, second = get_messages(db_session)
+    assert first.status == CamundaOutboxStatus.PENDING
+    assert first.attempts == 1
+    assert "500" in first.last_error
+    assert first.next_attempt_at.replace(tzinfo=None) > datetime.datetime.utcnow() + datetime.timedelta(seconds=50)
+    assert second.attempts == 0
+
+    # A segunda mensagem da instância espera a primeira, mesmo durante o backoff
+    assert outbox.dispatch_pending(db_session) == 0
+
+    fake_camunda.config.error_rate = 0.0
+    first.next_attempt_at = datetime.datetime.utcnow()
+    db_session.commit()
+
+    assert outbox.dispatch_pending(db_session) == 1
+    assert outbox.dispatch_pending(db_session) == 1
+    assert {message.status for message in get_messages(db_session)} == {CamundaOutboxStatus.DELIVERED}
+
+
+def test_dispatch_pending_gives_up_after_max_attempts(fake_camunda, db_session, monkeypatch):
+    monkeypatch.setattr(settings, "CAMUNDA_OUTBOX_MAX_ATTEMPTS", 1)
+    fake_camunda.config.error_rate = 1.0
+    enqueue(db_session, "instance-1", "first")
+    enqueue(db_session, "instance-1", "second")
+    db_session.commit()
+
+    outbox.dispatch_pending(db_session)
+
+    first, second = get_messages(db_session)
+    assert first.status == CamundaOutboxStatus.FAILED
+    error_log = db_session.execute(select(RPAEventLog)).scalar_one()
+    assert error_log.event_type == RPAEventTypes.FINISH_WITH_ERROR
+    assert error_log.event_data["tokenRetorno"] == "first"
+
+    # A falha definitiva libera as mensagens seguintes da instância
+    fake_camunda.config.error_rate = 0.0
+    assert outbox.dispatch_pending(db_session) == 1
+    assert get_messages(db_session)[1].status == CamundaOutboxStatus.DELIVERED
+
+
+def test_dispatch_pending_does_not_lock_messages_during_delivery(fake_camunda, db_session, session_maker, mocker):
+    enqueue(db_session, "instance-1", "first")
+    db_session.commit()
+    deliver = outbox._deliver
+
+    def check_lock_and_deliver(payload):
+        with session_maker() as other_session:
+            # Falha se a linha ainda estiver bloqueada pelo dispatcher
+            stmt = select(CamundaOutbox).with_for_update(nowait=True)
+            message = other_session.execute(stmt).scalar_one()
+            # A mensagem reservada não é entregue por outro dispatcher
+            assert message.next_attempt_at.replace(tzinfo=None) > datetime.datetime.utcnow()
+            assert outbox.dispatch_pending(other_session) == 0
+        return deliver(payload)
+
+    mocker.patch("service.rpa.outbox._deliver", side_effect=check_lock_and_deliver)
+
+    assert outbox.dispatch_pending(db_session) == 1
+
+    assert get_messages(db_session)[0].status == CamundaOutboxStatus.DELIVERED
+    assert len(fake_camunda.calls_to(r"/message$")) == 1
+
+
+def test_dispatch_pending_discards_outcome_of_expired_lease(fake_camunda, db_session, session_maker, mocker):
+    enqueue(db_session, "instance-1", "first")
+    db_session.commit()
+    deliver = outbox._deliver
+
+    def expire_lease_and_deliver(payload):
+        # Outro dispatcher retoma a mensagem depois que a reserva expira
+        with session_maker() as other_session:
+            other_session.execute(CamundaOutbox.__table__.update().values(attempts=CamundaOutbox.attempts + 1))
+            other_session.commit()
+        return deliver(payload)
+
+    mocker.patch("service.rpa.outbox._deliver", side_effect=expire_lease_and_deliver)
+
+    assert outbox.dispatch_pending(db_session) == 1
+
+    [message] = get_messages(db_session)
+    assert message.status == CamundaOutboxStatus.PENDING
+    assert message.attempts == 2
+    assert db_session.execute(select(RPAEventLog)).first() is None
+
+
+def test_retry_delay_is_capped(monkeypatch):
+    monkeypatch.setattr(settings, "CAMUNDA_OUTBOX_RETRY_BACKOFF", 2)
+    monkeypatch.setattr(settings, "CAMUNDA_OUTBOX_MAX_BACKOFF", 30)
+
+    assert [outbox.retry_delay(attempts).total_seconds() for attempts in range(1, 6)] == [2, 4, 8, 16, 30]
+
+
+def test_outbox_lag_endpoint(client: TestClient, db_session):
+    enqueue(db_session, "instance-1", "first")
+    db_session.execute(
+        CamundaOutbox.__table__.update().values(created_at=datetime.datetime.utcnow() - datetime.timedelta(minutes=5))
+    )
+    enqueue(db_session, "instance-2", "first")
+    db_session.commit()
+
+    response = client.get("/api/melius/outbox/lag")
+
+    assert response.status_code == codes.OK
+    content = response.json()
+    assert content["pending"] == 2
+    assert content["failed"] == 0
+    assert 290 < content["oldest_pending_seconds"] < 400
@@ -0,0 +1,126 @@
+import asyncio
+
+import pytest
+from core.config import settings
+from core.exceptions import RPAException
+from models.rpa import RPAEventTypes, RPASource
+from service.rpa import providers
+
+
+class SlowProvider(providers.MeliusProvider):
+    """Provedor que nunca responde enquanto o evento não for liberado"""
+
+    source = RPASource.UIPATH
+
+    def __init__(self):
+        super().__init__()
+        self.release = None
+
+    @property
+    def max_concurrency(self) -> int:
+        return 1
+
+    @property
+    def max_queue(self) -> int:
+        return 1
+
+    async def send(self, process_data: dict) -> dict:
+        await self.release.wait()
+        return {}
+
+
+def process_data(task_id: str) -> dict:
+    return {"idTarefaCliente": task_id, "tipoTarefaRpa": "traDctf"}
+
+
+def test_get_provider_returns_registered_adapter():
+    assert isinstance(providers.get_provider(RPASource.MELIUS), providers.MeliusProvider)
+    assert isinstance(providers.get_provider("melius"), providers.MeliusProvider)
+
+
+def test_get_provider_rejects_unregistered_source():
+    with pytest.raises(RPAException):
+        providers.get_provider(RPASource.UIPATH)
+
+
+def test_dispatch_respects_provider_concurrency(melius_api, monkeypatch):
+    monkeypatch.setattr(settings, "MELIUS_RPA_MAX_CONCURRENCY", 2)
+    melius_api.delay = 0.02
+    provider = providers.MeliusProvider()
+
+    async def run():
+        return await asyncio.gather(*(provider.dispatch(process_data(str(i))) for i in range(6)))
+
+    results = asyncio.run(run())
+
+    assert all(result.error is None for result in results)
+    assert len(melius_api.requests) == 6
+    assert melius_api.max_in_flight == 2
+
+
+def test_dispatch_fails_when_provider_queue_is_full(melius_api, monkeypatch):
+    monkeypatch.setattr(settings, "MELIUS_RPA_MAX_CONCURRENCY", 1)
+    monkeypatch.setattr(settings, "MELIUS_RPA_MAX_QUEUE", 1)
+    melius_api.delay = 0.02
+    provider = providers.MeliusProvider()
+
+    async def run():
+        return await asyncio.gather(*(provider.dispatch(process_data(str(i))) for i in range(3)))
+
+    results = asyncio.run(run())
+
+    errors = [result for result in results if result.error]
+    assert len(errors) == 1
+    assert errors[0].event_log.event_type == RPAEventTypes.START_ERROR
+    assert errors[0].pending_task is None
+    assert "cheia" in errors[0].error
+    assert len(melius_api.requests) == 2
+
+
+def test_rate_limiter_spaces_calls():
+    limiter = providers.RateLimiter(rate=50)
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        for _ in range(4):
+            await limiter.acquire()
+        return loop.time() - start
+
+    assert asyncio.run(run()) >= 3 / 50 * 0.9
+
+
+def test_slow_provider_does_not_block_others(melius_api, monkeypatch):
+    slow = SlowProvider()
+    monkeypatch.setitem(providers._PROVIDERS, RPASource.UIPATH, slow)
+
+    async def run():
+        slow.release = asyncio.Event()
+        stuck = [asyncio.create_task(slow.dispatch(process_data(f"slow-{i}"))) for i in range(2)]
+        melius = await asyncio.wait_for(
+            asyncio.gather(
+                *(providers.get_provider(RPASource.MELIUS).dispatch(process_data(str(i))) for i in range(3))
+            ),
+            timeout=1,
+        )
+        slow.release.set()
+        return melius, await asyncio.gather(*stuck)
+
+    melius, stuck = asyncio.run(run())
+
+    assert all(result.error is None for result in melius)
+    assert [result.error is None for result in stuck] == [True, True]
+    assert len(melius_api.requests) == 3
+
+
+def test_rate_limiter_disabled_does_not_wait():
+    limiter = providers.RateLimiter(rate=0)
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        for _ in range(100):
+            await limiter.acquire()
+        return loop.time() - start
+
+    assert asyncio.run(run()) < 0.05
@@ -0,0 +1,167 @@
+import asyncio
+import datetime
+from typing import Optional
+
+import pytest
+from core.config import settings
+from httpx import Response, codes
+from models.rpa import (
+    CamundaOutbox,
+    RPAEventLog,
+    RPAEventTypes,
+    RPAPendingTask,
+    RPASource,
+)
+from schemas.rpa_schema import MeliusWebhookRequest, StatusTarefaRpa
+from service.rpa import providers, rpa_services, sweeper
+from sqlmodel import select
+
+
+def add_pending_task(
+    db_session, process_id: str, attempts: int = 1, overdue: bool = True, token: Optional[str] = None
+) -> RPAPendingTask:
+    offset = datetime.timedelta(minutes=-1 if overdue else 60)
+    task = RPAPendingTask(
+        process_id=process_id,
+        token_retorno=token or f"token-{process_id}",
+        tipo_tarefa_rpa="traDctf",
+        event_source=RPASource.MELIUS,
+        process_data={"idTarefaCliente": process_id, "tipoTarefaRpa": "traDctf"},
+        attempts=attempts,
+        deadline_at=datetime.datetime.utcnow() + offset,
+    )
+    db_session.add(task)
+    db_session.commit()
+    return task
+
+
+def get_pending_tasks(db_session) -> list[RPAPendingTask]:
+    db_session.expire_all()
+    return list(db_session.execute(select(RPAPendingTask)).scalars().all())
+
+
+def test_sweeper_redispatches_overdue_tasks(db_session, melius_api, monkeypatch):
+    monkeypatch.setattr(settings, "MELIUS_RPA_TASK_MAX_ATTEMPTS", 2)
+    add_pending_task(db_session, "overdue")
+    add_pending_task(db_session, "on-time", overdue=False)
+
+    result = asyncio.run(sweeper.sweep_expired_tasks(db_session))
+
+    assert result == {"redispatched": 1, "redispatch_errors": 0, "timed_out": 0}
+    assert len(melius_api.requests) == 1
+    pending = {task.process_id: task for task in get_pending_tasks(db_session)}
+    assert pending["overdue"].attempts == 2
+    assert pending["overdue"].token_retorno != "token-overdue"
+    assert pending["overdue"].deadline_at.replace(tzinfo=None) > datetime.datetime.utcnow()
+    assert pending["on-time"].attempts == 1
+    start_log = db_session.execute(select(RPAEventLog)).scalar_one()
+    assert start_log.event_type == RPAEventTypes.START
+
+
+def test_sweeper_retries_failed_redispatch(db_session, melius_api, monkeypatch):
+    monkeypatch.setattr(settings, "MELIUS_RPA_TASK_MAX_ATTEMPTS", 2)
+    melius_api.responses.append(Response(codes.INTERNAL_SERVER_ERROR, content=b"unavailable"))
+    add_pending_task(db_session, "overdue")
+
+    result = asyncio.run(sweeper.sweep_expired_tasks(db_session))
+
+    assert result["redispatch_errors"] == 1
+    [task] = get_pending_tasks(db_session)
+    assert task.attempts == 2
+    assert task.token_retorno == "token-overdue"
+
+    # Sem tentativas restantes, a próxima varredura notifica o timeout
+    result = asyncio.run(sweeper.sweep_expired_tasks(db_session))
+    assert result["timed_out"] == 1
+
+
+def test_sweeper_notifies_camunda_of_timeout(db_session, melius_api, monkeypatch):
+    monkeypatch.setattr(settings, "MELIUS_RPA_TASK_MAX_ATTEMPTS", 2)
+    add_pending_task(db_session, "exhausted", attempts=2)
+
+    result = asyncio.run(sweeper.sweep_expired_tasks(db_session))
+
+    assert result == {"redispatched": 0, "redispatch_errors": 0, "timed_out": 1}
+    assert melius_api.requests == []
+    assert get_pending_tasks(db_session) == []
+    message = db_session.execute(select(CamundaOutbox)).scalar_one()
+    assert message.process_instance_id == "exhausted"
+    value = message.payload["processVariables"]["result_rpa_traDctf"]["value"]
+    assert value["status_tarefa_rpa"] == StatusTarefaRpa.TRATATIVA_MANUAL
+    assert value["mensagem_retorno"] == sweeper.TIMEOUT_MESSAGE
+
+
+def add_start_log(db_session, task: RPAPendingTask) -> None:
+    db_session.add(
+        RPAEventLog(
+            process_id=task.process_id,
+            event_type=RPAEventTypes.START,
+            event_source=RPASource.MELIUS,
+            event_data={"tipoTarefaRpa": "traDctf", "tokenRetorno": task.token_retorno},
+        )
+    )
+    db_session.commit()
+
+
+def send_webhook(db_session, process_id: str, token: str) -> None:
+    webhook_request = MeliusWebhookRequest.model_validate(
+        {"idTarefaCliente": process_id, "statusTarefaRpa": 1, "tokenRetorno": token}
+    )
+    rpa_services.handle_webhook_request(webhook_request, db_session)
+    db_session.commit()
+
+
+def test_webhook_removes_pending_task(db_session):
+    task = add_pending_task(db_session, "29c16b26-2213-11f0-a8ae-129143b339f3")
+    add_start_log(db_session, task)
+
+    send_webhook(db_session, task.process_id, task.token_retorno)
+
+    assert get_pending_tasks(db_session) == []
+
+
+def test_sweeper_does_not_hold_locks_during_redispatch(db_session, session_maker, melius_api, monkeypatch):
+    monkeypatch.setattr(settings, "MELIUS_RPA_TASK_MAX_ATTEMPTS", 2)
+    add_pending_task(db_session, "overdue")
+    send = providers.MeliusProvider.send
+
+    async def check_lock_and_send(self, process_data):
+        with session_maker() as other_session:
+            # Falha se a linha ainda estiver bloqueada pelo sweeper
+            stmt = select(RPAPendingTask).with_for_update(nowait=True)
+            task = other_session.execute(stmt).scalar_one()
+            # A tarefa reservada não é reenviada por outra varredura
+            assert task.deadline_at.replace(tzinfo=None) > datetime.datetime.utcnow()
+            assert sweeper._claim_tasks(other_session, 10) == ([], 0)
+        return await send(self, process_data)
+
+    monkeypatch.setattr(providers.MeliusProvider, "send", check_lock_and_send)
+
+    result = asyncio.run(sweeper.sweep_expired_tasks(db_session))
+
+    assert result == {"redispatched": 1, "redispatch_errors": 0, "timed_out": 0}
+    assert len(melius_api.requests) == 1
+
+
+@pytest.mark.parametrize("secret", ["", "secret"])
+@pytest.mark.parametrize("late_first", [False, True])
+def test_late_webhook_of_previous_dispatch_is_deduplicated(db_session, melius_api, monkeypatch, secret, late_first):
+    monkeypatch.setattr(settings, "MELIUS_CALLBACK_TOKEN_SECRET", secret)
+    monkeypatch.setattr(settings, "MELIUS_RPA_TASK_MAX_ATTEMPTS", 2)
+    process_id = "29c16b26-2213-11f0-a8ae-129143b339f3"
+    first_token = providers.get_provider(RPASource.MELIUS).callback_token(
+        {"idTarefaCliente": process_id, "tipoTarefaRpa": "traDctf"}
+    )
+    add_start_log(db_session, add_pending_task(db_session, process_id, token=first_token))
+
+    asyncio.run(sweeper.sweep_expired_tasks(db_session))
+    [redispatched] = get_pending_tasks(db_session)
+    assert redispatched.token_retorno != first_token
+
+    tokens = [first_token, redispatched.token_retorno]
+    for token in tokens if late_first else reversed(tokens):
+        send_webhook(db_session, process_id, token)
+
+    # Só um retorno da tarefa chega ao Camunda, e a tarefa deixa de ser acompanhada
+    assert len(db_session.execute(select(CamundaOutbox)).scalars().all()) == 1
+    assert get_pending_tasks(db_session) == []
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""Benchmark da seleção de clientes elegíveis: linha a linha (csv.DictReader) vs coluna a coluna.
+
+Uso: PYTHONPATH=app python ops/benchmarks/eligibility.py --rows 100000
+"""
+
+import argparse
+import csv
+import datetime
+import io
+import random
+import sys
+import time
+from pathlib import Path
+
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "app"))
+
+from helpers import s3_utils  # noqa: E402
+from service.camunda.eligibility import (  # noqa: E402
+    DateRule,
+    EligibilityRules,
+    InSet,
+    ValueMap,
+)
+
+
+HEADER = ["ID", "cnpj", "company", "customer_profile", "Tipo de folha (tratado)", "data_inicio", "erp_operado"]
+PROFILES = ["FAMILY_3", "FAMILY_4", "FAMILY_5"]
+TIPOS_FOLHA = ["com movimento", "sem movimento", "pro-labore"]
+INICIO = datetime.date(2025, 1, 1)
+
+
+def build_csv(rows: int, included: int, seed: int) -> tuple[bytes, list[str]]:
+    random_generator = random.Random(seed)
+    cnpjs = [f"{index:014d}" for index in range(rows)]
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(HEADER)
+    for index, cnpj in enumerate(cnpjs):
+        writer.writerow(
+            [
+                f"id-{index}",
+                cnpj,
+                f"Empresa {index}",
+                random_generator.choice(PROFILES),
+                random_generator.choice(TIPOS_FOLHA),
+                (INICIO + datetime.timedelta(days=random_generator.randrange(365))).strftime("%d/%m/%Y"),
+                "dominio",
+            ]
+        )
+    return output.getvalue().encode(), random_generator.sample(cnpjs, included)
+
+
+def row_by_row(content: bytes, included_cnpjs: list[str], cutoff: datetime.date) -> int:
+    # Comportamento anterior: cada linha vira um dict e os filtros são avaliados linha a linha
+    selected = 0
+    for row in s3_utils.iter_csv_rows(io.BytesIO(content)):
+        if row["cnpj"] not in included_cnpjs:
+            continue
+        if row["customer_profile"] not in ("FAMILY_3", "FAMILY_4"):
+            continue
+        if datetime.datetime.strptime(row["data_inicio"], "%d/%m/%Y").date() > cutoff:
+            continue
+        selected += 1
+    return selected
+
+
+def columnar(content: bytes, included_cnpjs: list[str], cutoff: datetime.date) -> int:
+    rules = EligibilityRules(
+        InSet("cnpj", included_cnpjs),
+        ValueMap("customer_profile", {"FAMILY_3": True, "FAMILY_4": True}),
+        DateRule.between("data_inicio", end=cutoff),
+    )
+    return sum(1 for _ in rules.filter(s3_utils.iter_csv_column_batches(io.BytesIO(content))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark eligibility filtering")
+    parser.add_argument("--rows", type=int, default=100000, help="Number of synthetic rows")
+    parser.add_argument("--included", type=int, default=2000, help="Number of included CNPJs")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of repetitions")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    content, included_cnpjs = build_csv(args.rows, args.included, args.seed)
+    cutoff = INICIO + datetime.timedelta(days=180)
+
+    results = {}
+    for name, func in (("row by row", row_by_row), ("columnar", columnar)):
+        timings = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            results[name] = func(content, included_cnpjs, cutoff)
+            timings.append(time.perf_counter() - started)
+        print(f"{name:>10}: {min(timings) * 1000:9.1f} ms ({results[name]} selected of {args.rows} rows)")
+
+    assert len(set(results.values())) == 1, "Both strategies must select the same rows"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""Micro-benchmark do custo por linha da montagem de variáveis de processo.
+
+Uso: PYTHONPATH=app python ops/benchmarks/process_variables.py --rows 10000
+"""
+
+import argparse
+import logging
+import sys
+import timeit
+from pathlib import Path
+
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "app"))
+
+from service.camunda.fechamento_folha import (  # noqa: E402
+    FechamentoFolha3Process,
+    FolhaCustomer,
+)
+
+
+CUSTOMER_DATA = FolhaCustomer(
+    id="00000000-0000-0000-0000-000000000000",
+    cnpj="30473147000160",
+    company="Empresa Benchmark",
+    origin_cnpj="30473147000160",
+    customer_profile="FAMILY_3",
+    codigo_dominio="123",
+    tipo_folha="com movimento",
+    analista_dp="analista@bhub.ai",
+    cnpj_procuracao_federal="12603959000109",
+    erp_operado="dominio",
+    data_pagamento_folha="5",
+    util_ou_corrido="útil",
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark process variable builders")
+    parser.add_argument("--rows", type=int, default=10000, help="Number of rows per repetition")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of repetitions")
+    args = parser.parse_args()
+
+    process = FechamentoFolha3Process(db_session=None, logger=logging.getLogger(__name__))
+    run_context = process.get_run_context()
+
+    def per_row_context():
+        # Comportamento anterior: valores da execução recalculados a cada linha
+        process.build_payload(CUSTOMER_DATA, process.get_run_context())
+
+    def precomputed_context():
+        process.build_payload(CUSTOMER_DATA, run_context)
+
+    for name, func in (("per-row context", per_row_context), ("run context", precomputed_context)):
+        best = min(timeit.repeat(func, number=args.rows, repeat=args.repeat))
+        print(f"{name:>16}: {best / args.rows * 1e6:8.2f} us/row")
+
+
+if __name__ == "__main__":
+    main()
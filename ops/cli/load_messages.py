@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+"""Gera carga em uma fila SQS usando o publicador em lotes da aplicação.
+
+Uso: AWS_ENDPOINT_URL=http://localhost:4566 python ops/cli/load_messages.py process_starter.fifo -n 10000
+"""
+
+import json
+import sys
+import time
+import uuid
+from pathlib import Path
+
+import click
+
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "app"))
+
+from queues.publisher import SQSPublisher, content_id, random_id  # noqa: E402
+
+
+@click.command()
+@click.argument("queue_name")
+@click.option("--count", "-n", default=1000, show_default=True, help="Number of messages to send")
+@click.option("--body", "-b", default='{"process_key": "load_test"}', help="JSON message body template")
+@click.option("--groups", "-g", default=1, show_default=True, help="Number of FIFO message groups")
+@click.option("--workers", "-w", default=None, type=int, help="Parallel SendMessageBatch calls")
+@click.option("--content-dedup", is_flag=True, help="Deduplicate FIFO messages by content")
+def load_messages(queue_name, count, body, groups, workers, content_dedup):
+    """Send COUNT messages to QUEUE_NAME and report the throughput"""
+    template = json.loads(body)
+    run_id = str(uuid.uuid4())
+    publisher = SQSPublisher(
+        queue_name,
+        group_id=lambda message: f"{run_id}-{message['sequence'] % groups}",
+        deduplication_id=content_id if content_dedup else random_id,
+        max_workers=workers,
+    )
+
+    started_at = time.perf_counter()
+    result = publisher.publish({**template, "run_id": run_id, "sequence": index} for index in range(count))
+    elapsed = time.perf_counter() - started_at
+
+    click.echo(f"Sent {result.sent} messages in {elapsed:.2f}s ({result.sent / elapsed:.0f} msg/s)")
+    if result.failed:
+        click.echo(f"{result.failed} messages failed: {result.errors[:5]}", err=True)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    load_messages()
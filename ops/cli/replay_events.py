@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+"""Reenvia em massa os eventos com erro, usando o motor de replay da aplicação.
+
+Uso: python ops/cli/replay_events.py rpa --from 2025-06-01 --error-pattern "timeout" --dry-run
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import click
+
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "app"))
+
+from db.session import get_session_maker  # noqa: E402
+from schemas.replay_schema import ReplayRequest, ReplaySource  # noqa: E402
+from service.audit import replay  # noqa: E402
+
+
+@click.command()
+@click.argument("source", type=click.Choice([source.value for source in ReplaySource]))
+@click.option("--from", "created_from", required=True, type=click.DateTime(), help="Start of the time window")
+@click.option("--to", "created_to", default=None, type=click.DateTime(), help="End of the time window (exclusive)")
+@click.option("--process-key", "-k", default=None, help="Process key (process) or RPA task type (rpa)")
+@click.option("--error-pattern", "-e", default=None, help="Case-insensitive regex matched against the event data")
+@click.option("--limit", "-n", default=None, type=int, help="Maximum number of events selected")
+@click.option("--dry-run", is_flag=True, help="Only report what would be replayed")
+@click.option("--force", is_flag=True, help="Also replay events already replayed successfully")
+def replay_events(source, created_from, created_to, process_key, error_pattern, limit, dry_run, force):
+    """Replay the failed SOURCE events (process or rpa) matching the filters"""
+    request = ReplayRequest(
+        source=ReplaySource(source),
+        created_from=created_from,
+        created_to=created_to,
+        process_key=process_key,
+        error_pattern=error_pattern,
+        limit=limit,
+        dry_run=dry_run,
+        force=force,
+    )
+
+    SessionLocal = get_session_maker()
+    with SessionLocal() as db_session:
+        result = asyncio.run(replay.replay_failed_events(db_session, request))
+
+    click.echo(
+        f"Replay {result['replay_id']}{' (dry run)' if dry_run else ''}: {result['selected']} events selected, "
+        f"{result['duplicates']} duplicates, {result['dispatched']} dispatched, {result['errors']} errors"
+    )
+    if result["errors"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    replay_events()
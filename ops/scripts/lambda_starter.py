@@ -42,12 +42,14 @@ def lambda_handler(event, context):
 
         logger.info(f"Making request to {url} with payload: {json.dumps(payload)}")
 
-        # Make the HTTP POST request
+        # Make the HTTP POST request. The Core only enqueues the run (202) and returns its job id,
+        # the progress can be followed at /api/process-message/jobs/{job_id}
         response = http.request("POST", url, body=json.dumps(payload), headers=headers)
 
-        logger.info(f"Response from Core - Status: {response.status}, Body: {response.data.decode('utf-8')}")
+        response_body = response.data.decode("utf-8")
+        logger.info(f"Response from Core - Status: {response.status}, Body: {response_body}")
 
-        return {"statusCode": response.status, "headers": {"Content-Type": "application/json"}}
+        return {"statusCode": response.status, "headers": {"Content-Type": "application/json"}, "body": response_body}
 
     except Exception as e:
         logger.error(f"Error processing request: {str(e)}", exc_info=True)